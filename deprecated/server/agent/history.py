@@ -0,0 +1,155 @@
+"""
+Rolling conversation history for the agent graph.
+
+The last MAX_TURNS turns are kept verbatim in the graph state. Older turns are removed from the state and
+folded into a running summary by a background worker, so the summarisation call never sits between the
+user and their answer. Until the worker has folded them in, evicted messages are still sent verbatim.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import HumanMessage, SystemMessage, RemoveMessage
+from prompt_cache import static_prefix, build_messages
+import threading
+
+# Number of most recent turns (a user message and everything the agent replied to it) kept verbatim.
+MAX_TURNS = 4
+# Ceiling on the estimated tokens of summary + verbatim history sent with each response prompt.
+MAX_HISTORY_TOKENS = 1500
+# Ceiling on the estimated tokens of the running summary itself.
+MAX_SUMMARY_TOKENS = 300
+# Rough characters-per-token ratio used to estimate prompt size without loading a tokenizer.
+CHARS_PER_TOKEN = 4
+
+# One summary worker for every conversation, so sessions dropped by the server leave no thread behind. A
+# single worker also keeps each conversation's summary updates in order.
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+def estimate_tokens(messages):
+    """Estimate the token count of a message, a string, or a list of either."""
+    if isinstance(messages, str):
+        return len(messages) // CHARS_PER_TOKEN + 1
+    if isinstance(messages, dict):
+        return estimate_tokens(messages.get("content", ""))
+    if isinstance(messages, list):
+        return sum(estimate_tokens(m) for m in messages)
+    return estimate_tokens(str(messages.content))
+
+def split_turns(messages):
+    """Group messages into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def format_transcript(messages):
+    lines = []
+    for message in messages:
+        role = "User" if isinstance(message, HumanMessage) else "Assistant"
+        lines.append(f"{role}: {message.content}")
+    return "\n".join(lines)
+
+class ConversationHistory:
+    """
+    Keeps the running summary, the evicted-but-not-yet-summarised messages and per-turn prompt metrics
+    for one conversation.
+
+    Args:
+        llm: Chat model used to write the summary.
+        prompt (dict): Summariser prompt with a static `system` prefix and a `user` template formatted with
+            `summary` and `transcript`.
+        max_turns (int): Turns kept verbatim in the graph state.
+        max_tokens (int): Token ceiling for summary + verbatim history.
+    """
+
+    def __init__(self, llm, prompt, max_turns=MAX_TURNS, max_tokens=MAX_HISTORY_TOKENS):
+        self.llm = llm
+        self.prompt = prompt
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summary = ""
+        self.pending = []
+        self.metrics = []
+        self.summary_failures = 0
+        self.last_summary_error = None
+        self._lock = threading.Lock()
+
+    def compact(self, messages):
+        """
+        Decide which messages leave the verbatim window and schedule them for summarisation.
+
+        Returns:
+            list: RemoveMessage entries for the graph state (empty when nothing was evicted).
+        """
+        turns = split_turns(messages)
+        keep = turns[-self.max_turns:]
+        evicted = [m for turn in turns[:-self.max_turns] for m in turn]
+
+        # The latest turn is always kept, even if it alone exceeds the ceiling.
+        budget = self.max_tokens - estimate_tokens(self.summary)
+        while len(keep) > 1 and estimate_tokens([m for turn in keep for m in turn]) > budget:
+            evicted.extend(keep.pop(0))
+
+        if not evicted:
+            return []
+
+        with self._lock:
+            self.pending.extend(evicted)
+        _summary_executor.submit(self._fold_pending)
+
+        return [RemoveMessage(id=m.id) for m in evicted]
+
+    def _fold_pending(self):
+        with self._lock:
+            batch = list(self.pending)
+            summary = self.summary
+        if not batch:
+            return
+
+        try:
+            reply = self.llm.invoke(build_messages(
+                static_prefix("history_summary", self.prompt["system"]),
+                self.prompt["user"].format(summary=summary or "(none)", transcript=format_transcript(batch))
+            ))
+        except Exception as e:
+            # Leave the batch pending; it is still sent verbatim and retried on the next eviction. Failures are
+            # reported in the turn metrics.
+            with self._lock:
+                self.summary_failures += 1
+                self.last_summary_error = str(e)
+            return
+
+        new_summary = reply.content.strip()[:MAX_SUMMARY_TOKENS * CHARS_PER_TOKEN]
+
+        with self._lock:
+            self.summary = new_summary
+            del self.pending[:len(batch)]
+
+    def context(self):
+        """Messages that stand in for the turns no longer held in the graph state."""
+        with self._lock:
+            summary = self.summary
+            pending = list(self.pending)
+
+        context = []
+        if summary:
+            context.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return context + pending
+
+    def record(self, prompt, reply=None):
+        """Store the prompt size of one turn, using the server's token count when the reply carries it."""
+        metadata = getattr(reply, "response_metadata", None) or {}
+        entry = {
+            "turn": len(self.metrics) + 1,
+            "prompt_tokens_estimate": estimate_tokens(prompt),
+            "prompt_tokens": metadata.get("prompt_eval_count"),
+            "summary_tokens": estimate_tokens(self.summary) if self.summary else 0,
+            "pending_messages": len(self.pending),
+            "summary_failures": self.summary_failures
+        }
+        self.metrics.append(entry)
+        return entry
+
+    def wait(self):
+        """Block until queued summaries are written. Used on shutdown and by benchmarks."""
+        _summary_executor.submit(lambda: None).result()
@@ -1,52 +1,100 @@
+import os
+import sys
+import time
+from functools import cache
+
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(AGENT_DIR))
+sys.path.append(os.path.join(os.path.dirname(AGENT_DIR), "pv-curve"))
+
 from langgraph.graph.message import add_messages
 from langgraph.graph import StateGraph, START, END
+from langgraph.constants import TAG_NOSTREAM
 from langchain_ollama import ChatOllama
 from langchain_core.messages import HumanMessage, AIMessage
 from pydantic import BaseModel, Field
 from typing_extensions import TypedDict, Annotated, Literal
 from vector import retriever
+from history import ConversationHistory
+from prompt_cache import KEEP_ALIVE, static_prefix, build_messages
+from model_router import RoutedModel
 import json
 
 def load_prompts():
-    with open("./prompts.json", "r") as f:
+    with open(os.path.join(AGENT_DIR, "prompts.json"), "r") as f:
         return json.load(f)
 
 prompts = load_prompts()
 
-# Currently using llama3.2:1b model for Ollama Tool support.
-llm = ChatOllama(
-    model="llama3.2:1b",
-    base_url="http://localhost:11434"
-)
+INPUTS_FILE = os.path.join(AGENT_DIR, "inputs.json")
+
+# Graph nodes whose output is user-facing text and is forwarded by stream_agent. The structured-output calls of
+# the classifier and the command agent are tagged TAG_NOSTREAM, so only the reply a node returns reaches the user.
+STREAMED_NODES = {"response", "command", "screening"}
+
+# Inputs that change which buses the screening suggests to monitor.
+STUDY_PARAMETERS = {"grid_model", "source_buses", "sink_buses", "generator_limits", "load_model"}
+
+# The vector database is opened on first use so importing the graph (e.g. from server.py) stays cheap.
+get_retriever = cache(retriever)
+
+# System prompts are sent unformatted so every request on a route shares the same cached prefix.
+classifier_prefix = static_prefix("classifier", prompts["classifier"]["system"])
+response_prefix = static_prefix("response_agent", prompts["response_agent"]["system"])
+command_prefix = static_prefix("command_agent", prompts["command_agent"]["system"])
+
+@cache
+def chat_model(model):
+    return ChatOllama(
+        model=model,
+        base_url="http://localhost:11434",
+        keep_alive=KEEP_ALIVE
+    )
 
 class MessageClassifier(BaseModel):
-    message_type: Literal["question", "command"] = Field(
+    message_type: Literal["question", "command", "screening"] = Field(
         ...,
-        description="Classify if the message requires a tool call/command or a question/request that requires a knowledge response."
+        description="Classify if the message requires a tool call/command, a question/request that requires a knowledge response, or asks which bus to monitor."
     )
 
 class InputModifier(BaseModel):
     parameter: str = Field(..., description="The parameter to modify")
-    value: float = Field(..., description="The new value for the parameter")
+    value: float | str | list[float] = Field(
+        ...,
+        description="The new value for the parameter: a number, a name such as a grid model, or a list of bus numbers"
+    )
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
     message_type: str | None
+    # Running summary of the turns no longer in `messages`; one per conversation, kept with its state.
+    history: ConversationHistory
+
+# Models are picked per request by the central router (see model_router.py), which moves to a smaller tier
+# when the preferred model is too busy to meet the task's latency SLO.
+llm = RoutedModel("rag_answer", chat_model)
+classifier_llm = RoutedModel("classification", lambda model: chat_model(model).with_structured_output(
+    MessageClassifier
+).with_config(tags=[TAG_NOSTREAM]))
+modifier_llm = RoutedModel("parameter_extraction", lambda model: chat_model(model).with_structured_output(
+    InputModifier
+).with_config(tags=[TAG_NOSTREAM]))
+summary_llm = RoutedModel("summarisation", chat_model)
+
+def new_session():
+    """
+    Graph state of a new conversation. Turns older than the verbatim window are folded into the session's own
+    running summary in the background.
+    """
+    return {
+        "messages": [],
+        "message_type": None,
+        "history": ConversationHistory(summary_llm, prompts["history_summary"])
+    }
 
 def classify_message(state: State):
     last_message = state["messages"][-1]
-    classifier_llm = llm.with_structured_output(MessageClassifier)
-
-    result = classifier_llm.invoke([
-        {
-            "role": "system",
-            "content": prompts["classifier"]["system"]
-        },
-        {
-            "role": "user",
-            "content": last_message.content
-        }
-    ])
+    result = classifier_llm.invoke(build_messages(classifier_prefix, last_message.content))
 
     return {"message_type": result.message_type}
 
@@ -55,58 +103,96 @@ def router(state: State):
 
     if message_type == "command":
         return {"next": "command"}
+
+    if message_type == "screening":
+        return {"next": "screening"}
     
     return {"next": "response"}
 
 def response_agent(state: State):
     last_message = state["messages"][-1]
+    history = state["history"]
 
-    context = retriever.invoke(last_message.content)
+    context = get_retriever().invoke(last_message.content)
 
-    messages = [
-        {"role": "system",
-         "content": prompts["response_agent"]["system"].format(context=context)},
-        {"role": "user", 
-         "content": prompts["response_agent"]["user"].format(user_input=last_message.content)}
-    ]
+    messages = build_messages(
+        response_prefix,
+        prompts["response_agent"]["user"].format(context=context, user_input=last_message.content),
+        history=[*history.context(), *state["messages"][:-1]]
+    )
 
-    reply = llm.invoke(messages)
+    # Streamed so stream_agent can forward tokens as they are generated; the chunks are merged for the state.
+    reply = None
+    for chunk in llm.stream(messages):
+        reply = chunk if reply is None else reply + chunk
+
+    reply = AIMessage(content=reply.content, response_metadata=reply.response_metadata, id=reply.id)
+    history.record(messages, reply)
     return {"messages": [reply]}
 
 def command_agent(state: State):
     last_message = state["messages"][-1]
-    modifier_llm = llm.with_structured_output(InputModifier)
     
-    with open("./inputs.json", "r") as f:
+    with open(INPUTS_FILE, "r") as f:
         current_inputs = json.load(f)
     
-    result = modifier_llm.invoke([
-        {
-            "role": "system",
-            "content": prompts["command_agent"]["system"].format(current_inputs=current_inputs)
-        },
-        {
-            "role": "user",
-            "content": last_message.content
-        }
-    ])
+    result = modifier_llm.invoke(build_messages(
+        command_prefix,
+        prompts["command_agent"]["user"].format(current_inputs=current_inputs, user_input=last_message.content)
+    ))
     
     current_inputs[result.parameter] = result.value
     
-    with open("./inputs.json", "w") as f:
+    with open(INPUTS_FILE, "w") as f:
         json.dump(current_inputs, f, indent=2)
     
     reply_content = f"Updated {result.parameter} to {result.value}"
+
+    # Offer monitor buses once the study is defined and the user has not picked one.
+    if result.parameter in STUDY_PARAMETERS and current_inputs.get("monitor_bus") in ("", None):
+        try:
+            reply_content += "\n\n" + monitor_suggestions(current_inputs)
+        except (TypeError, ValueError, RuntimeError) as e:
+            reply_content += f"\n\nCannot suggest monitor buses for the current inputs yet: {e}"
+
     reply = AIMessage(content=reply_content)
     
     return {"messages": [reply]}
 
+def monitor_suggestions(inputs):
+    """Monitor buses suggested for the study in `inputs`, from a screening of its base case (see screening.py)."""
+    from screening import suggest_monitor_buses
+
+    lines = [
+        f"- Bus {entry['bus']}: {entry['sensitivity']:+.4f} p.u. drop per 100 MW of transfer, "
+        f"L-index {entry['l_index']:.3f}, base voltage {entry['voltage']:.3f} p.u."
+        for entry in suggest_monitor_buses(inputs)
+    ]
+    return "Suggested monitor buses, most sensitive to the transfer first:\n" + "\n".join(lines)
+
+def screening_agent(state: State):
+    with open(INPUTS_FILE, "r") as f:
+        current_inputs = json.load(f)
+
+    try:
+        reply_content = monitor_suggestions(current_inputs)
+    except (TypeError, ValueError, RuntimeError) as e:
+        reply_content = f"Cannot suggest monitor buses for the current inputs: {e}"
+
+    return {"messages": [AIMessage(content=reply_content)]}
+
+def compact_history(state: State):
+    # Only schedules the summary; the LLM call runs after the reply has been returned.
+    return {"messages": state["history"].compact(state["messages"])}
+
 graph_builder = StateGraph(State)
 
 graph_builder.add_node("classifier", classify_message)
 graph_builder.add_node("router", router)
 graph_builder.add_node("response", response_agent)
 graph_builder.add_node("command", command_agent)
+graph_builder.add_node("screening", screening_agent)
+graph_builder.add_node("compact", compact_history)
 
 graph_builder.add_edge(START, "classifier")
 graph_builder.add_edge("classifier", "router")
@@ -116,17 +202,90 @@ graph_builder.add_conditional_edges(
     lambda state: state.get("next"),
     {
         "response": "response",
-        "command": "command"
+        "command": "command",
+        "screening": "screening"
     }
 )
 
-graph_builder.add_edge("response", END)
-graph_builder.add_edge("command", END)
+graph_builder.add_edge("response", "compact")
+graph_builder.add_edge("command", "compact")
+graph_builder.add_edge("screening", "compact")
+graph_builder.add_edge("compact", END)
 
 graph = graph_builder.compile()
 
+def _token_event(chunk, metadata):
+    if metadata.get("langgraph_node") not in STREAMED_NODES or not chunk.content:
+        return None
+    return {"chunk": chunk.content}
+
+def _done_event(state, start, first_token):
+    total = time.perf_counter() - start
+    return {
+        "done": True,
+        "state": state,
+        "metrics": {
+            "ttft_s": first_token if first_token is not None else total,
+            "total_s": total
+        }
+    }
+
+def _with_history(state):
+    """`state` with a conversation history of its own, for callers that did not start from new_session."""
+    if state.get("history") is not None:
+        return state
+    return {**state, "history": new_session()["history"]}
+
+def stream_agent(state):
+    """
+    Run the graph on `state` and yield the reply as it is generated.
+
+    `state` is one conversation's state, as made by new_session and returned in the final event. Concurrent
+    conversations need states of their own.
+
+    Yields:
+        dict: {"chunk": str} for every token of the reply, then one
+        {"done": True, "state": dict, "metrics": {"ttft_s": float, "total_s": float}} with the final graph state.
+    """
+    start = time.perf_counter()
+    first_token = None
+    state = _with_history(state)
+
+    for mode, payload in graph.stream(state, stream_mode=["messages", "values"]):
+        if mode == "values":
+            state = payload
+            continue
+
+        event = _token_event(*payload)
+        if event:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            yield event
+
+    yield _done_event(state, start, first_token)
+
+async def astream_agent(state):
+    """Async version of stream_agent, yielding the same events."""
+    start = time.perf_counter()
+    first_token = None
+    state = _with_history(state)
+
+    async for mode, payload in graph.astream(state, stream_mode=["messages", "values"]):
+        if mode == "values":
+            state = payload
+            continue
+
+        event = _token_event(*payload)
+        if event:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            yield event
+
+    yield _done_event(state, start, first_token)
+
 def run_agent():
-    state = {"messages": [], "message_type": None}
+    state = new_session()
+    latencies = []
 
     while True:
         user_input = input("Message: ")
@@ -134,15 +293,25 @@ def run_agent():
             print("Exiting...")
             break
 
+        if user_input == "metrics":
+            for entry in state["history"].metrics:
+                print(entry)
+            for turn, entry in enumerate(latencies, 1):
+                print(f"turn {turn}: first token {entry['ttft_s']:.2f}s, total {entry['total_s']:.2f}s")
+            continue
+
         state["messages"] = state.get("messages", []) + [
             HumanMessage(content=user_input)
         ]
 
-        state = graph.invoke(state)
-
-        if state.get("messages") and len(state["messages"]) > 0:
-            last_message = state["messages"][-1]
-            print(f"Assistant: {last_message.content}")
+        print("Assistant: ", end="", flush=True)
+        for event in stream_agent(state):
+            if "chunk" in event:
+                print(event["chunk"], end="", flush=True)
+            else:
+                state = event["state"]
+                latencies.append(event["metrics"])
+        print()
 
 if __name__ == "__main__":
     run_agent()
\ No newline at end of file
@@ -11,11 +11,23 @@ import os
 import threading
 import time
 import sys
+from functools import cache
 from langchain_ollama.llms import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
 from vector import retriever
 
-model = OllamaLLM(model="deepseek-r1:1.5b")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reasoning import stream_with_policy
+from model_router import default_router
+
+@cache
+def ollama_model(model):
+    return OllamaLLM(model=model)
+
+def run_prompt(template, inputs, route, task):
+    """Run a prompt on the model the router picks for `task`, under the reasoning policy of `route`."""
+    with default_router.route(task) as chosen:
+        return "".join(stream_with_policy(template, ollama_model(chosen.model), inputs, route))
 
 # File to store collected inputs
 INPUTS_FILE = "collected_inputs.json"
@@ -187,13 +199,12 @@ def process_command(user_message, collected_inputs):
     # Allow command detection even if no inputs exist (for "clear all" type commands)
     existing_inputs_text = "\n".join([f"- {key}: {value}" for key, value in collected_inputs.items()]) if collected_inputs else "No inputs currently exist"
     
-    command_chain = command_detection_template() | model
-    
     try:
-        response = command_chain.invoke({
+        # Reasoning is turned off for this route (see reasoning.py), so only the formatted answer comes back.
+        response = run_prompt(command_detection_template(), {
             "existing_inputs": existing_inputs_text,
             "user_message": user_message
-        })
+        }, "command_detection", "command_detection")
         
         # Parse the response
         lines = response.strip().split('\n')
@@ -277,9 +288,6 @@ def main():
         print("Collected inputs:", json.dumps(collected_inputs, indent=2))
         print("\nYou can now ask questions about PV-Curves, and I'll use your inputs when relevant.\n")
     
-    extract_chain = extract_all_inputs_template() | model
-    chat_chain = general_chat_template() | model
-    
     while True:
         # Determine what to ask for
         missing_inputs = get_missing_inputs(collected_inputs)
@@ -348,11 +356,11 @@ def main():
                     required_inputs_text = "\n".join([f"- {key}: {desc}" for key, desc in REQUIRED_INPUTS.items()])
                     missing_inputs_text = ", ".join(missing_inputs)
                     
-                    response = extract_chain.invoke({
+                    response = run_prompt(extract_all_inputs_template(), {
                         "required_inputs": required_inputs_text,
                         "missing_inputs": missing_inputs_text,
                         "user_response": user_response
-                    })
+                    }, "input_extraction", "input_extraction")
                     
                     # Stop processing animation
                     stop_processing()
@@ -425,11 +433,11 @@ def main():
                 # Normal chat mode - all inputs collected
                 try:
                     context = retriever.invoke(user_response)
-                    response = chat_chain.invoke({
+                    response = run_prompt(general_chat_template(), {
                         "collected_inputs": json.dumps(collected_inputs, indent=2),
                         "context": context,
                         "question": user_response
-                    })
+                    }, "chat", "reasoning_answer")
                     
                     # Stop processing animation
                     stop_processing()
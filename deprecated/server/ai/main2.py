@@ -1,7 +1,12 @@
 import ollama
 import json
+import os
+import sys
 from vector import retriever
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_router import default_router
+
 def modify_pv_input(input_key: str, value) -> str:
     try:
         with open("pv_inputs.json", "r") as f:
@@ -35,18 +40,19 @@ Do not reference figures, equations, or document locations. Answer as the expert
 Question: {user_input}"""
     
     try:
-        stream = ollama.chat(
-            model="llama3.1:8b",
-            messages=[{"role": "user", "content": expert_prompt}],
-            stream=True
-        )
+        with default_router.route("tool_answer") as route:
+            stream = ollama.chat(
+                model=route.model,
+                messages=[{"role": "user", "content": expert_prompt}],
+                stream=True
+            )
         
-        response_text = ""
-        for chunk in stream:
-            if "message" in chunk and "content" in chunk["message"]:
-                content = chunk["message"]["content"]
-                print(content, end="", flush=True)
-                response_text += content
+            response_text = ""
+            for chunk in stream:
+                if "message" in chunk and "content" in chunk["message"]:
+                    content = chunk["message"]["content"]
+                    print(content, end="", flush=True)
+                    response_text += content
         
         return f"Question answered: {response_text[:100]}..."
         
@@ -94,20 +100,21 @@ def route_to_modification_model(user_input: str) -> str:
 The user wants to modify a parameter. Use the modify_pv_input tool to make the requested change."""
     
     try:
-        stream = ollama.chat(
-            model="llama3.1:8b",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input}
-            ],
-            tools=tools,
-            stream=True
-        )
+        with default_router.route("tool_parameter_extraction") as route:
+            stream = ollama.chat(
+                model=route.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_input}
+                ],
+                tools=tools,
+                stream=True
+            )
         
-        tool_calls = []
-        for chunk in stream:
-            if "message" in chunk and "tool_calls" in chunk["message"]:
-                tool_calls.extend(chunk["message"]["tool_calls"])
+            tool_calls = []
+            for chunk in stream:
+                if "message" in chunk and "tool_calls" in chunk["message"]:
+                    tool_calls.extend(chunk["message"]["tool_calls"])
         
         if tool_calls:
             results = []
@@ -190,17 +197,18 @@ User input: {user_message}
 Use the appropriate routing tool to handle this request."""
     
     try:
-        stream = ollama.chat(
-            model="llama3.1:8b",
-            messages=[{"role": "user", "content": classifier_prompt}],
-            tools=routing_tools,
-            stream=True
-        )
+        with default_router.route("tool_classification") as route:
+            stream = ollama.chat(
+                model=route.model,
+                messages=[{"role": "user", "content": classifier_prompt}],
+                tools=routing_tools,
+                stream=True
+            )
         
-        tool_calls = []
-        for chunk in stream:
-            if "message" in chunk and "tool_calls" in chunk["message"]:
-                tool_calls.extend(chunk["message"]["tool_calls"])
+            tool_calls = []
+            for chunk in stream:
+                if "message" in chunk and "tool_calls" in chunk["message"]:
+                    tool_calls.extend(chunk["message"]["tool_calls"])
         
         if tool_calls:
             for tool_call in tool_calls:
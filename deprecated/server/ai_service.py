@@ -1,10 +1,18 @@
+from functools import cache
 from langchain_ollama.llms import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
 from ai.vector import get_retriever_for_api
+from prompt_cache import KEEP_ALIVE, static_prefix
+from reasoning import stream_with_policy
+from model_router import default_router
 
-model = OllamaLLM(model="deepseek-r1:1.5b")
+@cache
+def ollama_model(model):
+    return OllamaLLM(model=model, keep_alive=KEEP_ALIVE)
 
-template = """
+# Static instructions come first and are never formatted, so Ollama can reuse their cached prefix.
+# Retrieved context and the question only appear after it.
+prefix = static_prefix("ask", """
 You are an expert in Power Systems and Electrical Engineering, more specifically in Voltage Stability
 and the application of Power-Voltage PV Curves (Nose Curves).
 
@@ -21,23 +29,26 @@ you are pulling information from somewhere, it should just know the answer as if
 
 Do not just spit out all of the relevant information, you should analyze it thoroughly and provide a concise explanation catered to the question.
 
-Here is that relevant information: {context}
+If you don't understand the question or prompt, don't try to relate it to PV curves and ask the user to rephrase it or clarify it.
+""")
 
-That is your relevant information to work with, but if you don't understand the following question or prompt don't try to relate it to PV curves and ask the user
-to rephrase it or clarify it.
+template = """
+Here is that relevant information: {context}
 
 Here is the question to answer, be sure to keep your answer concise and ensure accuracy: {question}
 """
 
-prompt = ChatPromptTemplate.from_template(template)
-chain = prompt | model
+prompt = ChatPromptTemplate.from_messages([("system", prefix), ("human", template)])
 
 retriever = None
 
-def get_ai_response_stream(question):
+def get_ai_response_stream(question, metrics=None):
     """
     Generator function that yields AI response chunks as they're generated.
     Used for streaming responses to the frontend.
+
+    Reasoning tokens are handled by the "/ask" policy in reasoning.py; `metrics`, if given, is filled with the
+    thinking/answer token counts once the stream finishes.
     """
     global retriever
     
@@ -52,8 +63,13 @@ def get_ai_response_stream(question):
     try:
         context = retriever.invoke(question)
         
-        for chunk in chain.stream({"context": context, "question": question}):
-            yield chunk
+        with default_router.route("reasoning_answer") as route:
+            model = ollama_model(route.model)
+            for chunk in stream_with_policy(prompt, model, {"context": context, "question": question}, "/ask", metrics):
+                yield chunk
+
+        if metrics is not None:
+            metrics["model_route"] = route.as_dict()
             
     except Exception as e:
         yield f"Error processing your question: {str(e)}. Please try again."
@@ -72,8 +88,10 @@ def get_ai_response(question):
         context = retriever.invoke(question)
         
         response = ""
-        for chunk in chain.stream({"context": context, "question": question}):
-            response += chunk
+        with default_router.route("reasoning_answer") as route:
+            model = ollama_model(route.model)
+            for chunk in stream_with_policy(prompt, model, {"context": context, "question": question}, "/ask"):
+                response += chunk
         
         return response
     except Exception as e:
@@ -0,0 +1,126 @@
+"""
+Benchmark time-to-first-token of the response prompt with and without a stable static prefix.
+
+The "legacy" layout formats the retrieved context into the system prompt, the way the agent and ai_service.py
+used to, so the conversation history that follows it starts at a different position on every turn. The
+"prefix" layout sends the unformatted system prompt first, then the history, then the context and question.
+Each layout replays the same conversation with a different context and question on every turn, so only the
+static prompt and the history can be reused from Ollama's cache.
+
+Requires a running Ollama server with the model pulled:
+
+    python benchmark_prompt_cache.py --model llama3.2:1b --requests 8
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import ollama
+from prompt_cache import KEEP_ALIVE, static_prefix, build_messages, prefix_digests
+
+PROMPTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent", "prompts.json")
+
+QUESTIONS = [
+    "What is the nose point of a PV curve?",
+    "Why does reactive power matter for voltage stability?",
+    "How does load modelling change a PV curve?",
+    "What is a voltage stability margin?",
+    "How do line outages affect the PV curve?",
+    "What causes voltage collapse?",
+    "How is a PV curve generated with continuation power flow?",
+    "What does the lower half of a PV curve represent?"
+]
+
+def fake_context(i):
+    """Stand-in for retrieved documents; different on every request, like real retrieval."""
+    return "\n\n".join(
+        f"Document {i}.{j}: As the transfer to the load area increases, the voltage at bus {10 + i + j} drops "
+        f"until the operating point reaches the maximum loadability of {400 + 37 * i + j} MW."
+        for j in range(10)
+    )
+
+def fake_history(i):
+    """Earlier turns of the conversation, grown by one question and answer per request."""
+    history = []
+    for j in range(i):
+        history.append({"role": "user", "content": QUESTIONS[j % len(QUESTIONS)]})
+        history.append({"role": "assistant", "content": f"Answer {j}: " + "The bus voltage falls as the transfer grows. " * 12})
+    return history
+
+def legacy_messages(prompts, context, question, history):
+    system = prompts["response_agent"]["system"].replace(
+        "\n\nIf you don't understand",
+        f"\n\nHere is that relevant information: {context}\n\nIf you don't understand"
+    )
+    return [
+        {"role": "system", "content": system},
+        *history,
+        {"role": "user", "content": f"Here is the question to answer, be sure to keep your answer concise and ensure accuracy: {question}"}
+    ]
+
+def prefix_messages(prompts, context, question, history):
+    return build_messages(
+        static_prefix("response_agent", prompts["response_agent"]["system"]),
+        prompts["response_agent"]["user"].format(context=context, user_input=question),
+        history=history
+    )
+
+def run_layout(model, build, prompts, requests):
+    results = []
+    for i in range(requests):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        start = time.perf_counter()
+        first_token = None
+        final = {}
+
+        # num_predict is kept small: only prefill and the first tokens matter here.
+        for chunk in ollama.chat(
+            model=model,
+            messages=build(prompts, fake_context(i), question, fake_history(i)),
+            stream=True,
+            keep_alive=KEEP_ALIVE,
+            options={"num_predict": 16}
+        ):
+            if first_token is None and chunk["message"]["content"]:
+                first_token = time.perf_counter() - start
+            if chunk.get("done"):
+                final = chunk
+
+        results.append({
+            "ttft_s": first_token,
+            "total_s": time.perf_counter() - start,
+            "prompt_tokens": final.get("prompt_eval_count"),
+            "prompt_eval_s": (final.get("prompt_eval_duration") or 0) / 1e9
+        })
+    return results
+
+def summarise(results):
+    # The first request of each layout pays for a cold cache in both cases and is reported separately.
+    warm = results[1:] or results
+    return {
+        "first_ttft_s": results[0]["ttft_s"],
+        "median_ttft_s": statistics.median(r["ttft_s"] for r in warm if r["ttft_s"] is not None),
+        "median_prompt_eval_s": statistics.median(r["prompt_eval_s"] for r in warm),
+        "median_prompt_tokens": statistics.median(r["prompt_tokens"] or 0 for r in warm)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default="llama3.2:1b")
+    parser.add_argument("--requests", type=int, default=8)
+    args = parser.parse_args()
+
+    with open(PROMPTS_FILE, "r") as f:
+        prompts = json.load(f)
+
+    report = {}
+    for name, build in [("legacy", legacy_messages), ("prefix", prefix_messages)]:
+        report[name] = summarise(run_layout(args.model, build, prompts, args.requests))
+
+    report["ttft_reduction"] = 1 - report["prefix"]["median_ttft_s"] / report["legacy"]["median_ttft_s"]
+    report["prefix_digests"] = prefix_digests()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Central model routing for every LLM task in the project.
+
+Each task maps to a list of model tiers, preferred (largest) first, and a latency SLO. The router estimates how
+long a new request would queue behind the requests already in flight on each model and picks the first tier
+that meets the SLO, so under load requests spill over to smaller, faster models instead of piling up behind
+the large one. Every routed request is recorded with the tier that served it.
+"""
+from collections import deque
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+# Models per task, preferred tier first. slo_s is the longest a request may queue before it is sent to the
+# next tier down. Tier 0 of each task is the model its caller used before routing; the reasoning policies of
+# reasoning.py are tuned for deepseek-r1, and "off" and "hidden" pass a model without <think> output unchanged.
+MODEL_TIERS = {
+    # LangGraph agent (agent/main.py).
+    "classification": {"tiers": ["llama3.2:1b"], "slo_s": 0.5},
+    "parameter_extraction": {"tiers": ["llama3.2:1b"], "slo_s": 1.0},
+    "rag_answer": {"tiers": ["llama3.2:1b"], "slo_s": 2.0},
+    "summarisation": {"tiers": ["llama3.2:1b"], "slo_s": 10.0},
+    # /ask (ai_service.py) and the interactive CLI (ai/interactive_main.py).
+    "reasoning_answer": {"tiers": ["deepseek-r1:1.5b", "llama3.2:1b"], "slo_s": 2.0},
+    "command_detection": {"tiers": ["deepseek-r1:1.5b", "llama3.2:1b"], "slo_s": 0.5},
+    "input_extraction": {"tiers": ["deepseek-r1:1.5b", "llama3.2:1b"], "slo_s": 1.0},
+    # Tool-calling CLI (ai/main2.py).
+    "tool_classification": {"tiers": ["llama3.1:8b", "llama3.2:1b"], "slo_s": 0.5},
+    "tool_parameter_extraction": {"tiers": ["llama3.1:8b", "llama3.2:1b"], "slo_s": 1.0},
+    "tool_answer": {"tiers": ["llama3.1:8b", "llama3.2:1b"], "slo_s": 2.0}
+}
+
+# Requests Ollama serves concurrently per loaded model; further requests queue.
+PARALLEL_REQUESTS = int(os.environ.get("OLLAMA_NUM_PARALLEL", "1"))
+# Weight of the newest request in the moving average of service time.
+EWMA_ALPHA = 0.3
+
+class Route:
+    """The model chosen for one request."""
+
+    def __init__(self, task, model, tier, predicted_wait_s):
+        self.task = task
+        self.model = model
+        self.tier = tier
+        self.predicted_wait_s = predicted_wait_s
+        self.duration_s = None
+
+    def as_dict(self):
+        return {
+            "task": self.task,
+            "model": self.model,
+            "tier": self.tier,
+            "degraded": self.tier > 0,
+            "predicted_wait_s": self.predicted_wait_s,
+            "duration_s": self.duration_s
+        }
+
+class ModelRouter:
+    def __init__(self, tiers=MODEL_TIERS, parallel=PARALLEL_REQUESTS):
+        self.tiers = tiers
+        self.parallel = parallel
+        self.in_flight = {}
+        self.service_s = {}
+        self.log = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def predicted_wait(self, model):
+        """Estimated queue time of a new request on `model`, from requests in flight and recent service times."""
+        queued = max(0, self.in_flight.get(model, 0) + 1 - self.parallel)
+        return queued * self.service_s.get(model, 0.0) / self.parallel
+
+    def choose(self, task):
+        """Pick the first tier of `task` whose predicted wait meets the SLO, or the least loaded tier."""
+        policy = self.tiers[task]
+
+        with self._lock:
+            waits = [self.predicted_wait(model) for model in policy["tiers"]]
+            tier = next((i for i, wait in enumerate(waits) if wait <= policy["slo_s"]), None)
+            if tier is None:
+                tier = min(range(len(waits)), key=waits.__getitem__)
+
+            model = policy["tiers"][tier]
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+
+        return Route(task, model, tier, waits[tier])
+
+    def release(self, route, duration_s):
+        with self._lock:
+            self.in_flight[route.model] -= 1
+            previous = self.service_s.get(route.model)
+            self.service_s[route.model] = duration_s if previous is None else (
+                EWMA_ALPHA * duration_s + (1 - EWMA_ALPHA) * previous
+            )
+            route.duration_s = duration_s
+            self.log.append(route.as_dict())
+
+    @contextmanager
+    def route(self, task):
+        """
+        Reserve a model for one request of `task` for the duration of the block.
+
+        Example:
+            with router.route("classification") as route:
+                ollama.chat(model=route.model, ...)
+        """
+        route = self.choose(task)
+        start = time.perf_counter()
+        try:
+            yield route
+        finally:
+            self.release(route, time.perf_counter() - start)
+
+    def tier_counts(self):
+        """Requests served per (task, model) in the recent log."""
+        counts = {}
+        with self._lock:
+            for entry in self.log:
+                key = f"{entry['task']}:{entry['model']}"
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+class RoutedModel:
+    """
+    Stand-in for a model client that lets the router choose the model on every call.
+
+    Args:
+        task (str): Key into MODEL_TIERS.
+        factory (callable): Builds the client (e.g. a ChatOllama) for a model name.
+    """
+
+    def __init__(self, task, factory, router=None):
+        self.task = task
+        self.factory = factory
+        self.router = router or default_router
+
+    def invoke(self, input, **kwargs):
+        with self.router.route(self.task) as route:
+            return self.factory(route.model).invoke(input, **kwargs)
+
+    def stream(self, input, **kwargs):
+        with self.router.route(self.task) as route:
+            yield from self.factory(route.model).stream(input, **kwargs)
+
+default_router = ModelRouter()
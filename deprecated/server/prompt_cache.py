@@ -0,0 +1,54 @@
+"""
+Prompt assembly around byte-identical static prefixes.
+
+Ollama keeps the KV cache of the last prompt a loaded model processed and only evaluates the tokens after
+the first point where a new prompt differs. Every route therefore sends its long static instructions first,
+unformatted and identical on every request, and appends the dynamic parts (history, retrieved context,
+question) after them. Anything formatted into the static text would move that divergence point to the top
+of the prompt and force a full prefill.
+"""
+import hashlib
+
+# How long Ollama keeps a model (and its cached prefix) loaded after a request.
+KEEP_ALIVE = "30m"
+
+_prefixes = {}
+
+def static_prefix(route, text):
+    """
+    Register the static prefix of a route and return it unchanged.
+
+    Args:
+        route (str): Name of the prompt route, e.g. "response_agent".
+        text (str): Static instructions sent at the start of every prompt on that route.
+
+    Returns:
+        str: `text`, guaranteed to be the same bytes every time the route is registered.
+    """
+    if "{" in text or "}" in text:
+        raise ValueError(f"Static prefix for '{route}' contains a template field; move it to the dynamic part.")
+
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if _prefixes.setdefault(route, digest) != digest:
+        raise ValueError(f"Static prefix for '{route}' changed between requests.")
+
+    return text
+
+def prefix_digests():
+    """SHA-256 of each registered prefix, for logging and benchmark reports."""
+    return dict(_prefixes)
+
+def build_messages(prefix, dynamic, history=()):
+    """
+    Assemble chat messages as static prefix, then history, then the dynamic user turn.
+
+    Args:
+        prefix (str): Value returned by `static_prefix`.
+        dynamic (str): Retrieved context and question for this request.
+        history (iterable): Earlier messages of the conversation, oldest first.
+    """
+    return [
+        {"role": "system", "content": prefix},
+        *history,
+        {"role": "user", "content": dynamic}
+    ]
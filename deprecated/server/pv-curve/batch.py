@@ -0,0 +1,181 @@
+"""
+Batched Newton-Raphson power flow for many scenarios of one topology.
+
+Scenarios are rows of (n_scenarios, n_bus) injection and voltage arrays. Every iteration evaluates mismatches,
+Jacobian values and voltage updates for all active scenarios in array operations. The per-scenario Jacobians
+form one block-diagonal system that is factorized in a single sparse LU call. A scenario leaves the active set
+as soon as it converges (or diverges), so late iterations only pay for the scenarios still iterating.
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from loads import BusLoads
+from powerflow import MAX_ITERATIONS, JacobianPattern, SparseLU
+
+class BatchPowerFlowResult:
+    """
+    Outcome of a batched solve; every array has one entry (or row) per scenario.
+
+    Attributes:
+        V (np.ndarray): Complex voltages, shape (n_scenarios, n_bus).
+        converged (np.ndarray): Convergence flags.
+        iterations (np.ndarray): Newton iterations each scenario took.
+        mismatch (np.ndarray): Largest final P/Q mismatch in per-unit.
+        factorizations (int): Block-diagonal LU factorizations performed.
+    """
+
+    def __init__(self, V, converged, iterations, mismatch, factorizations):
+        self.V = V
+        self.converged = converged
+        self.iterations = iterations
+        self.mismatch = mismatch
+        self.factorizations = factorizations
+
+class BatchSolver:
+    """
+    Solves stacks of scenarios that share one network, Ybus and PV/PQ classification.
+
+    The block-diagonal structure and its LU ordering are cached per number of active scenarios, so repeated
+    batches of the same size only pay for numeric factorizations.
+
+    Args:
+        net (Network): Network to solve.
+        ybus (scipy.sparse.csr_matrix, optional): Admittance matrix override, e.g. for a contingency.
+        pattern (JacobianPattern, optional): Precomputed Jacobian structure.
+    """
+
+    def __init__(self, net, ybus=None, pattern=None):
+        self.net = net
+        self.ybus = net.ybus if ybus is None else ybus
+        self.pattern = pattern if pattern is not None and pattern.matches(self.ybus) else \
+            JacobianPattern(self.ybus, net.pv, net.pq)
+        self.blocks = {}
+
+    def block_structure(self, k):
+        """(indices, indptr, SparseLU) of the block-diagonal Jacobian of k scenarios."""
+        if k not in self.blocks:
+            p = self.pattern
+            nnz = len(p.indices)
+            offsets = np.arange(k)[:, None]
+            indices = (p.indices[None, :] + p.dim * offsets).ravel().astype(np.int32)
+            indptr = np.r_[(p.indptr[None, :-1] + nnz * offsets).ravel(), k * nnz].astype(np.int32)
+            self.blocks[k] = (indices, indptr, SparseLU())
+        return self.blocks[k]
+
+    def factorize(self, values):
+        """
+        Factorize the block-diagonal Jacobian of the active scenarios.
+
+        Returns:
+            tuple: (Factorization or None, mask of scenarios whose own Jacobian is singular)
+        """
+        k = len(values)
+        indices, indptr, lu = self.block_structure(k)
+        dim = self.pattern.dim
+        blocks = sp.csc_matrix((values.ravel(), indices, indptr), shape=(k * dim, k * dim))
+        try:
+            return lu.factorize(blocks), np.zeros(k, dtype=bool)
+        except RuntimeError:
+            pass
+
+        # One singular scenario makes the whole block system singular; find it, the caller drops it.
+        singular = np.zeros(k, dtype=bool)
+        for i in range(k):
+            try:
+                splu(sp.csc_matrix((values[i], self.pattern.indices, self.pattern.indptr), shape=self.pattern.shape))
+            except RuntimeError:
+                singular[i] = True
+        return None, singular
+
+    def solve_each(self, values, F):
+        """
+        Newton steps of the active scenarios one at a time, for when their block system will not factorize.
+
+        Returns:
+            tuple: (steps, mask of scenarios whose own Jacobian is singular, with zero steps)
+        """
+        dx = np.zeros_like(F)
+        singular = np.zeros(len(values), dtype=bool)
+        for i in range(len(values)):
+            try:
+                J = sp.csc_matrix((values[i], self.pattern.indices, self.pattern.indptr), shape=self.pattern.shape)
+                dx[i] = splu(J).solve(-F[i])
+            except RuntimeError:
+                singular[i] = True
+        return dx, singular
+
+    def solve(self, Sbus, V0=None, tol=1e-8, max_iter=MAX_ITERATIONS, load=None):
+        """
+        Solve every scenario.
+
+        Args:
+            Sbus (np.ndarray): Complex injections in per-unit, shape (n_scenarios, n_bus).
+            V0 (np.ndarray, optional): Initial voltages, shape (n_bus,) or (n_scenarios, n_bus). Defaults to a
+                flat start.
+            tol (float): Convergence tolerance on the largest P/Q mismatch, in per-unit.
+            max_iter (int): Newton iterations allowed.
+            load (BusLoads, optional): Voltage dependence of the scheduled loads; its nominal loads have shape
+                (n_bus,) or (n_scenarios, n_bus), and its model may have one row of coefficients and exponents
+                per scenario (see LoadModel.stack).
+
+        Returns:
+            BatchPowerFlowResult
+        """
+        Sbus = np.atleast_2d(Sbus)
+        n = len(Sbus)
+        V = np.array(np.broadcast_to(self.net.flat_start() if V0 is None else V0, Sbus.shape), dtype=complex)
+        if load is not None:
+            if load.model.per_scenario and len(load.model.coefficients) != n:
+                raise ValueError(f"Load model has {len(load.model.coefficients)} scenarios, Sbus has {n}")
+            load = BusLoads(load.model, np.broadcast_to(load.S, Sbus.shape))
+
+        converged = np.zeros(n, dtype=bool)
+        iterations = np.full(n, max_iter)
+        worst = np.full(n, np.inf)
+        active = np.arange(n)
+        factorizations = 0
+
+        for iteration in range(max_iter + 1):
+            active_load = load[active] if load is not None else None
+            F = self.pattern.mismatch(self.ybus, V[active], Sbus[active], active_load)
+            worst[active] = np.abs(F).max(axis=1) if F.shape[1] else 0.0
+
+            done = worst[active] < tol
+            converged[active[done]] = True
+            leaving = done | ~np.isfinite(worst[active])
+            iterations[active[leaving]] = iteration
+            active, F = active[~leaving], F[~leaving]
+            if not len(active) or iteration == max_iter:
+                break
+
+            values = self.pattern.values(self.ybus, V[active], active_load)
+            lu, singular = self.factorize(values)
+            if lu is None:
+                iterations[active[singular]] = iteration
+                active, F, values = active[~singular], F[~singular], values[~singular]
+                if not len(active):
+                    break
+                lu, _ = self.factorize(values)
+
+            if lu is None:
+                # The remaining Jacobians each factorize on their own but their block system still does not: step
+                # each scenario alone.
+                dx, singular = self.solve_each(values, F)
+                iterations[active[singular]] = iteration
+                active, dx = active[~singular], dx[~singular]
+            else:
+                factorizations += 1
+                dx = lu.solve(-F.ravel()).reshape(F.shape)
+            V[active] = self.pattern.update(V[active], dx)
+
+        return BatchPowerFlowResult(V, converged, iterations, worst, factorizations)
+
+def solve_power_flow_batch(net, Sbus, V0=None, tol=1e-8, max_iter=MAX_ITERATIONS, ybus=None, pattern=None,
+                           load=None):
+    """
+    Solve a stack of scenarios of one network; see BatchSolver.solve.
+
+    Returns:
+        BatchPowerFlowResult
+    """
+    return BatchSolver(net, ybus, pattern).solve(Sbus, V0, tol, max_iter, load)
@@ -0,0 +1,978 @@
+"""
+Benchmarks for the PV-curve engine.
+
+Run from /server/pv-curve:
+
+    python benchmark.py powerflow
+    python benchmark.py continuation
+    python benchmark.py contingencies
+    python benchmark.py critical
+    python benchmark.py factorization
+    python benchmark.py batch
+    python benchmark.py loads
+    python benchmark.py limits
+    python benchmark.py cache
+    python benchmark.py parse
+    python benchmark.py store
+    python benchmark.py incremental
+    python benchmark.py capture
+    python benchmark.py plots
+    python benchmark.py kernels
+    python benchmark.py scaling
+    python benchmark.py reduction
+    python benchmark.py screening
+    python benchmark.py suite [--baseline benchmark-baseline.json] [--tolerance 0.1]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import kernels
+import powerflow
+from batch import BatchSolver
+from caseio import read_case_file, write_matpower, write_psse_raw
+from cases import load_case, tile_network
+from contingency import find_critical_contingencies, generate_pv_curves, sweep_contingencies
+from continuation import compare_with_step_reduction, generate_pv_curve
+from curvestore import CurveStore, cached_pv_curve
+from incremental import PVSession
+from loads import BusLoads, LoadModel
+from netcache import NetworkCache, network_hash
+from plots import MAX_POINTS, PlotService, curve_series, decimate, lttb
+from powerflow import JacobianPattern, solve_power_flow
+from qlimits import QLimitPattern
+from reduction import METHODS, compare_with_full
+from screening import rank_monitor_buses
+
+# Cases used by the power-flow benchmark.
+POWERFLOW_CASES = ["IEEE 14", "IEEE 39", "IEEE 118", "IEEE 300"]
+# Minimum wall time spent on each case, so small cases are timed over many solves.
+MIN_SECONDS = 1.0
+# PV studies used by the continuation benchmark: (grid_model, source_buses, sink_buses).
+CONTINUATION_STUDIES = [
+    ("IEEE 14", [2, 3], [9, 14]),
+    ("IEEE 39", [30, 32, 33], [4, 8]),
+    ("IEEE 118", [10, 12, 25], [60, 78]),
+    ("IEEE 300", [8, 10, 20], [192, 120])
+]
+# Study and number of branch outages used by the contingency sweep benchmark.
+CONTINGENCY_STUDY = ("IEEE 118", [10, 12, 25], [60, 78])
+CONTINGENCY_COUNT = 32
+# Scenarios per case in the batch benchmark, each scaling every load by a random factor in this range.
+BATCH_SCENARIOS = 200
+BATCH_LOAD_SCALE = (0.9, 1.1)
+# Range of the per-scenario voltage exponents in the batch benchmark.
+BATCH_EXPONENTS = (0.0, 2.0)
+# Load models compared by the load benchmark.
+LOAD_MODELS = {
+    "constant_power": None,
+    "constant_current": LoadModel.exponential(1.0),
+    "exponential_1.5": LoadModel.exponential(1.5),
+    "zip_30_30_40": LoadModel.zip(0.3, 0.3, 0.4)
+}
+# Studies used by the critical contingency benchmark; every branch outage is screened.
+CRITICAL_STUDIES = [
+    ("IEEE 39", [30, 32, 33], [4, 8]),
+    ("IEEE 118", [10, 12, 25], [60, 78])
+]
+# Worker processes the critical contingency search and the full sweep run with.
+CRITICAL_WORKERS = [1, 4]
+# Studies used by the generator limit benchmark. IEEE 300 has no base case within its generators' limits.
+LIMIT_STUDIES = CONTINUATION_STUDIES[:3]
+
+# Synthetic large cases read by the parse benchmark: copies of this case tied together.
+PARSE_CASE = "IEEE 300"
+PARSE_COPIES = [1, 10, 100]
+# Edits replayed by the store benchmark, as an agent session makes them: most touch inputs the curve does not
+# depend on, or restate a value in another spelling.
+STORE_EDITS = [
+    {}, {"frequency": 50}, {"agc_tolerance": "3"}, {"include_contingencies": "yes"}, {"min_step": 5},
+    {"critical_scenarios": 3}, {"monitor_bus": "{sink}"}, {"grid_model": "case{n}"}, {"min_step": 10},
+    {"run_base_completion": "false"}
+]
+# Studies used by the voltage capture benchmark: (grid_model, copies tiled, source_buses, sink_buses).
+CAPTURE_STUDIES = [
+    ("IEEE 39", 1, [30, 32, 33], [4, 8]),
+    ("IEEE 118", 17, [10, 12, 25], [60, 78])
+]
+# Point counts of the synthetic dense curves decimated by the plot benchmark.
+PLOT_POINTS = [1000, 10000, 100000]
+# Scenarios of the suite benchmark: inputs.py parameter sets, with "tile" copies for synthetic large cases.
+SUITE_SCENARIOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark-scenarios.json")
+# Relative growth over a baseline run reported as a regression, per metric. Counts are deterministic; wall
+# time is not (runs on a shared single-core machine vary by 30%), so it gets a wide band. The nose is checked
+# in both directions.
+SUITE_TOLERANCES = {
+    "seconds": 0.5, "peak_mb": 0.10, "solves": 0.02, "iterations": 0.02, "factorizations": 0.02, "nose_mw": 0.01
+}
+TWO_SIDED_METRICS = {"nose_mw"}
+# Copies of IEEE 118 tiled by the scaling benchmark, from 118 to 35400 buses.
+SCALING_COPIES = [1, 10, 30, 100, 300]
+SCALING_STUDY = ("IEEE 118", [10, 12, 25], [60, 78])
+# Studies of the reduction benchmark: (grid_model, copies tiled, source_buses, sink_buses, generator_limits),
+# each reduced to the buses within these depths of its study buses. IEEE 300 has no base case within its
+# generators' limits.
+REDUCTION_STUDIES = [
+    ("IEEE 118", 1, [10, 12, 25], [60, 78], True),
+    ("IEEE 300", 1, [8, 10, 20], [192, 120], False),
+    ("IEEE 118", 100, [10, 12, 25], [60, 78], False)
+]
+REDUCTION_DEPTHS = [3, 5]
+# Studies of the screening benchmark: (grid_model, copies tiled, source_buses, sink_buses, generator_limits).
+SCREENING_STUDIES = [
+    ("IEEE 14", 1, [2, 3], [9, 14], False),
+    ("IEEE 30", 1, [2, 5], [26, 30], False),
+    ("IEEE 57", 1, [1, 3], [31, 33], False),
+    ("IEEE 118", 1, [10, 12, 25], [60, 78], False),
+    ("IEEE 118", 1, [10, 12, 25], [60, 78], True),
+    ("IEEE 118", 1, [69, 89], [20, 44, 52], False),
+    ("IEEE 118", 1, [100, 103], [1, 3, 6], False),
+    ("IEEE 300", 1, [8, 10, 20], [192, 120], False),
+    ("IEEE 118", 100, [10, 12, 25], [60, 78], False)
+]
+# Edits replayed by the incremental benchmark, each on top of the previous ones.
+INCREMENTAL_EDITS = [
+    {"max_transfer": 500}, {"max_transfer": 1000}, {"max_transfer": 700}, {"max_transfer": 0},
+    {"monitor_bus": "{sink}"}, {"min_step": 2}, {"initial_step": 50}, {"frequency": 50}
+]
+
+def study_inputs(grid_model, source_buses, sink_buses, **inputs):
+    """PV inputs of a benchmark study. Generator limits are off unless asked for, to isolate the engine cost."""
+    return {
+        "grid_model": grid_model, "source_buses": source_buses, "sink_buses": sink_buses,
+        "generator_limits": False, **inputs
+    }
+
+def bench_powerflow(cases=POWERFLOW_CASES, tol=1e-8):
+    """Flat-start Newton-Raphson solves per second for each case."""
+    results = []
+    for grid_model in cases:
+        net = load_case(grid_model)
+        pattern = JacobianPattern(net.ybus, net.pv, net.pq)
+
+        solves = 0
+        start = time.perf_counter()
+        while True:
+            result = solve_power_flow(net, tol=tol, pattern=pattern)
+            solves += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= MIN_SECONDS:
+                break
+
+        results.append({
+            "case": grid_model,
+            "buses": net.n_bus,
+            "converged": result.converged,
+            "iterations": result.iterations,
+            "solves_per_s": solves / elapsed,
+            "ms_per_solve": 1000 * elapsed / solves
+        })
+    return results
+
+def bench_continuation(studies=CONTINUATION_STUDIES):
+    """
+    Solves to the nose of the continuation trace versus pure step reduction, with generator limits off and with
+    the default limits on. A study whose base case does not converge with limits on is left out of that run.
+    """
+    results = []
+    for grid_model, source_buses, sink_buses in studies:
+        for limits in (False, True):
+            inputs = study_inputs(grid_model, source_buses, sink_buses, generator_limits=limits)
+            start = time.perf_counter()
+            try:
+                comparison = compare_with_step_reduction(inputs)
+            except RuntimeError:
+                if not limits:
+                    raise
+                continue
+            results.append({
+                "case": grid_model, "generator_limits": limits, **comparison, "seconds": time.perf_counter() - start
+            })
+    return results
+
+def bench_factorization(studies=CONTINUATION_STUDIES):
+    """Factorizations and wall time per curve with and without dishonest Newton."""
+    results = []
+    for grid_model, source_buses, sink_buses in studies:
+        net = load_case(grid_model)
+        inputs = study_inputs(grid_model, source_buses, sink_buses)
+        for reuse in (False, True):
+            curves = 0
+            start = time.perf_counter()
+            while True:
+                curve = generate_pv_curve(inputs, net, reuse_factorization=reuse)
+                curves += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= MIN_SECONDS:
+                    break
+
+            results.append({
+                "case": grid_model,
+                "reuse": reuse,
+                "solves": curve.stats["solves"],
+                "iterations": curve.stats["iterations"],
+                "factorizations": curve.stats["factorizations"],
+                "nose_mw": curve.nose_transfer,
+                "ms_per_curve": 1000 * elapsed / curves
+            })
+    return results
+
+def bench_batch(cases=POWERFLOW_CASES, scenarios=BATCH_SCENARIOS, tol=1e-8):
+    """
+    A Python loop of single solves versus one batched solve of the same load scenarios: constant-power loads,
+    then a load model per scenario (cycling through LOAD_MODELS) and a voltage exponent per scenario.
+    """
+    rng = np.random.default_rng(0)
+    results = []
+    for grid_model in cases:
+        net = load_case(grid_model)
+        load = net.Pd + 1j * net.Qd
+        Sbus = net.sbus() + load * (1 - rng.uniform(*BATCH_LOAD_SCALE, (scenarios, net.n_bus)))
+        pattern = JacobianPattern(net.ybus, net.pv, net.pq)
+        solver = BatchSolver(net, pattern=pattern)
+
+        models = [model or LoadModel.exponential(0.0) for model in LOAD_MODELS.values()]
+        per_scenario = {
+            "constant_power": None,
+            "load_models": [models[i % len(models)] for i in range(scenarios)],
+            "voltage_exponents": [LoadModel.exponential(n) for n in rng.uniform(*BATCH_EXPONENTS, scenarios)]
+        }
+        for loads, scenario_models in per_scenario.items():
+            singles = [None] * scenarios if scenario_models is None else [BusLoads(m, load) for m in scenario_models]
+            stacked = None if scenario_models is None else BusLoads(LoadModel.stack(scenario_models), load)
+            # Warm-up: block orderings for every active-set size, and the single solve's first-call costs.
+            solver.solve(Sbus, tol=tol, load=stacked)
+            solve_power_flow(net, Sbus[0], tol=tol, pattern=pattern, load=singles[0])
+
+            start = time.perf_counter()
+            loop = [solve_power_flow(net, S, tol=tol, pattern=pattern, load=single) for S, single in zip(Sbus, singles)]
+            loop_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batch = solver.solve(Sbus, tol=tol, load=stacked)
+            batch_seconds = time.perf_counter() - start
+
+            results.append({
+                "case": grid_model,
+                "loads": loads,
+                "scenarios": scenarios,
+                "converged": int(batch.converged.sum()),
+                "loop_converged": sum(r.converged for r in loop),
+                "loop_ms": 1000 * loop_seconds,
+                "batch_ms": 1000 * batch_seconds,
+                "speedup": loop_seconds / batch_seconds
+            })
+    return results
+
+def bench_loads(cases=POWERFLOW_CASES, models=LOAD_MODELS, tol=1e-8, repeats=7, calls=300):
+    """
+    Cost of voltage-dependent loads relative to constant power: mismatch plus Jacobian assembly, and a whole
+    Newton iteration including the LU. Each time is the best of `repeats` runs to suppress timer noise.
+    """
+    def best_time(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            times.append((time.perf_counter() - start) / calls)
+        return min(times)
+
+    results = []
+    for grid_model in cases:
+        net = load_case(grid_model)
+        pattern = JacobianPattern(net.ybus, net.pv, net.pq)
+        Sbus = net.sbus()
+        V = solve_power_flow(net, tol=tol, pattern=pattern).V
+        baseline = None
+        for name, model in models.items():
+            load = BusLoads(model, net.Pd + 1j * net.Qd) if model is not None else None
+            result = solve_power_flow(net, tol=tol, pattern=pattern, load=load)
+
+            assembly = best_time(lambda: (
+                pattern.mismatch(net.ybus, V, Sbus, load), pattern.values(net.ybus, V, load)
+            ))
+            iteration = best_time(lambda: solve_power_flow(
+                net, tol=tol, pattern=pattern, load=load
+            )) / result.iterations
+
+            baseline = baseline or (assembly, iteration)
+            results.append({
+                "case": grid_model,
+                "load_model": name,
+                "iterations": result.iterations,
+                "assembly_us": 1e6 * assembly,
+                "iteration_us": 1e6 * iteration,
+                "assembly_pct": 100 * (assembly / baseline[0] - 1),
+                "iteration_pct": 100 * (iteration / baseline[1] - 1)
+            })
+    return results
+
+def solve_with_restarts(net, tol):
+    """
+    Reference limit enforcement by outer loop: solve, switch every violating PV bus to PQ at its limit, and
+    re-solve from the last voltages with a Jacobian structure rebuilt for the new PV/PQ split.
+
+    Returns:
+        tuple: (converged, power flows run, Newton iterations, factorizations, switches)
+    """
+    limits = QLimitPattern(net.ybus, net)
+    Sbus = net.sbus()
+    held = np.zeros(len(limits.buses), dtype=bool)
+    V, runs, iterations, factorizations = None, 0, 0, 0
+    while True:
+        pattern = JacobianPattern(net.ybus, limits.buses[~held], np.sort(np.r_[net.pq, limits.buses[held]]))
+        result = solve_power_flow(net, Sbus, V, tol, pattern=pattern)
+        runs += 1
+        iterations += result.iterations
+        factorizations += result.factorizations
+        if not result.converged:
+            return False, runs, iterations, factorizations, int(held.sum())
+
+        V = result.V
+        S = V * np.conj(net.ybus @ V)
+        q = S.imag[limits.buses] - Sbus.imag[limits.buses] + limits.qg
+        over, under = ~held & (q > limits.qmax + tol), ~held & (q < limits.qmin - tol)
+        if not (over | under).any():
+            return True, runs, iterations, factorizations, int(held.sum())
+        q_limit = np.where(over, limits.qmax, limits.qmin)
+        Sbus = Sbus.copy()
+        Sbus.imag[limits.buses[over | under]] += (q_limit - q)[over | under]
+        held |= over | under
+
+def bench_limits(studies=LIMIT_STUDIES, tol=1e-8):
+    """
+    Generator reactive limits: base-case enforcement inside the Newton loop versus re-solving after each round
+    of switches, and the continuation trace with limit events versus without limits.
+    """
+    results = []
+    for grid_model, source_buses, sink_buses in studies:
+        net = load_case(grid_model)
+        pattern = QLimitPattern(net.ybus, net)
+        base = solve_power_flow(net, tol=tol, pattern=pattern)
+        converged, runs, iterations, factorizations, held = solve_with_restarts(net, tol)
+
+        unlimited = generate_pv_curve(study_inputs(grid_model, source_buses, sink_buses), net)
+        inputs = study_inputs(grid_model, source_buses, sink_buses, generator_limits=True)
+        start = time.perf_counter()
+        curve = generate_pv_curve(inputs, net)
+        seconds = time.perf_counter() - start
+
+        stats = curve.stats
+        results.append({
+            "case": grid_model,
+            "base_switches": len(base.limit_events),
+            "iterations": base.iterations,
+            "factorizations": base.factorizations,
+            "restart_switches": held,
+            "restart_runs": runs,
+            "restart_iterations": iterations,
+            "restart_factorizations": factorizations,
+            "restart_converged": converged,
+            "nose_mw": curve.nose_transfer,
+            "unlimited_nose_mw": unlimited.nose_transfer,
+            "limit_events": len(stats["limit_events"]),
+            "solves": stats["solves"],
+            "event_solves": stats["event_solves"],
+            "curve_iterations": stats["iterations"],
+            "event_iterations": stats["event_iterations"],
+            "ms_per_curve": 1000 * seconds
+        })
+    return results
+
+def bench_cache(cases=POWERFLOW_CASES, repeats=20):
+    """Loading a case by conversion from pandapower versus mapping its compiled artifact."""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        cache = NetworkCache(directory)
+        for grid_model in cases:
+            start = time.perf_counter()
+            net = load_case(grid_model, cache=False)
+            convert_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            key = cache.put(net)
+            compile_seconds = time.perf_counter() - start
+
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                mapped = cache.get(key)
+                times.append(time.perf_counter() - start)
+
+            path = cache.path(key)
+            results.append({
+                "case": grid_model,
+                "buses": net.n_bus,
+                "convert_ms": 1000 * convert_seconds,
+                "compile_ms": 1000 * compile_seconds,
+                "cached_load_ms": 1000 * min(times),
+                "artifact_kb": sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1024,
+                "same_network": network_hash(mapped) == key
+            })
+    return results
+
+def bench_parse(grid_model=PARSE_CASE, copies=PARSE_COPIES):
+    """Throughput and peak memory of the streaming MATPOWER and PSS/E readers on tiled copies of a case."""
+    net = load_case(grid_model)
+    V = solve_power_flow(net, tol=1e-8).V
+    writers = {".m": write_matpower, ".raw": write_psse_raw}
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in copies:
+            tiled = tile_network(net, count, V)
+            for extension, write in writers.items():
+                path = os.path.join(directory, f"tiled{count}{extension}")
+                write(tiled, path)
+                parsed, stats = read_case_file(path)
+
+                tracemalloc.start()
+                read_case_file(path)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                results.append({
+                    "format": extension,
+                    "buses": parsed.n_bus,
+                    "branches": parsed.n_branch,
+                    "file_mb": stats.bytes / 1e6,
+                    "seconds": stats.seconds,
+                    "mb_per_s": stats.mb_per_s,
+                    "peak_mb": peak / 1e6,
+                    "same_buses": bool(np.array_equal(parsed.bus_numbers, tiled.bus_numbers))
+                })
+    return results
+
+def bench_store(studies=CONTINUATION_STUDIES[:3], edits=STORE_EDITS):
+    """Replay a session of single-input edits through the curve store; every edit accumulates on the last."""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = CurveStore(directory)
+        for grid_model, source_buses, sink_buses in studies:
+            net = load_case(grid_model)
+            inputs = study_inputs(grid_model, source_buses, sink_buses)
+            hit_times, miss_times = [], []
+            start_hits = store.hits
+            for edit in edits:
+                for key, value in edit.items():
+                    inputs[key] = value.format(sink=sink_buses[0], n=grid_model.split()[-1]) \
+                        if isinstance(value, str) else value
+                start = time.perf_counter()
+                curve = cached_pv_curve(inputs, net, store)
+                (hit_times if curve.stats["store"] == "hit" else miss_times).append(time.perf_counter() - start)
+
+            stats = store.stats()
+            hits = store.hits - start_hits
+            results.append({
+                "case": grid_model,
+                "requests": len(edits),
+                "hit_rate": hits / len(edits),
+                "ms_per_miss": 1000 * np.mean(miss_times),
+                "ms_per_hit": 1000 * np.mean(hit_times),
+                "store_curves": stats["curves"],
+                "store_kb": stats["bytes"] / 1024
+            })
+    return results
+
+def bench_incremental(studies=CONTINUATION_STUDIES[:3], edits=INCREMENTAL_EDITS):
+    """Replay single-input edits through a PVSession, against a full trace of every edited input set."""
+    results = []
+    for grid_model, source_buses, sink_buses in studies:
+        net = load_case(grid_model)
+        inputs = study_inputs(grid_model, source_buses, sink_buses)
+        session = PVSession()
+        session.update(inputs)
+        for edit in edits:
+            for key, value in edit.items():
+                inputs[key] = value.format(sink=sink_buses[0]) if isinstance(value, str) else value
+            curve = session.update(inputs)
+            entry = session.log[-1]
+
+            start = time.perf_counter()
+            full = generate_pv_curve(inputs, net)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "case": grid_model,
+                "edit": ",".join(f"{key}={inputs[key]}" for key in edit),
+                "stage": entry["stage"],
+                "reused_points": entry["reused_points"],
+                "solves": entry["solves"],
+                "full_solves": full.stats["solves"],
+                "ms": 1000 * entry["seconds"],
+                "full_ms": 1000 * elapsed,
+                "nose_mw": curve.nose_transfer,
+                "full_nose_mw": full.nose_transfer
+            })
+    return results
+
+def bench_capture(studies=CAPTURE_STUDIES, lookups=10):
+    """Size and accuracy of the all-bus voltage capture of a curve, and the cost of reading other buses."""
+    results = []
+    for grid_model, copies, source_buses, sink_buses in studies:
+        net = load_case(grid_model)
+        if copies > 1:
+            net = tile_network(net, copies, solve_power_flow(net, tol=1e-8).V)
+        inputs = study_inputs(grid_model, source_buses, sink_buses)
+        buses = net.bus_numbers[np.linspace(0, net.n_bus - 1, lookups).astype(int)]
+        for compression in ("float32", "delta"):
+            curve = generate_pv_curve(inputs, net, compression=compression)
+            capture = curve.bus_voltages
+            exact = np.abs(np.array(curve.states))
+            start = time.perf_counter()
+            for bus in buses:
+                curve.voltage_at(bus)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "case": grid_model,
+                "buses": net.n_bus,
+                "points": len(curve.transfer),
+                "compression": compression,
+                "dtype": str(capture.data.dtype),
+                "capture_kb": capture.nbytes / 1024,
+                "bytes_per_point": capture.nbytes / len(curve.transfer),
+                "states_kb": exact.size * 16 / 1024,
+                "max_error_micro_pu": 1e6 * float(np.abs(capture.array() - exact).max()),
+                "us_per_lookup": 1e6 * elapsed / lookups
+            })
+    return results
+
+def synthetic_curve(points):
+    """Dense PV curve of a two-bus system: transfer 2000 * v * sqrt(1 - v^2) MW for v from 1 to 0.3 p.u."""
+    voltage = np.linspace(0.999, 0.3, points)
+    transfer = 2000 * voltage * np.sqrt(1 - voltage ** 2)
+    nose = int(np.argmax(transfer))
+    return {"transfer": transfer, "voltage": voltage, "lower": np.arange(points) > nose, "nose_index": nose}
+
+def bench_plots(points=PLOT_POINTS, studies=CONTINUATION_STUDIES[:3], repeats=5):
+    """LTTB decimation of dense curves, and plot rendering through PlotService with its cache."""
+    results = []
+    for n in points:
+        curve = synthetic_curve(n)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            index = lttb(curve["transfer"], curve["voltage"], MAX_POINTS, keep=[curve["nose_index"]])
+        results.append({
+            "curve": f"synthetic {n}",
+            "points": n,
+            "kept": len(index),
+            "nose_kept": bool(curve["nose_index"] in index),
+            "decimate_ms": 1000 * (time.perf_counter() - start) / repeats,
+            "render_ms": None,
+            "hit_ms": None,
+            "json_kb": None
+        })
+
+    service = PlotService()
+    try:
+        for grid_model, source_buses, sink_buses in studies:
+            curve = generate_pv_curve(study_inputs(grid_model, source_buses, sink_buses, initial_step=5, min_step=1))
+            series = [curve_series(grid_model, curve)]
+            thinned = decimate(series)[0]
+            service.render(series, title="warm-up").result()
+            start = time.perf_counter()
+            plot = service.render(series).result()
+            rendered = time.perf_counter()
+            service.render(series).result()
+            results.append({
+                "curve": grid_model,
+                "points": len(curve.transfer),
+                "kept": len(thinned["transfer"]),
+                "nose_kept": bool(thinned["transfer"][thinned["nose_index"]] == curve.transfer[curve.nose_index]),
+                "decimate_ms": None,
+                "render_ms": 1000 * (rendered - start),
+                "hit_ms": 1000 * (time.perf_counter() - rendered),
+                "json_kb": len(plot) / 1024
+            })
+    finally:
+        service.close()
+    return results
+
+# Process started by the kernel benchmark: time from importing the engine to the first compiled evaluation.
+FIRST_CALL = """
+import time
+start = time.perf_counter()
+import numpy as np
+from cases import load_case
+from powerflow import JacobianPattern
+net = load_case("IEEE 14")
+pattern = JacobianPattern(net.ybus, net.pv, net.pq)
+loaded = time.perf_counter()
+V = np.ones(net.n_bus, dtype=complex)
+pattern.mismatch(net.ybus, V, net.sbus())
+pattern.values(net.ybus, V)
+print(loaded - start, time.perf_counter() - loaded)
+"""
+
+def bench_kernels(cases=POWERFLOW_CASES, models=LOAD_MODELS, repeats=7, calls=300):
+    """
+    Mismatch and Jacobian values per call with the compiled kernels and with NumPy (best of `repeats`), and the
+    first-call cost of a fresh process with an empty and a warm on-disk compile cache.
+    """
+    if not kernels.ENABLED:
+        raise SystemExit("numba is not installed (or PV_NUMBA=0): only the NumPy path is available")
+
+    def best_us(function):
+        function()
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(calls):
+                function()
+            times.append(time.perf_counter() - start)
+        return 1e6 * min(times) / calls
+
+    results = []
+    for grid_model in cases:
+        net = load_case(grid_model)
+        pattern = JacobianPattern(net.ybus, net.pv, net.pq)
+        V = solve_power_flow(net, tol=1e-8, pattern=pattern).V
+        Sbus = net.sbus()
+        for model_name, model in models.items():
+            load = BusLoads(model, net.Pd + 1j * net.Qd) if model is not None else None
+            row = {"case": grid_model, "load_model": model_name}
+            for jit in (False, True):
+                pattern.jit = jit
+                path = "numba" if jit else "numpy"
+                row[f"mismatch_us_{path}"] = best_us(lambda: pattern.mismatch(net.ybus, V, Sbus, load))
+                row[f"values_us_{path}"] = best_us(lambda: pattern.values(net.ybus, V, load))
+            row["speedup"] = (row["mismatch_us_numpy"] + row["values_us_numpy"]) / \
+                (row["mismatch_us_numba"] + row["values_us_numba"])
+            results.append({**row, "import_ms": None, "first_call_ms": None})
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        for cache in ("empty", "warm"):
+            output = subprocess.run(
+                [sys.executable, "-c", FIRST_CALL], cwd=here, capture_output=True, text=True, check=True,
+                env={**os.environ, "NUMBA_CACHE_DIR": directory}
+            ).stdout.split()
+            results.append({
+                **dict.fromkeys(results[0]), "case": "IEEE 14, new process", "load_model": f"{cache} cache",
+                "import_ms": 1000 * float(output[0]), "first_call_ms": 1000 * float(output[1])
+            })
+    return results
+
+def bench_scaling(copies=SCALING_COPIES, study=SCALING_STUDY, repeats=3):
+    """
+    Time per PV curve against bus count, with each fill-reducing ordering; the best of `repeats` runs.
+
+    Tiled cases start from the tiled solution of the original: from a flat start, Newton diverges along the
+    chain of ties once there are a few hundred copies. Peak memory is what tracemalloc sees, which excludes
+    SuperLU's own allocations; `fill` measures those.
+    """
+    grid_model, source_buses, sink_buses = study
+    base = load_case(grid_model)
+    V = solve_power_flow(base, tol=1e-8).V
+    inputs = study_inputs(grid_model, source_buses, sink_buses)
+    results = []
+    for k in copies:
+        net = tile_network(base, k, V) if k > 1 else base
+        V0 = np.tile(V, k)
+        for ordering in powerflow.ORDERINGS:
+            # Every matrix gets this ordering, whatever its size.
+            default, powerflow.AMD_DIMS = powerflow.AMD_DIMS, (0, sys.maxsize if ordering == "AMD" else 0)
+            try:
+                elapsed = np.inf
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    curve = generate_pv_curve(inputs, net, V0=V0)
+                    elapsed = min(elapsed, time.perf_counter() - start)
+                tracemalloc.start()
+                generate_pv_curve(inputs, net, V0=V0)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            finally:
+                powerflow.AMD_DIMS = default
+            results.append({
+                "buses": net.n_bus,
+                "ordering": ordering,
+                "points": len(curve.transfer),
+                "factorizations": curve.stats["factorizations"],
+                "fill_k": curve.stats["lu_fill"] / 1000,
+                "seconds": elapsed,
+                "ms_per_factor": 1000 * elapsed / curve.stats["factorizations"],
+                "peak_mb": peak / 1e6,
+                "nose_mw": curve.nose_transfer
+            })
+    return results
+
+def bench_reduction(studies=REDUCTION_STUDIES, depths=REDUCTION_DEPTHS, methods=METHODS):
+    """
+    Speedup and nose error of tracing each study on its area equivalent, per area depth and method.
+
+    Each equivalent is built once into a fresh network cache (first_s counts the base case and the reduction)
+    and then traced again from the cache (cached_s).
+    """
+    results = []
+    for grid_model, copies, source_buses, sink_buses, limits in studies:
+        net = load_case(grid_model)
+        if copies > 1:
+            net = tile_network(net, copies, solve_power_flow(net, tol=1e-8).V)
+        inputs = study_inputs(grid_model, source_buses, sink_buses, generator_limits=limits)
+        for depth in depths:
+            for method in methods:
+                with tempfile.TemporaryDirectory() as directory:
+                    cache = NetworkCache(directory)
+                    first = compare_with_full(inputs, net, depth, method, cache)
+                    cached = compare_with_full(inputs, net, depth, method, cache)
+                results.append({
+                    "case": grid_model,
+                    "buses": net.n_bus,
+                    "limits": limits,
+                    "depth": depth,
+                    "method": method,
+                    "reduced_buses": cached["reduced_buses"],
+                    "full_s": cached["full_seconds"],
+                    "first_s": first["reduced_seconds"],
+                    "cached_s": cached["reduced_seconds"],
+                    "speedup": cached["speedup"],
+                    "full_nose_mw": cached["full_nose_mw"],
+                    "nose_mw": cached["reduced_nose_mw"],
+                    "error_pct": cached["nose_error_pct"]
+                })
+    return results
+
+def bench_screening(studies=SCREENING_STUDIES, repeats=3):
+    """
+    Monitor-bus screening from the base case against one traced curve of the same study.
+
+    The reference weakest buses are those with the largest voltage drop from the base case to the nose, read from
+    the curve's all-bus capture. weakest_rank is where screening puts the weakest of them (0 is first) and top5
+    how many of the five weakest it suggests. Both times are the best of `repeats` runs.
+    """
+    results = []
+    for grid_model, copies, source_buses, sink_buses, limits in studies:
+        net = load_case(grid_model)
+        V0 = None
+        if copies > 1:
+            V = solve_power_flow(net, tol=1e-8).V
+            net, V0 = tile_network(net, copies, V), np.tile(V, copies)
+        inputs = study_inputs(grid_model, source_buses, sink_buses, generator_limits=limits)
+
+        screen_s = curve_s = float("inf")
+        for _ in range(repeats):
+            screening = rank_monitor_buses(inputs, net, V0)
+            screen_s = min(screen_s, screening["seconds"])
+            start = time.perf_counter()
+            curve = generate_pv_curve(inputs, net, V0=V0)
+            curve_s = min(curve_s, time.perf_counter() - start)
+
+        buses = [entry["bus"] for entry in screening["ranking"]]
+        voltages = curve.voltage_at(buses)
+        weakest = [buses[i] for i in np.argsort(voltages[curve.nose_index] - voltages[0])]
+        results.append({
+            "case": grid_model,
+            "buses": net.n_bus,
+            "limits": limits,
+            "sources": ",".join(map(str, source_buses)),
+            "screen_ms": screen_s * 1e3,
+            "curve_ms": curve_s * 1e3,
+            "fraction": screen_s / curve_s,
+            "sigma_min": screening["singular_values"][0],
+            "weakest": weakest[0],
+            "weakest_rank": buses.index(weakest[0]),
+            "top5": len(set(weakest[:5]) & set(buses[:5]))
+        })
+    return results
+
+def bench_suite(scenarios=SUITE_SCENARIOS, repeats=5):
+    """
+    Base-case and contingency curves of every suite scenario, traced in this process.
+
+    Wall time is the best of `repeats` runs; peak memory is traced by tracemalloc in a separate run, so it counts
+    the engine's Python and NumPy allocations but not SuperLU's internal buffers.
+    """
+    with open(scenarios) as f:
+        scenarios = json.load(f)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scenario in scenarios:
+            inputs = dict(scenario["inputs"])
+            net = load_case(inputs["grid_model"], inputs["base_mva"])
+            if scenario.get("tile"):
+                tiled = tile_network(net, scenario["tile"], solve_power_flow(net, tol=1e-8).V)
+                inputs["grid_model"] = os.path.join(directory, f"{scenario['name']}.m".replace(" ", "_"))
+                write_matpower(tiled, inputs["grid_model"], scenario["name"])
+                net = read_case_file(inputs["grid_model"], inputs["base_mva"])[0]
+
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                traced = list(generate_pv_curves(inputs, workers=1, net=net))
+                times.append(time.perf_counter() - start)
+            tracemalloc.start()
+            list(generate_pv_curves(inputs, workers=1, net=net))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            curves = [result.curve for result in traced if result.curve is not None]
+            results.append({
+                "scenario": scenario["name"],
+                "buses": net.n_bus,
+                "curves": len(curves),
+                "failed": len(traced) - len(curves),
+                "seconds": min(times),
+                "solves": sum(curve.stats["solves"] for curve in curves),
+                "iterations": sum(curve.stats["iterations"] for curve in curves),
+                "factorizations": sum(curve.stats["factorizations"] for curve in curves),
+                "peak_mb": peak / 2 ** 20,
+                "nose_mw": traced[0].curve.nose_transfer
+            })
+    return results
+
+def compare_with_baseline(results, baseline, tolerances=SUITE_TOLERANCES):
+    """
+    Metrics of a benchmark run that grew past their relative tolerance over a baseline run of the same benchmark.
+
+    Rows are matched by their first column (case or scenario). Metrics in TWO_SIDED_METRICS are reported
+    whichever way they moved.
+
+    Returns:
+        list: One dict per regression: row, metric, baseline and current values, relative change, tolerance.
+    """
+    key = next(iter(results[0]))
+    previous = {row[key]: row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get(row[key])
+        if old is None:
+            continue
+        for metric, tolerance in tolerances.items():
+            if not old.get(metric) or row.get(metric) is None:
+                continue
+            change = row[metric] / old[metric] - 1
+            if change > tolerance or (metric in TWO_SIDED_METRICS and -change > tolerance):
+                regressions.append({
+                    key: row[key], "metric": metric, "baseline": old[metric], "current": row[metric],
+                    "change": change, "tolerance": tolerance
+                })
+    return regressions
+
+def branch_contingencies(net):
+    """One `bus1_bus2` label per connected bus pair of a network."""
+    return [
+        f"{net.bus_numbers[f]}_{net.bus_numbers[t]}"
+        for f, t in dict.fromkeys(zip(net.branch_from.tolist(), net.branch_to.tolist()))
+    ]
+
+def bench_contingencies(study=CONTINGENCY_STUDY, count=CONTINGENCY_COUNT):
+    """Wall time of an N-1 sweep for 1, 2, 4, ... worker processes up to the CPU count."""
+    grid_model, source_buses, sink_buses = study
+    net = load_case(grid_model)
+    labels = branch_contingencies(net)[:count]
+    inputs = study_inputs(grid_model, source_buses, sink_buses)
+
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, cpus, *(2 ** k for k in range(1, cpus.bit_length()) if 2 ** k <= cpus)})
+    results = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        solved = sum(r.curve is not None for r in sweep_contingencies(inputs, labels, workers, net))
+        elapsed = time.perf_counter() - start
+        results.append({
+            "case": grid_model,
+            "workers": workers,
+            "contingencies": len(labels),
+            "solved": solved,
+            "seconds": elapsed,
+            "curves_per_s": len(labels) / elapsed,
+            "speedup": results[0]["seconds"] / elapsed if results else 1.0
+        })
+    return results
+
+def bench_critical(studies=CRITICAL_STUDIES, k=5, workers=CRITICAL_WORKERS):
+    """Top-K search with pruning versus tracing every contingency, on the same number of workers."""
+    results = []
+    for grid_model, source_buses, sink_buses in studies:
+        net = load_case(grid_model)
+        labels = branch_contingencies(net)
+        inputs = study_inputs(grid_model, source_buses, sink_buses)
+
+        for count in workers:
+            start = time.perf_counter()
+            search = find_critical_contingencies(inputs, labels, k, count, net)
+            search_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            full = [r for r in sweep_contingencies(inputs, labels, count, net) if r.curve is not None]
+            full_seconds = time.perf_counter() - start
+            full.sort(key=lambda r: r.curve.nose_transfer)
+
+            results.append({
+                "case": grid_model,
+                "workers": count,
+                "contingencies": len(labels),
+                "traced": len(search["traced"]),
+                "traces_avoided": search["full_traces_avoided"],
+                "solves": search["solves"],
+                "full_sweep_solves": sum(r.curve.stats["solves"] for r in full),
+                "seconds": search_seconds,
+                "full_sweep_seconds": full_seconds,
+                "speedup": full_seconds / search_seconds,
+                "same_top_k": [c["contingency"] for c in search["critical"]] == [r.contingency for r in full[:k]]
+            })
+    return results
+
+def print_table(results):
+    keys = list(results[0])
+    print("  ".join(f"{k:>14}" for k in keys))
+    for row in results:
+        print("  ".join(f"{v:>14.2f}" if isinstance(v, float) else f"{str(v):>14}" for v in row.values()))
+
+BENCHMARKS = {
+    "powerflow": bench_powerflow,
+    "continuation": bench_continuation,
+    "contingencies": bench_contingencies,
+    "critical": bench_critical,
+    "factorization": bench_factorization,
+    "batch": bench_batch,
+    "loads": bench_loads,
+    "limits": bench_limits,
+    "cache": bench_cache,
+    "parse": bench_parse,
+    "store": bench_store,
+    "incremental": bench_incremental,
+    "capture": bench_capture,
+    "plots": bench_plots,
+    "kernels": bench_kernels,
+    "scaling": bench_scaling,
+    "reduction": bench_reduction,
+    "screening": bench_screening,
+    "suite": bench_suite
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="PV-curve engine benchmarks")
+    parser.add_argument("benchmark", choices=list(BENCHMARKS))
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--baseline", help="Results of an earlier run (--json) to check for regressions")
+    parser.add_argument("--tolerance", type=float, help="Relative tolerance for every metric, instead of "
+                                                        "SUITE_TOLERANCES")
+    args = parser.parse_args()
+
+    results = BENCHMARKS[args.benchmark]()
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        tolerances = SUITE_TOLERANCES if args.tolerance is None else dict.fromkeys(SUITE_TOLERANCES, args.tolerance)
+        regressions = compare_with_baseline(results, baseline, tolerances)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            print_table(regressions)
+            raise SystemExit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
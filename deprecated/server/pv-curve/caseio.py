@@ -0,0 +1,518 @@
+"""
+Streaming readers and writers for MATPOWER (.m) and PSS/E (.raw) case files.
+
+The readers make one pass over the file and never hold more than CHUNK_LINES lines of text. Table rows are
+collected in chunks. Each chunk is cleaned with whole-string operations (comments, quoted names, separators)
+and converted by one np.fromstring call, and its values are copied into a preallocated float table that grows
+geometrically. Memory therefore scales with the numeric tables, not with the file, and there is no Python
+object per number. Both formats produce MATPOWER-layout bus, gen and branch tables, which from_matpower turns
+into the engine's Network.
+
+PSS/E RAW revisions 31 to 35 are read: buses, loads, fixed and switched shunts, generators, branches, and two-
+and three-winding transformers, the latter as a star bus with three branches. DC lines, FACTS devices and the
+other sections are skipped.
+"""
+import os
+import re
+import time
+import numpy as np
+from network import from_matpower
+
+# Lines of text converted per np.fromstring call.
+CHUNK_LINES = 4096
+
+# MATPOWER table widths used by from_matpower; longer rows are truncated, shorter ones padded with zeros.
+BUS_COLUMNS, GEN_COLUMNS, BRANCH_COLUMNS = 13, 10, 13
+MATPOWER_TABLES = {"bus": BUS_COLUMNS, "gen": GEN_COLUMNS, "branch": BRANCH_COLUMNS}
+
+_MATRIX_START = re.compile(r"\s*mpc\.(\w+)\s*=\s*\[(.*)$", re.DOTALL)
+_BASE_MVA = re.compile(r"\s*mpc\.baseMVA\s*=\s*([-+.\deE]+)")
+_MATLAB_COMMENT = re.compile(r"%[^\n]*")
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"")
+_RAW_COMMENT = re.compile(r"/[^\n]*")
+# RAW fields are separated by commas, blanks or both.
+_RAW_SEPARATOR = re.compile(r"[ \t]*,[ \t]*|[ \t]+")
+_BLANKS = re.compile(r"[ \t]+")
+
+class Table:
+    """
+    Float table filled chunk by chunk, with geometric growth of its preallocated storage.
+
+    Args:
+        columns (int): Number of columns kept per row.
+        capacity (int): Initial number of rows.
+    """
+
+    def __init__(self, columns, capacity=1024):
+        self.data = np.zeros((capacity, columns))
+        self.rows = 0
+
+    def append(self, block):
+        end = self.rows + len(block)
+        if end > len(self.data):
+            grown = np.zeros((max(end, 2 * len(self.data)), self.data.shape[1]))
+            grown[:self.rows] = self.data[:self.rows]
+            self.data = grown
+        self.data[self.rows:end] = block
+        self.rows = end
+
+    def array(self):
+        return self.data[:self.rows]
+
+class ParseStats:
+    """
+    Size and speed of one case file read.
+
+    Attributes:
+        path (str): File read.
+        bytes (int): File size.
+        seconds (float): Wall time of the read.
+        rows (dict): Rows read per table.
+    """
+
+    def __init__(self, path, bytes, seconds, rows):
+        self.path = path
+        self.bytes = bytes
+        self.seconds = seconds
+        self.rows = rows
+
+    @property
+    def mb_per_s(self):
+        return self.bytes / 1e6 / self.seconds if self.seconds > 0 else float("inf")
+
+    def to_dict(self):
+        return {
+            "path": self.path, "bytes": self.bytes, "seconds": self.seconds, "mb_per_s": self.mb_per_s,
+            "rows": self.rows
+        }
+
+def _rows_to_block(records, fields):
+    """
+    Convert comma-separated records into a (len(records), len(fields)) block of the given field positions.
+
+    Every number of the chunk is parsed by one np.fromstring call; field counts per record locate the rows, so
+    records may differ in length, and fields past the end of a record read as 0. Chunks with blank fields,
+    which np.fromstring cannot read, are parsed record by record.
+    """
+    counts = np.array([record.count(",") + 1 for record in records])
+    try:
+        values = np.fromstring(",".join(records), sep=",") if records else np.empty(0)
+    except ValueError:
+        values = None
+
+    block = np.zeros((len(records), len(fields)))
+    if values is None or values.size != counts.sum():
+        for i, record in enumerate(records):
+            values = record.split(",")
+            block[i] = [float(values[k]) if k < len(values) and values[k] else 0.0 for k in fields]
+        return block
+
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    for column, k in enumerate(fields):
+        present = counts > k
+        block[present, column] = values[starts[present] + k]
+    return block
+
+def _matlab_block(lines, columns):
+    """
+    Convert lines of a MATLAB matrix into a (rows, columns) block.
+
+    A MATLAB matrix is rectangular, so after dropping comments and separators the whole chunk is one run of
+    numbers, converted by one np.fromstring call and reshaped to the width of its first row.
+    """
+    text = _MATLAB_COMMENT.sub("", "\n".join(lines)).replace(";", "\n").replace(",", " ")
+    first = next((row for row in text.split("\n", 64) if row.strip()), None)
+    if first is None:
+        return np.zeros((0, columns))
+    width = len(first.split())
+    values = np.fromstring(text, sep=" ")
+    if values.size % width:
+        raise ValueError(f"MATLAB matrix rows differ in length (first row has {width} values)")
+    rows = values.reshape(-1, width)
+    block = np.zeros((len(rows), columns))
+    block[:, :min(width, columns)] = rows[:, :columns]
+    return block
+
+def parse_matpower(path):
+    """
+    Read the bus, gen and branch tables and baseMVA of a MATPOWER case file.
+
+    Returns:
+        tuple: (ppc dict with "baseMVA", "bus", "gen" and "branch", ParseStats)
+    """
+    start = time.perf_counter()
+    tables = {name: Table(columns) for name, columns in MATPOWER_TABLES.items()}
+    base_mva = None
+    name, chunk = None, []
+
+    def flush():
+        if name in tables and chunk:
+            tables[name].append(_matlab_block(chunk, MATPOWER_TABLES[name]))
+        chunk.clear()
+
+    with open(path) as f:
+        for line in f:
+            if name is None:
+                match = _MATRIX_START.match(line)
+                if match is None:
+                    base = _BASE_MVA.match(line)
+                    if base:
+                        base_mva = float(base.group(1))
+                    continue
+                name, line = match.group(1), match.group(2)
+
+            if "%" in line:
+                line = line[:line.index("%")]
+            end = line.find("]")
+            chunk.append(line if end < 0 else line[:end])
+            if end >= 0 or len(chunk) >= CHUNK_LINES:
+                flush()
+            if end >= 0:
+                name = None
+
+    if base_mva is None:
+        raise ValueError(f"{path} has no mpc.baseMVA")
+    ppc = {"baseMVA": base_mva, **{name: table.array() for name, table in tables.items()}}
+    rows = {name: table.rows for name, table in tables.items()}
+    return ppc, ParseStats(path, os.path.getsize(path), time.perf_counter() - start, rows)
+
+# Fields read from each PSS/E record section, with their positions in revision 33 and, where they moved, in
+# revisions 34 and 35. Transformer records are kept one line per row, by position.
+RAW_FIELDS = {
+    "bus": {"I": 0, "BASKV": 2, "IDE": 3, "VM": 7, "VA": 8},
+    "load": {"I": 0, "STATUS": 2, "PL": 5, "QL": 6, "IP": 7, "IQ": 8, "YP": 9, "YQ": 10},
+    "fixed_shunt": {"I": 0, "STATUS": 2, "GL": 3, "BL": 4},
+    "generator": {"I": 0, "PG": 2, "QG": 3, "QT": 4, "QB": 5, "VS": 6, "STAT": 14},
+    "branch": {"I": 0, "J": 1, "R": 3, "X": 4, "B": 5, "ST": 13},
+    "transformer": {k: k for k in range(12)},
+    "switched_shunt": {"I": 0, "STAT": 3, "BINIT": 9}
+}
+RAW_FIELDS_MOVED = {
+    34: {"generator": {"STAT": 15}, "branch": {"ST": 23}, "switched_shunt": {"BINIT": 10}},
+    35: {"generator": {"STAT": 15}, "branch": {"ST": 23}, "switched_shunt": {"STAT": 4, "BINIT": 11}}
+}
+# Sections in file order; only the named ones are read. Revision 35 starts with a system-wide data section.
+RAW_SECTIONS_33 = [
+    "bus", "load", "fixed_shunt", "generator", "branch", "transformer", "area", "two_terminal_dc", "vsc_dc",
+    "impedance_correction", "multi_terminal_dc", "multi_section_line", "zone", "interarea", "owner", "facts",
+    "switched_shunt", "gne", "induction_machine"
+]
+RAW_SECTIONS = {
+    31: RAW_SECTIONS_33, 32: RAW_SECTIONS_33, 33: RAW_SECTIONS_33,
+    34: RAW_SECTIONS_33[:5] + ["switching_device"] + RAW_SECTIONS_33[5:],
+    35: ["system"] + RAW_SECTIONS_33[:5] + ["switching_device"] + RAW_SECTIONS_33[5:]
+}
+# Transformer line 1 fields, and the windings of each status that are out of service (0 = all windings).
+RAW_TRANSFORMER = {"I": 0, "J": 1, "K": 2, "CW": 4, "CZ": 5, "CM": 6, "MAG1": 7, "MAG2": 8, "STAT": 11}
+RAW_TRANSFORMER_OUT = {1: 0, 2: 4, 3: 2}
+
+def _raw_records(text):
+    """
+    Comma-separated records of RAW text, with quoted fields read as 0 and comments dropped.
+
+    Text with commas is comma-delimited and its blanks are padding; text without any is blank-delimited.
+    """
+    text = _RAW_COMMENT.sub("", _QUOTED.sub("0", text))
+    if "," in text:
+        text = text.replace(" ", "").replace("\t", "")
+    else:
+        text = _BLANKS.sub(",", text)
+    return [record.strip(",") for record in text.split("\n")]
+
+def _raw_fields(line):
+    return [float(field) if field else 0.0 for field in _raw_records(line.strip())[0].split(",")]
+
+def _raw_fields_of(revision):
+    """Field positions per section in a RAW revision."""
+    moved = RAW_FIELDS_MOVED.get(revision, {})
+    return {section: {**fields, **moved.get(section, {})} for section, fields in RAW_FIELDS.items()}
+
+def _is_section_end(line):
+    stripped = line.lstrip()
+    if not stripped or stripped[0] not in "0Qq":
+        return False
+    record = _raw_records(stripped.rstrip())[0]
+    return record in ("0", "Q", "q") or record.startswith("0,")
+
+def _transformer_impedance(r, x, cz, winding_mva, sbase):
+    """Winding impedances in per-unit on the system base, for arrays of windings."""
+    winding_mva = np.where(winding_mva > 0, winding_mva, sbase)
+    # CZ = 3 gives R as load loss in W and X as |Z|, both on the winding base.
+    loss = cz == 3
+    r = np.where(loss, r / 1e6 / winding_mva, r)
+    x = np.where(loss, np.sqrt(np.maximum(x ** 2 - r ** 2, 0.0)), x)
+    scale = np.where(cz >= 2, sbase / winding_mva, 1.0)
+    return (r + 1j * x) * scale
+
+def _transformer_ratio(winding, cw, base_kv):
+    """Off-nominal turns ratios of a winding line (WINDV, NOMV, ANG) in per-unit of the bus base voltage."""
+    windv, nomv = winding[:, 0], winding[:, 1]
+    return np.select(
+        [cw == 2, cw == 3], [windv / base_kv, windv * np.where(nomv > 0, nomv, base_kv) / base_kv], windv
+    )
+
+def _transformers(records, lookup, base_kv, sbase, mp_bus, next_star):
+    """
+    Branch rows of the transformer records, and star bus rows of the three-winding ones.
+
+    Adds magnetizing admittances to the winding 1 bus shunts in `mp_bus`.
+    """
+    c = RAW_TRANSFORMER
+    # Records are 4 lines, or 5 for three-winding units (K != 0).
+    starts, three = [], []
+    i = 0
+    while i < len(records):
+        starts.append(i)
+        three.append(records[i, c["K"]] != 0)
+        i += 5 if three[-1] else 4
+    starts, three = np.array(starts, dtype=np.int64), np.array(three, dtype=bool)
+
+    first = records[starts]
+    cw, cz, cm = first[:, c["CW"]], first[:, c["CZ"]], first[:, c["CM"]]
+    mva12 = records[starts + 1, 2]
+    at = lookup[first[:, c["I"]].astype(np.int64)]
+    mag1, mag2 = first[:, c["MAG1"]], first[:, c["MAG2"]]
+    # CM = 1: admittance in per-unit on the system base; CM = 2: no-load loss in W and current in per-unit.
+    gs = np.where(cm == 2, mag1 / 1e6, mag1 * sbase)
+    ymag = np.where(mva12 > 0, mva12, sbase) * mag2
+    bs = np.where(cm == 2, -np.sqrt(np.maximum(ymag ** 2 - gs ** 2, 0.0)), mag2 * sbase)
+    np.add.at(mp_bus[:, 4], at, gs)
+    np.add.at(mp_bus[:, 5], at, bs)
+
+    ends = [first[:, c["I"]], first[:, c["J"]], first[:, c["K"]]]
+    status = first[:, c["STAT"]]
+    branches = []
+
+    two = ~three
+    s = starts[two]
+    impedance = records[s + 1]
+    z = _transformer_impedance(impedance[:, 0], impedance[:, 1], cz[two], impedance[:, 2], sbase)
+    ratio = [
+        _transformer_ratio(records[s + 2 + k], cw[two], base_kv[lookup[ends[k][two].astype(np.int64)]])
+        for k in range(2)
+    ]
+    rows = np.zeros((len(s), BRANCH_COLUMNS))
+    rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3] = ends[0][two], ends[1][two], z.real, z.imag
+    rows[:, 8], rows[:, 9] = ratio[0] / ratio[1], records[s + 2, 2]
+    rows[:, 10], rows[:, 11], rows[:, 12] = status[two] > 0, -360.0, 360.0
+    branches.append(rows)
+
+    # Three windings: a star bus and the star equivalent of the pairwise impedances Z12, Z23, Z31.
+    s = starts[three]
+    impedance = records[s + 1]
+    z12, z23, z31 = (
+        _transformer_impedance(impedance[:, 3 * k], impedance[:, 3 * k + 1], cz[three], impedance[:, 3 * k + 2], sbase)
+        for k in range(3)
+    )
+    stars = [(z12 + z31 - z23) / 2, (z12 + z23 - z31) / 2, (z23 + z31 - z12) / 2]
+    star_numbers = next_star + np.arange(len(s))
+    star_buses = np.zeros((len(s), BUS_COLUMNS))
+    star_buses[:, 0], star_buses[:, 1] = star_numbers, 1
+    star_buses[:, 7] = np.where(impedance[:, 9] > 0, impedance[:, 9], 1.0)
+    star_buses[:, 8], star_buses[:, 9], star_buses[:, 11], star_buses[:, 12] = impedance[:, 10], 1.0, 1.1, 0.9
+    for k in range(3):
+        winding = records[s + 2 + k]
+        rows = np.zeros((len(s), BRANCH_COLUMNS))
+        rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3] = ends[k][three], star_numbers, stars[k].real, stars[k].imag
+        rows[:, 8] = _transformer_ratio(winding, cw[three], base_kv[lookup[ends[k][three].astype(np.int64)]])
+        rows[:, 9] = winding[:, 2]
+        # Status 0 takes every winding out; 4, 2 and 3 take out winding 1, 2 and 3 alone.
+        rows[:, 10] = (status[three] != 0) & (status[three] != RAW_TRANSFORMER_OUT[k + 1])
+        rows[:, 11], rows[:, 12] = -360.0, 360.0
+        branches.append(rows)
+
+    return np.vstack(branches), star_buses
+
+def parse_psse_raw(path):
+    """
+    Read a PSS/E RAW file (revision 31-35) as MATPOWER-layout tables.
+
+    Loads are placed at their 1 p.u. voltage value (PL + IP + YP, QL + IQ - YQ), fixed and switched shunts
+    (BINIT) and transformer magnetizing admittances become bus shunts, and each three-winding transformer
+    gets a star bus numbered after the highest bus number.
+
+    Returns:
+        tuple: (ppc dict with "baseMVA", "bus", "gen" and "branch", ParseStats)
+    """
+    start = time.perf_counter()
+    with open(path) as f:
+        header = _raw_fields(f.readline())
+        sbase = header[1] if len(header) > 1 else 100.0
+        revision = int(header[2]) if len(header) > 2 and header[2] else 33
+        if revision not in RAW_SECTIONS:
+            raise ValueError(f"{path}: PSS/E RAW revision {revision} is not supported (31-35)")
+        f.readline()
+        f.readline()
+
+        fields = _raw_fields_of(revision)
+        tables = {section: Table(len(section_fields)) for section, section_fields in fields.items()}
+
+        def flush():
+            if chunk:
+                records = _raw_records("".join(chunk).rstrip())
+                tables[section].append(_rows_to_block(records, list(fields[section].values())))
+            chunk.clear()
+
+        sections = iter(RAW_SECTIONS[revision])
+        section, chunk = next(sections), []
+        for line in f:
+            if _is_section_end(line):
+                flush()
+                section = next(sections, None)
+                if section is None or line.strip().upper().startswith("Q"):
+                    break
+                continue
+
+            if section not in tables or not line.strip():
+                continue
+            chunk.append(line)
+            if section == "transformer":
+                # Read whole records, whose later lines may start with a 0 that is not a section end.
+                k = _RAW_SEPARATOR.split(line.strip(), 3)[2]
+                for _ in range(3 if float(k) == 0 else 4):
+                    chunk.append(f.readline())
+            if len(chunk) >= CHUNK_LINES:
+                flush()
+
+    # Named columns of each table.
+    data = {
+        section: dict(zip(fields[section], tables[section].array().T)) for section in tables if section != "transformer"
+    }
+    bus, load, shunt, switched = data["bus"], data["load"], data["fixed_shunt"], data["switched_shunt"]
+    numbers = bus["I"].astype(np.int64)
+
+    # MATPOWER bus table: BUS_I, TYPE, PD, QD, GS, BS, AREA, VM, VA, BASE_KV, ZONE, VMAX, VMIN.
+    mp_bus = np.zeros((len(numbers), BUS_COLUMNS))
+    mp_bus[:, 0], mp_bus[:, 1], mp_bus[:, 7], mp_bus[:, 8] = numbers, bus["IDE"], bus["VM"], bus["VA"]
+    mp_bus[:, 9], mp_bus[:, 11], mp_bus[:, 12] = bus["BASKV"], 1.1, 0.9
+    lookup = np.full(numbers.max() + 1, -1, dtype=np.int64)
+    lookup[numbers] = np.arange(len(numbers))
+
+    on = load["STATUS"] > 0
+    at = lookup[load["I"][on].astype(np.int64)]
+    np.add.at(mp_bus[:, 2], at, (load["PL"] + load["IP"] + load["YP"])[on])
+    np.add.at(mp_bus[:, 3], at, (load["QL"] + load["IQ"] - load["YQ"])[on])
+
+    on = shunt["STATUS"] > 0
+    at = lookup[shunt["I"][on].astype(np.int64)]
+    np.add.at(mp_bus[:, 4], at, shunt["GL"][on])
+    np.add.at(mp_bus[:, 5], at, shunt["BL"][on])
+
+    on = switched["STAT"] > 0
+    np.add.at(mp_bus[:, 5], lookup[switched["I"][on].astype(np.int64)], switched["BINIT"][on])
+
+    # MATPOWER gen table: GEN_BUS, PG, QG, QMAX, QMIN, VG, MBASE, GEN_STATUS, PMAX, PMIN.
+    gen = data["generator"]
+    mp_gen = np.zeros((len(gen["I"]), GEN_COLUMNS))
+    mp_gen[:, :6] = np.column_stack([gen["I"], gen["PG"], gen["QG"], gen["QT"], gen["QB"], gen["VS"]])
+    mp_gen[:, 6], mp_gen[:, 7] = sbase, gen["STAT"]
+
+    # MATPOWER branch table: F_BUS, T_BUS, BR_R, BR_X, BR_B, RATE_A-C, TAP, SHIFT, BR_STATUS, ANGMIN, ANGMAX.
+    branch = data["branch"]
+    mp_branch = np.zeros((len(branch["I"]), BRANCH_COLUMNS))
+    mp_branch[:, :5] = np.column_stack([branch["I"], branch["J"], branch["R"], branch["X"], branch["B"]])
+    mp_branch[:, 10], mp_branch[:, 11], mp_branch[:, 12] = branch["ST"], -360.0, 360.0
+
+    transformer_branches, star_buses = _transformers(
+        tables["transformer"].array(), lookup, bus["BASKV"], sbase, mp_bus, int(numbers.max()) + 1
+    )
+    ppc = {
+        "baseMVA": sbase,
+        "bus": np.vstack([mp_bus, star_buses]),
+        "gen": mp_gen,
+        "branch": np.vstack([mp_branch, transformer_branches])
+    }
+    rows = {section: table.rows for section, table in tables.items()}
+    rows["transformer"] = len(transformer_branches) - 2 * len(star_buses)
+    return ppc, ParseStats(path, os.path.getsize(path), time.perf_counter() - start, rows)
+
+READERS = {".m": parse_matpower, ".raw": parse_psse_raw}
+
+def read_case_file(path, base_mva=None):
+    """
+    Read a MATPOWER or PSS/E case file as a Network.
+
+    Returns:
+        tuple: (Network, ParseStats) with the stats timing the whole read, Network included.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported case file '{path}'. Supported extensions: {list(READERS)}")
+
+    start = time.perf_counter()
+    ppc, stats = READERS[extension](path)
+    net = from_matpower(ppc, base_mva=base_mva)
+    stats.seconds = time.perf_counter() - start
+    return net, stats
+
+def _table_text(rows, fmt):
+    return "\n".join(fmt % tuple(row) for row in rows.tolist())
+
+def write_matpower(net, path, name="case"):
+    """Write a Network as a MATPOWER case file (version 2 column layout)."""
+    base = net.base_mva
+    numbers = net.bus_numbers
+    bus = np.column_stack([
+        numbers, net.bus_type, net.Pd * base, net.Qd * base, net.Gs * base, net.Bs * base, np.ones(net.n_bus),
+        net.Vm0, np.rad2deg(net.Va0), np.ones(net.n_bus), np.ones(net.n_bus), 1.1 * np.ones(net.n_bus),
+        0.9 * np.ones(net.n_bus)
+    ])
+    n_gen = len(net.gen_bus)
+    gen = np.column_stack([
+        numbers[net.gen_bus], net.Pg * base, net.Qg * base, net.Qmax * base, net.Qmin * base, net.Vg,
+        base * np.ones(n_gen), net.gen_status, np.zeros(n_gen), np.zeros(n_gen)
+    ])
+    n_branch = net.n_branch
+    branch = np.column_stack([
+        numbers[net.branch_from], numbers[net.branch_to], net.r, net.x, net.b, np.zeros((n_branch, 3)),
+        net.ratio, np.rad2deg(net.shift), net.branch_status, -360 * np.ones(n_branch), 360 * np.ones(n_branch)
+    ])
+
+    with open(path, "w") as f:
+        f.write(f"function mpc = {name}\nmpc.version = '2';\nmpc.baseMVA = {base:.17g};\n")
+        for table, rows in (("bus", bus), ("gen", gen), ("branch", branch)):
+            fmt = "\t" + "\t".join(["%.17g"] * rows.shape[1]) + ";"
+            f.write(f"\nmpc.{table} = [\n{_table_text(rows, fmt)}\n];\n")
+
+def write_psse_raw(net, path):
+    """
+    Write a Network as a PSS/E RAW revision 33 file.
+
+    Branches with an off-nominal tap or a phase shift are written as two-winding transformers (CW = CZ = CM =
+    1), which drops their line charging.
+    """
+    base = net.base_mva
+    numbers = net.bus_numbers
+    with open(path, "w") as f:
+        f.write(f"0, {base:.17g}, 33, 0, 1, 60.00 / PSS/E RAW written by caseio.py\n\n\n")
+        for i in range(net.n_bus):
+            f.write(f"{numbers[i]},'BUS{numbers[i]}',1.0,{int(net.bus_type[i])},1,1,1,"
+                    f"{net.Vm0[i]:.17g},{np.rad2deg(net.Va0[i]):.17g},1.1,0.9,1.1,0.9\n")
+        f.write("0 / END OF BUS DATA, BEGIN LOAD DATA\n")
+        for i in np.flatnonzero((net.Pd != 0) | (net.Qd != 0)):
+            f.write(f"{numbers[i]},'1',1,1,1,{net.Pd[i] * base:.17g},{net.Qd[i] * base:.17g},0,0,0,0,1,1,0\n")
+        f.write("0 / END OF LOAD DATA, BEGIN FIXED SHUNT DATA\n")
+        for i in np.flatnonzero((net.Gs != 0) | (net.Bs != 0)):
+            f.write(f"{numbers[i]},'1',1,{net.Gs[i] * base:.17g},{net.Bs[i] * base:.17g}\n")
+        f.write("0 / END OF FIXED SHUNT DATA, BEGIN GENERATOR DATA\n")
+        for g in range(len(net.gen_bus)):
+            f.write(f"{numbers[net.gen_bus[g]]},'1',{net.Pg[g] * base:.17g},{net.Qg[g] * base:.17g},"
+                    f"{net.Qmax[g] * base:.17g},{net.Qmin[g] * base:.17g},{net.Vg[g]:.17g},0,{base:.17g},0,1,0,0,1,"
+                    f"{int(net.gen_status[g])},100,9999,-9999,1,1\n")
+        f.write("0 / END OF GENERATOR DATA, BEGIN BRANCH DATA\n")
+        transformer = ((net.ratio != 0) & (net.ratio != 1)) | (net.shift != 0)
+        for k in np.flatnonzero(~transformer):
+            f.write(f"{numbers[net.branch_from[k]]},{numbers[net.branch_to[k]]},'1',{net.r[k]:.17g},{net.x[k]:.17g},"
+                    f"{net.b[k]:.17g},0,0,0,0,0,0,0,{int(net.branch_status[k])},1,0,1,1\n")
+        f.write("0 / END OF BRANCH DATA, BEGIN TRANSFORMER DATA\n")
+        for k in np.flatnonzero(transformer):
+            ratio = net.ratio[k] or 1.0
+            f.write(f"{numbers[net.branch_from[k]]},{numbers[net.branch_to[k]]},0,'1',1,1,1,0,0,2,'T',"
+                    f"{int(net.branch_status[k])},1,1\n")
+            f.write(f"{net.r[k]:.17g},{net.x[k]:.17g},{base:.17g}\n")
+            f.write(f"{ratio:.17g},0,{np.rad2deg(net.shift[k]):.17g},0,0,0,0,0,1.1,0.9,1.1,0.9,33,0,0,0,0\n")
+            f.write("1.0,0\n")
+        f.write("0 / END OF TRANSFORMER DATA, BEGIN AREA DATA\n")
+        for section in RAW_SECTIONS_33[6:]:
+            f.write(f"0 / END OF {section.upper().replace('_', ' ')} DATA\n")
+        f.write("Q\n")
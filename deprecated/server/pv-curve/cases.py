@@ -0,0 +1,132 @@
+"""
+Load the network named by the `grid_model` input.
+
+Standard IEEE cases come from pandapower's bundled test systems and are converted to MATPOWER arrays, so the
+engine itself only ever works on the internal Network representation. Converted cases are compiled into the
+network cache (netcache.py), so later loads map the compiled arrays instead of importing pandapower.
+A `grid_model` naming a MATPOWER (.m) or PSS/E (.raw) file is read by the streaming readers in caseio.py and
+cached the same way, keyed by the file's path, size and modification time.
+"""
+import os
+import re
+from importlib.metadata import PackageNotFoundError, version
+import numpy as np
+from caseio import READERS, read_case_file
+from netcache import NetworkCache
+from network import PV, Network, from_matpower
+
+# grid_model names understood by load_case, mapped to pandapower.networks functions.
+PANDAPOWER_CASES = {
+    "IEEE 9": "case9",
+    "IEEE 14": "case14",
+    "IEEE 30": "case30",
+    "IEEE 39": "case39",
+    "IEEE 57": "case57",
+    "IEEE 118": "case118",
+    "IEEE 300": "case300"
+}
+
+def normalize_grid_model(grid_model):
+    """Accept "IEEE 39", "ieee39", "case39" and "39" as the same case."""
+    match = re.fullmatch(r"\s*(?:ieee|case)?[\s_-]*(\d+)\s*", str(grid_model), flags=re.IGNORECASE)
+    if not match:
+        return str(grid_model).strip()
+    return f"IEEE {match.group(1)}"
+
+def load_case(grid_model, base_mva=None, cache=True):
+    """
+    Load a grid model as a Network.
+
+    Args:
+        grid_model (str): Case name, e.g. "IEEE 39", or the path of a .m or .raw case file.
+        base_mva (float, optional): System base for the per-unit arrays. Defaults to the case base.
+        cache (bool or NetworkCache): Use the default network cache, a given one, or none.
+
+    Returns:
+        Network
+    """
+    if os.path.splitext(str(grid_model).strip())[1].lower() in READERS:
+        return _load_case_file(str(grid_model).strip(), base_mva, cache)
+
+    name = normalize_grid_model(grid_model)
+    if name not in PANDAPOWER_CASES:
+        raise ValueError(f"Unknown grid model '{grid_model}'. Available: {list(PANDAPOWER_CASES)}")
+    if not cache:
+        return _convert_pandapower_case(name, base_mva)
+
+    try:
+        source = f"pandapower {version('pandapower')}"
+    except PackageNotFoundError:
+        source = "pandapower"
+    cache = cache if isinstance(cache, NetworkCache) else NetworkCache()
+    return cache.load(f"{name}|{source}|{base_mva}", lambda: _convert_pandapower_case(name, base_mva))
+
+def _load_case_file(path, base_mva, cache):
+    if not os.path.isfile(path):
+        raise ValueError(f"Case file '{path}' does not exist")
+    if not cache:
+        return read_case_file(path, base_mva)[0]
+
+    path = os.path.abspath(path)
+    info = os.stat(path)
+    cache = cache if isinstance(cache, NetworkCache) else NetworkCache()
+    return cache.load(f"{path}|{info.st_size}|{info.st_mtime_ns}|{base_mva}", lambda: read_case_file(path, base_mva)[0])
+
+def _convert_pandapower_case(name, base_mva):
+    import pandapower.networks as pn
+    from pandapower.converter.pypower.to_ppc import to_ppc
+
+    net = getattr(pn, PANDAPOWER_CASES[name])()
+    ppc = to_ppc(net, init="flat")
+
+    # The converted case numbers buses 0..n-1; pandapower keeps the original IEEE numbers as bus names.
+    lookup = net._pd2ppc_lookups["bus"]
+    bus_numbers = [0] * len(ppc["bus"])
+    for index, bus_name in zip(net.bus.index, net.bus.name):
+        bus_numbers[lookup[index]] = int(bus_name)
+
+    return from_matpower(ppc, base_mva=base_mva, bus_numbers=bus_numbers)
+
+def tile_network(net, copies, V=None):
+    """
+    Synthetic large case: `copies` copies of a network, their reference buses tied in a chain.
+
+    Copy k numbers its buses as k * 10**d + the original number, where 10**d exceeds every original number.
+    Only the first copy keeps its reference bus; the others regulate it as a PV bus. Given a solved voltage
+    profile V of `net`, each copy's reference generator is dispatched to that solution, so every copy covers
+    its own losses and the ties carry almost no power.
+
+    Args:
+        net (Network): Case to tile.
+        copies (int): Number of copies.
+        V (np.ndarray, optional): Solved complex voltages of `net`.
+
+    Returns:
+        Network
+    """
+    n, ref = net.n_bus, net.ref[0]
+    scale = 10 ** len(str(int(net.bus_numbers.max())))
+    Pg, Qg = net.Pg.copy(), net.Qg.copy()
+    if V is not None:
+        slack = np.flatnonzero((net.gen_status > 0) & (net.gen_bus == ref))
+        injection = V[ref] * np.conj(net.ybus[ref] @ V)[0] + net.Pd[ref] + 1j * net.Qd[ref]
+        Pg[slack[0]] = injection.real - Pg[slack[1:]].sum()
+        Qg[slack[0]] = injection.imag - Qg[slack[1:]].sum()
+
+    offsets = np.arange(copies)[:, None]
+    arrays = {name: np.concatenate([getattr(net, name)] * copies) for name in Network.ARRAYS}
+    arrays["bus_numbers"] = (offsets * scale + net.bus_numbers).ravel()
+    arrays["bus_type"][n + ref::n] = PV
+    arrays["Pg"], arrays["Qg"] = np.tile(Pg, copies), np.tile(Qg, copies)
+    arrays["gen_bus"] = (offsets * n + net.gen_bus).ravel().astype(np.int32)
+    arrays["branch_from"] = (offsets * n + net.branch_from).ravel().astype(np.int32)
+    arrays["branch_to"] = (offsets * n + net.branch_to).ravel().astype(np.int32)
+
+    ties = ref + n * np.arange(copies - 1)
+    tie = {
+        "branch_from": ties, "branch_to": ties + n, "r": 0.001, "x": 0.01, "b": 0.0, "ratio": 0.0, "shift": 0.0,
+        "branch_status": 1.0
+    }
+    for name, value in tie.items():
+        arrays[name] = np.concatenate([arrays[name], np.broadcast_to(value, len(ties)).astype(arrays[name].dtype)])
+    return Network(net.base_mva, **arrays)
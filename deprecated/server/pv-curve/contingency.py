@@ -0,0 +1,380 @@
+"""
+N-1 contingency sweep for PV curves.
+
+Each `bus1_bus2` contingency collected by inputs.py gets its own continuation trace. The sweep fans the traces
+out across a process pool: the network arrays are copied once into shared memory and every worker maps them
+read-only, so a task only carries the contingency label. Curves are yielded as workers finish them.
+
+find_critical_contingencies only fully traces the outages that can still be among the `critical_scenarios`
+worst. Linear margin sensitivities at the base-case nose order the candidates, and each candidate is traced
+with its transfer capped at the current Kth-worst margin. A trace that reaches the cap without a nose has a
+margin at least that large, so it is pruned without tracing the rest of its curve. The search keeps one pool
+for all candidates and hands each worker the next one, with the latest cap, as soon as it is free.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+from continuation import ContinuationProblem, PVStudy, generate_pv_curve
+from network import Network
+from powerflow import solve_power_flow
+
+# Inverse iterations for the left null vector of the Jacobian at the nose.
+NULL_VECTOR_ITERATIONS = 3
+
+# Worker context of a pool process (see worker_context); a sweep traced in the calling process keeps its own.
+_worker = {}
+
+class ContingencyResult:
+    """
+    Outcome of one contingency trace.
+
+    Attributes:
+        contingency (str): The `bus1_bus2` label.
+        curve (PVCurve): Traced curve, or None if the case could not be solved.
+        error (str): Why the case could not be solved, e.g. an islanded bus.
+        seconds (float): Wall time of the trace in its worker.
+    """
+
+    def __init__(self, contingency, curve=None, error=None, seconds=0.0):
+        self.contingency = contingency
+        self.curve = curve
+        self.error = error
+        self.seconds = seconds
+
+    def to_dict(self):
+        return {
+            "contingency": self.contingency,
+            "curve": self.curve.to_dict() if self.curve is not None else None,
+            "error": self.error,
+            "seconds": self.seconds
+        }
+
+def islanded_buses(net, branch_status):
+    """External numbers of the buses cut off from the reference bus by a branch status vector."""
+    on = branch_status > 0
+    graph = sp.coo_matrix((np.ones(on.sum()), (net.branch_from[on], net.branch_to[on])), shape=(net.n_bus,) * 2)
+    _, labels = connected_components(graph, directed=False)
+    return net.bus_numbers[labels != labels[net.ref[0]]]
+
+def parse_contingency(net, label):
+    """
+    Branch positions taken out by a `bus1_bus2` contingency.
+
+    All in-service circuits between the two buses are outaged, since the label cannot tell parallel circuits
+    apart.
+    """
+    try:
+        bus1, bus2 = (int(part) for part in str(label).split("_"))
+    except ValueError:
+        raise ValueError(f"Contingency '{label}' is not in bus1_bus2 format") from None
+
+    branches = net.branch_index(bus1, bus2)
+    if len(branches) == 0:
+        raise ValueError(f"No in-service branch between buses {bus1} and {bus2}")
+    return branches
+
+class SharedNetwork:
+    """
+    Network arrays copied into shared memory blocks.
+
+    `spec` is the small picklable description workers use to map the same blocks with attach_network. Use as
+    a context manager so the blocks are unlinked once the sweep is done.
+    """
+
+    def __init__(self, net):
+        self.blocks = []
+        self.spec = {"base_mva": net.base_mva, "arrays": {}}
+        for name in Network.ARRAYS:
+            array = np.ascontiguousarray(getattr(net, name))
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec["arrays"][name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach_network(spec):
+    """
+    Build a Network whose arrays are read-only views of the shared memory blocks described by `spec`.
+
+    Returns:
+        tuple: (Network, list of SharedMemory blocks that must stay open while the Network is used)
+    """
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in spec["arrays"].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        blocks.append(block)
+        arrays[name] = array
+    return Network(spec["base_mva"], **arrays), blocks
+
+def worker_context(net, inputs, blocks=()):
+    """
+    What tracing contingencies of one study needs: network, inputs, Jacobian structure and the intact-network
+    base case that warm-starts every contingency.
+    """
+    pattern = PVStudy(inputs, net).jacobian_pattern()
+    base = solve_power_flow(net, tol=inputs["mva_tolerance"] / net.base_mva, pattern=pattern)
+    return {
+        "net": net, "inputs": inputs, "blocks": list(blocks), "pattern": pattern,
+        "V0": base.V if base.converged else None
+    }
+
+def _init_worker(spec, inputs):
+    net, blocks = attach_network(spec)
+    _worker.update(worker_context(net, inputs, blocks))
+
+def _trace_contingency(label, overrides=None, context=None):
+    # Pool processes trace with their process-wide context; the calling process passes its sweep's own, so
+    # concurrent sweeps (e.g. /pv requests on a one-core server) do not share state.
+    context = _worker if context is None else context
+    start = time.perf_counter()
+    net = context["net"]
+    inputs = {**context["inputs"], **overrides} if overrides else context["inputs"]
+    try:
+        status = net.branch_status.copy()
+        status[parse_contingency(net, label)] = 0
+        islanded = islanded_buses(net, status)
+        if len(islanded):
+            raise ValueError(f"Outage {label} islands buses {islanded.tolist()}")
+        # Outaged branches stay in the pattern as explicit zeros, so the worker's Jacobian structure applies.
+        curve = generate_pv_curve(
+            inputs, net, ybus=net.build_ybus(status), pattern=context["pattern"], V0=context["V0"]
+        )
+    except (RuntimeError, ValueError) as e:
+        return ContingencyResult(label, error=str(e), seconds=time.perf_counter() - start)
+    return ContingencyResult(label, curve, seconds=time.perf_counter() - start)
+
+@contextmanager
+def contingency_pool(net, inputs, workers):
+    """
+    Trace contingencies of one study in `workers` processes that share `net`, or in this process for one.
+
+    Workers are started, and solve the intact base case, once for the life of the block.
+
+    Yields:
+        callable: submit(label, **overrides) returning a Future of the label's ContingencyResult; `overrides`
+        replace inputs for that trace, e.g. a capped max_transfer.
+    """
+    if workers == 1:
+        context = worker_context(net, inputs)
+
+        def submit(label, **overrides):
+            future = Future()
+            future.set_result(_trace_contingency(label, overrides, context))
+            return future
+
+        yield submit
+        return
+
+    with SharedNetwork(net) as shared, \
+            ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared.spec, inputs)) as pool:
+        yield lambda label, **overrides: pool.submit(_trace_contingency, label, overrides)
+
+def sweep_contingencies(inputs, contingencies=None, workers=None, net=None):
+    """
+    Trace one PV curve per contingency, yielding results in completion order.
+
+    Args:
+        inputs (dict): PV inputs; the study settings apply to every contingency.
+        contingencies (list, optional): `bus1_bus2` labels. Defaults to the `contingencies` input.
+        workers (int, optional): Worker processes. Defaults to the CPU count; 1 traces in this process.
+        net (Network, optional): Already loaded network for the grid model.
+
+    Yields:
+        ContingencyResult
+    """
+    from cases import load_case
+    from inputs import normalize_inputs
+
+    inputs = normalize_inputs(inputs)
+    contingencies = inputs["contingencies"] if contingencies is None else list(contingencies)
+    if not contingencies:
+        return
+
+    net = net or load_case(inputs["grid_model"], inputs["base_mva"])
+    workers = min(workers or os.cpu_count() or 1, len(contingencies))
+
+    if workers == 1:
+        context = worker_context(net, inputs)
+        for label in contingencies:
+            yield _trace_contingency(label, context=context)
+        return
+
+    with contingency_pool(net, inputs, workers) as submit:
+        futures = [submit(label) for label in contingencies]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Stop queued traces if the caller stops consuming early.
+            for future in futures:
+                future.cancel()
+
+def generate_pv_curves(inputs, workers=None, net=None):
+    """
+    Base-case PV curve followed by the contingency curves when `include_contingencies` is set.
+
+    Yields:
+        ContingencyResult: The base case first, labelled "base", then contingencies as they finish.
+    """
+    from cases import load_case
+    from inputs import normalize_inputs
+
+    inputs = normalize_inputs(inputs)
+    net = net or load_case(inputs["grid_model"], inputs["base_mva"])
+
+    start = time.perf_counter()
+    yield ContingencyResult("base", generate_pv_curve(inputs, net), seconds=time.perf_counter() - start)
+
+    if inputs["include_contingencies"]:
+        yield from sweep_contingencies(inputs, workers=workers, net=net)
+
+def margin_sensitivities(study, curve, contingencies):
+    """
+    Linear estimate of each contingency's loadability margin from the base-case nose.
+
+    With w the left null vector of the Jacobian at the nose, an outage that changes the mismatches at the nose
+    point by dF moves the nose by about -w.dF / w.dF_dlambda. The estimates only order the candidates; they
+    understate severe outages, so pruning never relies on them.
+
+    Returns:
+        tuple: ({label: estimated margin in MW}, {label: error} for outages that cannot be solved)
+    """
+    net = study.net
+    problem = ContinuationProblem(
+        net, net.sbus(), study.d, study.tol, load_model=study.load_model, d_load=study.d_load
+    )
+    V = curve.states[curve.nose_index]
+    lam = curve.transfer[curve.nose_index] / net.base_mva
+    F0 = problem.mismatch(V, lam)
+
+    try:
+        lu = splu(problem.jacobian(V, lam).T.tocsc())
+        w = np.ones(problem.pattern.dim)
+        for _ in range(NULL_VECTOR_ITERATIONS):
+            w = lu.solve(w)
+            w /= np.linalg.norm(w)
+    except RuntimeError:
+        # Exactly singular at the traced nose: no ordering information, every candidate estimates the base margin.
+        w = np.zeros(problem.pattern.dim)
+    w_lam = w @ problem.lambda_derivative(V) or 1.0
+
+    estimates, errors = {}, {}
+    for label in contingencies:
+        try:
+            status = net.branch_status.copy()
+            status[parse_contingency(net, label)] = 0
+            islanded = islanded_buses(net, status)
+            if len(islanded):
+                raise ValueError(f"Outage {label} islands buses {islanded.tolist()}")
+        except ValueError as e:
+            errors[label] = str(e)
+            continue
+        dF = problem.mismatch(V, lam, net.build_ybus(status)) - F0
+        estimates[label] = float((lam - w @ dF / w_lam) * net.base_mva)
+    return estimates, errors
+
+def find_critical_contingencies(inputs, contingencies=None, k=None, workers=None, net=None):
+    """
+    The `critical_scenarios` contingencies with the smallest loadability margins.
+
+    Candidates are traced in order of estimated margin, `workers` at a time in one pool. Once K margins are
+    known, later traces stop at the current Kth-worst margin; a trace reaching it without a nose is pruned.
+
+    Args:
+        inputs (dict): PV inputs; uses `contingencies` and `critical_scenarios` unless overridden.
+        contingencies (list, optional): `bus1_bus2` labels to screen.
+        k (int, optional): Number of critical contingencies to find.
+        workers (int, optional): Worker processes. Defaults to the CPU count.
+        net (Network, optional): Already loaded network for the grid model.
+
+    Returns:
+        dict: Base margin, the K critical contingencies with their curves, and the traced/pruned/failed
+            contingencies, including `full_traces_avoided`.
+    """
+    from cases import load_case
+    from inputs import normalize_inputs
+
+    inputs = normalize_inputs(inputs)
+    contingencies = inputs["contingencies"] if contingencies is None else list(contingencies)
+    k = k or inputs["critical_scenarios"]
+    net = net or load_case(inputs["grid_model"], inputs["base_mva"])
+
+    study = PVStudy(inputs, net)
+    base = generate_pv_curve(inputs, net)
+    estimates, failed = margin_sensitivities(study, base, contingencies)
+    order = sorted(estimates, key=estimates.get)
+    workers = min(workers or os.cpu_count() or 1, max(len(order), 1))
+
+    traced, pruned = [], []
+    solves = base.stats["solves"]
+    threshold = None
+    candidates = iter(order)
+    with contingency_pool(net, inputs, workers) as submit:
+        running = {}
+
+        def submit_next():
+            label = next(candidates, None)
+            if label is None:
+                return
+            if threshold is not None and (inputs["max_transfer"] is None or threshold < inputs["max_transfer"]):
+                running[submit(label, max_transfer=threshold)] = True
+            else:
+                running[submit(label)] = False
+
+        for _ in range(workers):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                capped = running.pop(future)
+                result = future.result()
+                if result.curve is None:
+                    failed[result.contingency] = result.error
+                else:
+                    solves += result.curve.stats["solves"]
+                    if capped and result.curve.stop_reason == "max_transfer":
+                        pruned.append(result.contingency)
+                    else:
+                        traced.append(result)
+                        traced.sort(key=lambda r: r.curve.nose_transfer)
+                        if len(traced) >= k:
+                            threshold = traced[k - 1].curve.nose_transfer
+                submit_next()
+
+    return {
+        "k": k,
+        "base_margin_mw": base.nose_transfer,
+        "critical": [
+            {
+                "contingency": r.contingency,
+                "margin_mw": r.curve.nose_transfer,
+                "estimated_margin_mw": estimates[r.contingency],
+                "curve": r.curve.to_dict()
+            }
+            for r in traced[:k]
+        ],
+        "traced": [r.contingency for r in traced],
+        "pruned": pruned,
+        "failed": failed,
+        "full_traces_avoided": len(pruned),
+        "solves": solves
+    }
@@ -0,0 +1,662 @@
+"""
+Continuation power flow (CPF) for PV-curve generation.
+
+The transfer from the source buses to the sink buses is the continuation parameter. Each step predicts the
+next point along the tangent of the curve and corrects it with Newton's method on the power-flow equations
+augmented by a pseudo-arc-length constraint, so the corrector stays well conditioned at the nose and continues
+onto the lower branch. The step inputs from inputs.py act as the outer step-size policy: steps start at
+initial_step, are divided by step_reduction whenever a corrector fails or converges slowly, grow by
+step_reduction while correctors converge quickly, and the trace stops once a step would fall below min_step.
+
+With `generator_limits`, a step that carries a generator bus past a reactive limit is shortened so the point
+lands on the limit (regula falsi on the bus's limit margin); the bus switches type there and the trace goes on
+from the same point with the same matrix structure.
+"""
+import numpy as np
+import scipy.sparse as sp
+from loads import BusLoads, load_model_from_inputs
+from powerflow import CONTRACTION, JacobianPattern, SparseLU, solve_power_flow
+from qlimits import QLimitPattern
+from voltages import BusVoltages
+
+# Corrector iterations allowed per continuation step.
+MAX_CORRECTOR_ITERATIONS = 10
+# A corrector converging within this many iterations lets the next step grow by step_reduction...
+FAST_CORRECTOR_ITERATIONS = 3
+# ...and one needing more than this many shrinks it by step_reduction, before the corrector starts failing.
+SLOW_CORRECTOR_ITERATIONS = 5
+# Steps may grow up to this multiple of initial_step where the curve is nearly straight.
+MAX_STEP_FACTOR = 2
+# The lower branch is traced until the monitored voltage falls below this (p.u.) or the transfer returns to 0.
+MIN_VOLTAGE = 0.3
+# Hard cap on continuation points per curve.
+MAX_POINTS = 500
+# Correctors spent landing a step on a generator limit, and how close (p.u.) its margin must get.
+EVENT_ITERATIONS = 3
+EVENT_TOLERANCE = 1e-3
+
+class PVCurve:
+    """
+    A traced PV curve.
+
+    Attributes:
+        transfer (np.ndarray): Transfer in MW at each point.
+        voltage (np.ndarray): Monitored bus voltage magnitude (p.u.) at each point.
+        lower (np.ndarray): True for points past the nose.
+        nose_transfer (float): Maximum transfer (MW), refined between the traced points unless the nose is a
+            generator limit event, where the curve has a corner.
+        nose_voltage (float): Monitored voltage at the nose.
+        stop_reason (str): Why the trace ended.
+        stats (dict): Solve counts of the trace and the fill (nonzeros of L + U) of its last factorization.
+        states (list): Complex bus voltages at each point.
+        limit_states (list): Generator limit state of the Jacobian pattern at each point (empty arrays without
+            `generator_limits`), so a trace can resume from any point.
+        bus_voltages (BusVoltages): Voltage magnitude of every bus at every point, or None if not captured.
+    """
+
+    def __init__(self, transfer, voltage, lower, states, monitor_bus, stop_reason, stats, limit_states=None,
+                 bus_voltages=None):
+        self.transfer = np.asarray(transfer)
+        self.voltage = np.asarray(voltage)
+        self.lower = np.asarray(lower, dtype=bool)
+        self.states = states
+        self.limit_states = limit_states if limit_states is not None else [np.empty(0, dtype=np.int8)] * len(states)
+        self.bus_voltages = bus_voltages
+        self.monitor_bus = monitor_bus
+        self.stop_reason = stop_reason
+        self.stats = stats
+        self.nose_index = int(np.argmax(self.transfer))
+        self.nose_transfer, self.nose_voltage = refine_nose(self.transfer, self.voltage, self.nose_index)
+        events = [event["transfer"] for event in stats.get("limit_events", ())]
+        if np.isclose(events, self.transfer[self.nose_index]).any():
+            self.nose_transfer = float(self.transfer[self.nose_index])
+            self.nose_voltage = float(self.voltage[self.nose_index])
+
+    @property
+    def reached_nose(self):
+        return bool(self.lower.any())
+
+    def upper_branch(self):
+        return self.transfer[~self.lower], self.voltage[~self.lower]
+
+    def lower_branch(self):
+        return self.transfer[self.lower], self.voltage[self.lower]
+
+    def voltage_at(self, buses):
+        """
+        Voltage magnitudes of any bus or set of buses (external numbers) along the curve, without solving.
+
+        Returns:
+            np.ndarray: (n_points,) for a single bus, (n_points, len(buses)) for a set.
+        """
+        if self.bus_voltages is None:
+            raise ValueError("This curve kept only the monitored bus voltage")
+        return self.bus_voltages.at(buses)
+
+    def to_dict(self):
+        return {
+            "monitor_bus": self.monitor_bus,
+            "transfer": self.transfer.tolist(),
+            "voltage": self.voltage.tolist(),
+            "lower": self.lower.tolist(),
+            "nose_transfer": self.nose_transfer,
+            "nose_voltage": self.nose_voltage,
+            "reached_nose": self.reached_nose,
+            "stop_reason": self.stop_reason,
+            "stats": self.stats
+        }
+
+def refine_nose(transfer, voltage, index):
+    """Vertex of the parabola transfer(voltage) through the largest-transfer point and its neighbours."""
+    if index == 0 or index == len(transfer) - 1:
+        return float(transfer[index]), float(voltage[index])
+
+    v, p = voltage[index - 1:index + 2], transfer[index - 1:index + 2]
+    a, b, c = np.polyfit(v, p, 2)
+    if a >= 0:
+        return float(transfer[index]), float(voltage[index])
+
+    v_nose = -b / (2 * a)
+    if not min(v) <= v_nose <= max(v):
+        return float(transfer[index]), float(voltage[index])
+    return float(np.polyval([a, b, c], v_nose)), float(v_nose)
+
+def transfer_load(net, sink_buses):
+    """
+    Growth of the nominal bus loads per per-unit of transfer.
+
+    Load rises equally at the sink buses at the power factor of their existing load (unity where a sink has no
+    load).
+    """
+    sink = net.bus_index(sink_buses)
+    Pd, Qd = net.Pd[sink], net.Qd[sink]
+    q_ratio = np.divide(Qd, Pd, out=np.zeros_like(Pd), where=Pd > 0)
+
+    d_load = np.zeros(net.n_bus, dtype=complex)
+    np.add.at(d_load, sink, (1.0 + 1j * q_ratio) / len(sink))
+    return d_load
+
+def transfer_direction(net, source_buses, sink_buses):
+    """
+    Change of bus injections per per-unit of transfer: generation rises equally at the source buses, and load
+    at the sink buses as in transfer_load.
+    """
+    d = -transfer_load(net, sink_buses)
+    np.add.at(d, net.bus_index(source_buses), 1.0 / len(source_buses))
+    return d
+
+class ContinuationProblem:
+    """
+    Power-flow equations F(x, lambda) = mismatch(V(x), Sbus0 + lambda * d) for one network and transfer.
+
+    With a voltage-dependent `load_model`, the loads scheduled in Sbus0 + lambda * d (nominal load
+    load0 + lambda * d_load) follow the model, which adds to both the Jacobian and dF/dlambda.
+
+    The augmented matrix [[J, dF/dlambda], [row]] has a fixed CSC structure built once from the Jacobian
+    pattern, so its LU ordering is computed once per curve. With `reuse_factorization`, the corrector keeps its
+    factors while the residual contracts, and the tangent reuses the last factors of the corrector.
+
+    Attributes:
+        factorizations (int): Numeric LU factorizations performed so far.
+    """
+
+    def __init__(self, net, Sbus0, d, tol, ybus=None, pattern=None, reuse_factorization=False,
+                 load_model=None, d_load=None):
+        self.net = net
+        self.ybus = net.ybus if ybus is None else ybus
+        self.pattern = pattern if pattern is not None and pattern.matches(self.ybus) else \
+            JacobianPattern(self.ybus, net.pv, net.pq)
+        self.Sbus0 = Sbus0
+        self.d = d
+        self.tol = tol
+        self.reuse_factorization = reuse_factorization
+        self.dF_dlam = -np.r_[d[self.pattern.pvpq].real, d[self.pattern.pq].imag]
+        self.load_model = None if load_model is None or load_model.constant_power else load_model
+        self.load0 = net.Pd + 1j * net.Qd
+        self.d_load = d_load
+        self.lu = SparseLU()
+        self.factorizations = 0
+
+        # Every Jacobian column gains the `row` entry at the bottom; the dense dF/dlambda column comes last.
+        p, dim = self.pattern, self.pattern.dim
+        counts = np.diff(p.indptr)
+        self.indptr = np.r_[p.indptr + np.arange(dim + 1), p.indptr[-1] + 2 * dim + 1].astype(np.int32)
+        self.jacobian_pos = (np.arange(len(p.indices)) + np.repeat(np.arange(dim), counts)).astype(np.int32)
+        self.row_pos = self.indptr[1:dim + 1] - 1
+        self.indices = np.empty(self.indptr[-1], dtype=np.int32)
+        self.indices[self.jacobian_pos] = p.indices
+        self.indices[self.row_pos] = dim
+        self.indices[self.indptr[dim]:] = np.arange(dim + 1)
+        self.matrix = sp.csc_matrix((np.zeros(len(self.indices)), self.indices, self.indptr), shape=(dim + 1,) * 2)
+
+    def loads(self, lam):
+        """BusLoads at transfer lambda, or None for constant-power loads."""
+        if self.load_model is None:
+            return None
+        return BusLoads(self.load_model, self.load0 + lam * self.d_load)
+
+    def mismatch(self, V, lam, ybus=None):
+        ybus = self.ybus if ybus is None else ybus
+        return self.pattern.mismatch(ybus, V, self.Sbus0 + lam * self.d, self.loads(lam))
+
+    def jacobian(self, V, lam):
+        return self.pattern.jacobian(self.ybus, V, self.loads(lam))
+
+    def lambda_derivative(self, V):
+        """dF/dlambda at V."""
+        p = self.pattern
+        dF = self.dF_dlam
+        if self.load_model is not None:
+            # Load growth follows the model too: d(S0 * (f - 1))/dlambda = d_load * (f - 1).
+            deviation = BusLoads(self.load_model, self.d_load).deviation(np.abs(V))
+            dF = dF + np.r_[deviation[p.pvpq].real, deviation[p.pq].imag]
+        if len(p.voltage_rows):
+            dF = dF.copy()
+            dF[p.voltage_rows] = 0.0
+        return dF
+
+    def limit_margins(self, V, lam):
+        """Generator limit margins at a point; empty without limit enforcement."""
+        return self.pattern.limit_margins(self.ybus, V, self.Sbus0 + lam * self.d, self.loads(lam))
+
+    def switch_limits(self, V, lam, generators):
+        Sbus = self.Sbus0 + lam * self.d
+        return self.pattern.switch_limits(self.ybus, V, Sbus, self.loads(lam), self.tol, generators)
+
+    def augmented(self, V, lam, row):
+        """[[J, dF/dlambda], [row]] as a CSC matrix; the same matrix object is refilled by every call."""
+        data = np.empty(len(self.indices))
+        data[self.jacobian_pos] = self.pattern.values(self.ybus, V, self.loads(lam))
+        data[self.row_pos] = row[:-1]
+        data[self.indptr[-2]:-1] = self.lambda_derivative(V)
+        data[-1] = row[-1]
+        self.matrix.data = data
+        return self.matrix
+
+    def factorize(self, V, lam, row):
+        lu = self.lu.factorize(self.augmented(V, lam, row))
+        self.factorizations += 1
+        return lu
+
+    def difference(self, V, V_ref):
+        """x(V) - x(V_ref), wrap-safe in the angles."""
+        p = self.pattern
+        return np.concatenate([np.angle(V[p.pvpq] / V_ref[p.pvpq]), np.abs(V[p.pq]) - np.abs(V_ref[p.pq])])
+
+    def tangent(self, V, lam, previous, lu=None):
+        """
+        Unit tangent of the curve at V, oriented to continue in the direction of `previous`.
+
+        Returns:
+            tuple: (tangent, factorization used)
+        """
+        rhs = np.zeros(self.pattern.dim + 1)
+        rhs[-1] = 1.0
+        lu = lu or self.factorize(V, lam, previous)
+        z = lu.solve(rhs)
+        return z / np.linalg.norm(z), lu
+
+    def correct(self, V_pred, lam_pred, tangent, lu=None):
+        """
+        Newton corrector on F = 0 plus the arc-length hyperplane through the predicted point.
+
+        Args:
+            lu (Factorization, optional): Factors to start from when reusing factorizations.
+
+        Returns:
+            tuple: (V, lambda, converged, iterations, factors from this call or None)
+        """
+        V, lam = V_pred, lam_pred
+        fresh, last, refactored = False, np.inf, None
+        for iteration in range(MAX_CORRECTOR_ITERATIONS + 1):
+            F = self.mismatch(V, lam)
+            P = tangent[:-1] @ self.difference(V, V_pred) + tangent[-1] * (lam - lam_pred)
+            residual = np.append(F, P)
+            worst = np.abs(residual).max()
+            if worst < self.tol:
+                return V, lam, True, iteration, refactored
+            if lu is not None and not worst < CONTRACTION * last:
+                # Stale factors stopped contracting: refactorize, retrying from the last point if the step diverged.
+                if not fresh and not worst < last:
+                    V, lam, residual, worst = V_last, lam_last, residual_last, last
+                lu = None
+            if iteration == MAX_CORRECTOR_ITERATIONS or not np.isfinite(worst):
+                break
+
+            fresh = lu is None
+            if fresh:
+                try:
+                    lu = refactored = self.factorize(V, lam, tangent)
+                except RuntimeError:
+                    break
+            V_last, lam_last, residual_last, last = V, lam, residual, worst
+            dz = lu.solve(-residual)
+            V = self.pattern.update(V, dz[:-1])
+            lam += dz[-1]
+            if not self.reuse_factorization:
+                lu = None
+
+        return V, lam, False, iteration, refactored
+
+def trace_curve(problem, V0, monitor, initial_step, min_step, step_reduction, max_transfer=None, lam0=0.0,
+                on_point=None):
+    """
+    Trace the PV curve from a converged base point.
+
+    Args:
+        problem (ContinuationProblem): Equations of the study, with the generator limit state of the start point.
+        V0 (np.ndarray): Converged voltages at the start point.
+        monitor (int): Internal index of the monitored bus.
+        initial_step, min_step (float): Step policy in per-unit of transfer (arc length).
+        step_reduction (float): Factor a step is divided by after a failed or slow corrector, and multiplied by
+            after a fast one.
+        max_transfer (float, optional): Upper transfer bound in per-unit.
+        lam0 (float): Transfer at the start point, which must be on the upper branch; 0 for the base case.
+        on_point (callable, optional): Called as on_point(transfer_mw, voltage, lower) with the start point and
+            each point as it is accepted.
+
+    Returns:
+        tuple: (lambdas, voltages, lower flags, states, limit states, stop reason, stats)
+    """
+    V, lam = V0, lam0
+    lambdas, voltages, lower, states = [lam0], [abs(V0[monitor])], [False], [V0]
+    if on_point is not None:
+        on_point(lam0 * problem.net.base_mva, voltages[0], False)
+    limit_states = [problem.pattern.limit_state()]
+    stats = {
+        "solves": 0, "failed_solves": 0, "iterations": 0, "factorizations": 0,
+        "solves_to_nose": None, "iterations_to_nose": None,
+        "limit_events": [], "event_solves": 0, "event_iterations": 0
+    }
+    margins = problem.limit_margins(V0, lam0)
+    switched, held = [], None
+
+    tangent = np.zeros(problem.pattern.dim + 1)
+    tangent[-1] = 1.0
+    step = initial_step
+    past_nose = False
+    stop_reason = "max_points"
+    factorizations = problem.factorizations
+    lu = None
+
+    while len(lambdas) < MAX_POINTS:
+        try:
+            tangent, lu = problem.tangent(V, lam, tangent, lu)
+        except RuntimeError:
+            stop_reason = "singular"
+            break
+        if held is not None:
+            columns, signs = held
+            if signs @ tangent[columns] < 0:
+                tangent = -tangent
+            held = None
+
+        # Land the predictor on max_transfer instead of overshooting it.
+        if max_transfer is not None and not past_nose and lam + step * tangent[-1] > max_transfer:
+            step = (max_transfer - lam) / tangent[-1]
+
+        V_pred = problem.pattern.update(V, step * tangent[:-1])
+        lam_pred = lam + step * tangent[-1]
+        V_new, lam_new, converged, iterations, refactored = problem.correct(
+            V_pred, lam_pred, tangent, lu if problem.reuse_factorization else None
+        )
+        # The next tangent reuses factors the corrector computed near the new point, or is factorized afresh.
+        lu = refactored if problem.reuse_factorization and converged else None
+
+        stats["solves"] += 1
+        stats["iterations"] += iterations
+
+        # Past the nose the transfer only falls; a rising point means the corrector jumped to another branch.
+        if converged and past_nose and lam_new > lam:
+            converged = False
+
+        if not converged:
+            stats["failed_solves"] += 1
+            step /= step_reduction
+            if step < min_step:
+                stop_reason = "min_step"
+                break
+            continue
+
+        if len(margins):
+            V_new, lam_new, events = land_on_limits(
+                problem, V, lam, tangent, step, V_new, lam_new, margins, switched, stats
+            )
+            if events:
+                # The switched rows changed the Jacobian; the tangent needs fresh factors and, after a crossing
+                # landed on a limit, an orientation that keeps the held buses there. A bus already past its
+                # limit at the start point (within the base-case tolerance) was never on it, so its switch
+                # keeps the current orientation.
+                lu = None
+                if V_new is not V:
+                    held = problem.pattern.held_directions([bus for bus, _ in events])
+                stats["limit_events"] += [
+                    {"bus": int(problem.net.bus_numbers[bus]), "limit": limit,
+                     "transfer": float(lam_new * problem.net.base_mva)}
+                    for bus, limit in events
+                ]
+            margins = problem.limit_margins(V_new, lam_new)
+            if V_new is V:
+                # Switched at the current point: retake the step with the new equations.
+                switched += [bus for bus, _ in events]
+                continue
+            switched = [bus for bus, _ in events]
+
+        if not past_nose and lam_new < lam:
+            past_nose = True
+            stats["solves_to_nose"] = stats["solves"]
+            stats["iterations_to_nose"] = stats["iterations"]
+
+        V, lam = V_new, lam_new
+        lambdas.append(lam)
+        voltages.append(abs(V[monitor]))
+        lower.append(past_nose)
+        states.append(V)
+        limit_states.append(problem.pattern.limit_state())
+        if on_point is not None:
+            on_point(lam * problem.net.base_mva, voltages[-1], past_nose)
+
+        if iterations <= FAST_CORRECTOR_ITERATIONS:
+            step = min(step * step_reduction, initial_step * MAX_STEP_FACTOR)
+        elif iterations > SLOW_CORRECTOR_ITERATIONS:
+            step = max(step / step_reduction, min_step)
+
+        if max_transfer is not None and lam >= max_transfer * (1 - 1e-6) and not past_nose:
+            stop_reason = "max_transfer"
+            break
+        if past_nose and (lam <= 0 or voltages[-1] < MIN_VOLTAGE):
+            stop_reason = "lower_branch_complete"
+            break
+
+    stats["factorizations"] = problem.factorizations - factorizations
+    stats["lu_fill"] = problem.lu.fill
+    return lambdas, voltages, lower, states, limit_states, stop_reason, stats
+
+def land_on_limits(problem, V, lam, tangent, step, V_new, lam_new, margins, switched, stats):
+    """
+    Move a converged step back to the first generator limit it crossed, and switch that bus there.
+
+    The crossing is located by regula falsi on the bus's limit margin over the step length, each trial being a
+    full corrector from the predictor at that length; the trials are counted in `stats`. If a trial fails, the
+    bus switches at the best point found. A bus whose margin was already used up at the start of the step
+    switches at the start point, which is returned as the same V object. Buses in `switched` (internal
+    numbers) just switched at the start point and are not switched back there.
+
+    Returns:
+        tuple: (V, lambda, switch events) of the point to accept.
+    """
+    new_margins = problem.limit_margins(V_new, lam_new)
+    crossed = np.flatnonzero(new_margins < -EVENT_TOLERANCE)
+    crossed = crossed[~np.isin(problem.pattern.buses[crossed], switched)]
+    if not len(crossed):
+        return V_new, lam_new, []
+
+    start = np.maximum(margins[crossed], 0.0)
+    fractions = start / (start - new_margins[crossed])
+    if not fractions.min() > 0:
+        return V, lam, problem.switch_limits(V, lam, crossed[fractions == 0])
+
+    first = crossed[np.argmin(fractions)]
+    s0, m0, s1, m1 = 0.0, start[np.argmin(fractions)], step, new_margins[first]
+    for _ in range(EVENT_ITERATIONS):
+        s = s0 - m0 * (s1 - s0) / (m1 - m0)
+        V_e, lam_e, converged, iterations, _ = problem.correct(
+            problem.pattern.update(V, s * tangent[:-1]), lam + s * tangent[-1], tangent
+        )
+        stats["solves"] += 1
+        stats["iterations"] += iterations
+        stats["event_solves"] += 1
+        stats["event_iterations"] += iterations
+        if not converged:
+            break
+        V_new, lam_new, new_margins = V_e, lam_e, problem.limit_margins(V_e, lam_e)
+        m = new_margins[first]
+        if abs(m) < EVENT_TOLERANCE:
+            break
+        if m > 0:
+            s0, m0 = s, m
+        else:
+            s1, m1 = s, m
+
+    # Buses the step carried past their limits switch together if they reach them at the same point.
+    switching = np.union1d(crossed[new_margins[crossed] < EVENT_TOLERANCE], [first])
+    return V_new, lam_new, problem.switch_limits(V_new, lam_new, switching)
+
+def trace_step_reduction(net, Sbus0, d, V0, monitor, initial_step, min_step, step_reduction, tol,
+                         max_transfer=None, loads=None, pattern=None):
+    """
+    Reference method: raise the transfer by a fixed step with warm-started power flows, dividing the step by
+    step_reduction after every failure until it falls below min_step. Traces the upper branch only.
+
+    `loads` maps a transfer to the BusLoads at that transfer when the loads are voltage dependent, and
+    `pattern` may be a QLimitPattern to enforce generator limits in every solve.
+
+    Returns:
+        tuple: (lambdas, voltages, solves, iterations)
+    """
+    pattern = pattern or JacobianPattern(net.ybus, net.pv, net.pq)
+    V, lam = V0, 0.0
+    lambdas, voltages = [0.0], [abs(V0[monitor])]
+    step = initial_step
+    solves = iterations = 0
+
+    while step >= min_step:
+        trial = lam + step
+        if max_transfer is not None and lam >= max_transfer:
+            break
+        if max_transfer is not None:
+            trial = min(trial, max_transfer)
+
+        result = solve_power_flow(
+            net, Sbus0 + trial * d, V0=V, tol=tol, pattern=pattern, load=loads(trial) if loads else None
+        )
+        solves += 1
+        iterations += result.iterations
+        if result.converged:
+            V, lam = result.V, trial
+            lambdas.append(lam)
+            voltages.append(abs(V[monitor]))
+        else:
+            step /= step_reduction
+
+    return lambdas, voltages, solves, iterations
+
+class PVStudy:
+    """Network, transfer direction and step policy of one PV input set, in per-unit."""
+
+    def __init__(self, inputs, net=None):
+        from cases import load_case
+        from inputs import normalize_inputs
+
+        self.inputs = normalize_inputs(inputs)
+        if not self.inputs["source_buses"] or not self.inputs["sink_buses"]:
+            raise ValueError("PV curve generation needs at least one source bus and one sink bus")
+
+        self.net = net or load_case(self.inputs["grid_model"], self.inputs["base_mva"])
+        base = self.net.base_mva
+        self.tol = self.inputs["mva_tolerance"] / base
+        self.d = transfer_direction(self.net, self.inputs["source_buses"], self.inputs["sink_buses"])
+        self.d_load = transfer_load(self.net, self.inputs["sink_buses"])
+        self.load_model = load_model_from_inputs(self.inputs)
+        self.monitor_bus = self.inputs["monitor_bus"] or self.inputs["sink_buses"][0]
+        self.monitor = int(self.net.bus_index(self.monitor_bus)[0])
+        self.initial_step = self.inputs["initial_step"] / base
+        self.min_step = self.inputs["min_step"] / base
+        self.step_reduction = self.inputs["step_reduction"]
+        self.max_transfer = self.inputs["max_transfer"] / base if self.inputs["max_transfer"] else None
+        self.generator_limits = self.inputs["generator_limits"]
+
+    def jacobian_pattern(self, ybus=None):
+        """Jacobian structure for the study, with generator limits if the inputs ask for them."""
+        ybus = self.net.ybus if ybus is None else ybus
+        if self.generator_limits:
+            return QLimitPattern(ybus, self.net)
+        return JacobianPattern(ybus, self.net.pv, self.net.pq)
+
+    def loads(self, lam):
+        """BusLoads at transfer lambda, or None for constant-power loads."""
+        if self.load_model.constant_power:
+            return None
+        return BusLoads(self.load_model, self.net.Pd + 1j * self.net.Qd + lam * self.d_load)
+
+    def base_case(self, ybus=None, pattern=None, V0=None, reuse_factorization=False):
+        """Zero-transfer power flow, warm-started from V0 (e.g. the intact-network solution) when given."""
+        pattern = pattern or self.jacobian_pattern(ybus)
+        result = solve_power_flow(
+            self.net, V0=V0, tol=self.tol, ybus=ybus, pattern=pattern, reuse_factorization=reuse_factorization,
+            load=self.loads(0.0)
+        )
+        if not result.converged and V0 is not None:
+            pattern.reset_limits()
+            result = solve_power_flow(self.net, tol=self.tol, ybus=ybus, pattern=pattern, load=self.loads(0.0))
+        if not result.converged:
+            limits = " with generator reactive limits enforced" if self.generator_limits else ""
+            raise RuntimeError(f"Base case power flow of {self.inputs['grid_model']}{limits} did not converge")
+        return result
+
+def generate_pv_curve(inputs, net=None, ybus=None, pattern=None, V0=None, reuse_factorization=True,
+                      compression=None, on_point=None):
+    """
+    Generate the PV curve described by a PV input set.
+
+    Args:
+        inputs (dict): PV inputs as collected by inputs.py or stored in inputs.json/pv_inputs.json.
+        net (Network, optional): Already loaded network for the grid model.
+        ybus (scipy.sparse.csr_matrix, optional): Admittance matrix override, e.g. for a contingency.
+        pattern (JacobianPattern, optional): Precomputed Jacobian structure to reuse; replaced if it does not
+            match the Ybus or the `generator_limits` input.
+        V0 (np.ndarray, optional): Initial guess for the base case, e.g. the intact-network voltages.
+        reuse_factorization (bool): Dishonest Newton: keep LU factors while the corrector contracts.
+        compression (str, optional): Format of the all-bus voltage capture, "float32" or "delta"; by default
+            delta-coded from voltages.DELTA_MIN_BUSES buses on.
+        on_point (callable, optional): Called as on_point(transfer_mw, voltage, lower) for each point as it is
+            traced, base case first.
+
+    Returns:
+        PVCurve
+    """
+    study = PVStudy(inputs, net)
+    ybus = study.net.ybus if ybus is None else ybus
+    if pattern is None or not pattern.matches(ybus) or isinstance(pattern, QLimitPattern) != study.generator_limits:
+        pattern = study.jacobian_pattern(ybus)
+    pattern.reset_limits()
+    problem = ContinuationProblem(
+        study.net, study.net.sbus(), study.d, study.tol, ybus=ybus, pattern=pattern,
+        reuse_factorization=reuse_factorization, load_model=study.load_model, d_load=study.d_load
+    )
+    base = study.base_case(problem.ybus, problem.pattern, V0, reuse_factorization)
+
+    lambdas, voltages, lower, states, limit_states, stop_reason, stats = trace_curve(
+        problem, base.V, study.monitor,
+        study.initial_step, study.min_step, study.step_reduction, study.max_transfer, on_point=on_point
+    )
+    stats["solves"] += 1  # base case
+    stats["factorizations"] += base.factorizations
+    stats["limit_events"][:0] = [
+        {"bus": int(study.net.bus_numbers[bus]), "limit": limit, "transfer": 0.0} for bus, limit in base.limit_events
+    ]
+
+    return PVCurve(
+        np.asarray(lambdas) * study.net.base_mva, voltages, lower, states,
+        study.monitor_bus, stop_reason, stats, limit_states,
+        BusVoltages.from_states(states, study.net.bus_numbers, compression)
+    )
+
+def compare_with_step_reduction(inputs, net=None):
+    """
+    Power-flow solves of the continuation trace versus pure step reduction on the same inputs.
+
+    Both methods start from the same converged base case, which is counted as one solve for each. With
+    generator limits on, every limit event the continuation lands on adds solves that step reduction, which
+    steps over the events, does not pay, so `solves_saved` can be negative.
+
+    Returns:
+        dict: Solve and Newton iteration counts, solves saved to reach the nose and both nose estimates in MW.
+    """
+    study = PVStudy(inputs, net)
+    curve = generate_pv_curve(study.inputs, study.net)
+
+    pattern = study.jacobian_pattern()
+    V0 = study.base_case(pattern=pattern).V
+    lambdas, _, solves, iterations = trace_step_reduction(
+        study.net, study.net.sbus(), study.d, V0, study.monitor,
+        study.initial_step, study.min_step, study.step_reduction, study.tol, study.max_transfer, study.loads,
+        pattern
+    )
+    solves += 1  # base case
+
+    stats = curve.stats
+    to_nose = (stats["solves_to_nose"] or stats["solves"] - 1) + 1
+    iterations_to_nose = stats["iterations"] if stats["iterations_to_nose"] is None else stats["iterations_to_nose"]
+    return {
+        "continuation_solves_to_nose": to_nose,
+        "continuation_solves_total": stats["solves"],
+        "continuation_iterations_to_nose": iterations_to_nose,
+        "step_reduction_solves": solves,
+        "step_reduction_iterations": iterations,
+        "solves_saved": solves - to_nose,
+        "continuation_nose_mw": curve.nose_transfer,
+        "step_reduction_nose_mw": lambdas[-1] * study.net.base_mva,
+        "lower_branch_points": int(curve.lower.sum()),
+        "limit_events": len(stats["limit_events"])
+    }
@@ -0,0 +1,217 @@
+"""
+Store of traced PV curves keyed by what determines them.
+
+A curve depends on the network and on a handful of PV inputs; the agents edit many others (frequency,
+contingency settings, tolerances of other stages) that do not change it. curve_key hashes the normalized
+inputs that generate_pv_curve reads, in canonical form (sorted bus sets, the resolved monitor bus, the load
+model as coefficients and exponents), together with the network's content hash. Equal keys therefore mean
+equal curves, however the inputs were spelled in inputs.json or pv_inputs.json.
+
+Curves are kept as one .npz file per key: transfer, monitored voltage and the voltage magnitude and angle of
+every bus at every point as float32 columns, the bus numbers, the generator limit states as int8, and the
+stop reason, nose and stats as JSON. The directory is bounded in bytes, evicting the least recently used curves first.
+"""
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from continuation import PVCurve, PVStudy, generate_pv_curve
+from netcache import network_hash
+from voltages import BusVoltages
+
+# Bump when the stored layout or the curve an input set produces changes; old entries are then ignored.
+FORMAT_VERSION = 3
+# Default store location; PV_CURVE_STORE overrides it.
+STORE_DIR = os.environ.get(
+    "PV_CURVE_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "curve-store")
+)
+# Default size bound of the store.
+MAX_BYTES = 256 * 1024 * 1024
+
+def curve_inputs(study):
+    """The normalized inputs a PVStudy's curve depends on, in canonical form (the network aside)."""
+    inputs = study.inputs
+    return {
+        "base_mva": study.net.base_mva,
+        "source_buses": sorted(inputs["source_buses"]),
+        "sink_buses": sorted(inputs["sink_buses"]),
+        "monitor_bus": int(study.monitor_bus),
+        "initial_step": inputs["initial_step"],
+        "min_step": inputs["min_step"],
+        "step_reduction": inputs["step_reduction"],
+        "max_transfer": inputs["max_transfer"] or None,
+        "load_coefficients": study.load_model.coefficients.tolist(),
+        "load_exponents": study.load_model.exponents.tolist(),
+        "generator_limits": inputs["generator_limits"],
+        "mva_tolerance": inputs["mva_tolerance"]
+    }
+
+def curve_key(study, reuse_factorization=True):
+    """Store key of the curve generate_pv_curve traces for a PVStudy."""
+    fields = {**curve_inputs(study), "reuse_factorization": reuse_factorization}
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}:{network_hash(study.net)}:".encode())
+    digest.update(json.dumps(fields, sort_keys=True).encode())
+    return digest.hexdigest()[:24]
+
+def save_curve(curve, path):
+    """Write a curve as an .npz file of float32 columns and JSON metadata, atomically."""
+    states = np.array(curve.states)
+    capture = curve.bus_voltages
+    meta = {
+        "format": FORMAT_VERSION, "monitor_bus": curve.monitor_bus, "stop_reason": curve.stop_reason,
+        "nose_transfer": curve.nose_transfer, "nose_voltage": curve.nose_voltage, "stats": curve.stats,
+        "compression": capture.compression if capture is not None else None
+    }
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            transfer=curve.transfer.astype(np.float32),
+            voltage=curve.voltage.astype(np.float32),
+            lower=curve.lower,
+            vm=np.abs(states).astype(np.float32),
+            va=np.angle(states).astype(np.float32),
+            limit_states=np.array(curve.limit_states, dtype=np.int8).reshape(len(states), -1),
+            bus_numbers=capture.bus_numbers if capture is not None else np.empty(0, dtype=np.int64),
+            meta=np.array(json.dumps(meta))
+        )
+    os.replace(tmp, path)
+
+def load_curve(path):
+    """
+    Read a stored curve, or None if there is none at `path` in the current format.
+
+    Transfer and voltages come back from float32, so they match the traced curve to about 7 digits; the nose
+    is stored exactly.
+    """
+    try:
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["format"] != FORMAT_VERSION:
+                return None
+            arrays = {
+                name: data[name] for name in ("transfer", "voltage", "lower", "vm", "va", "limit_states", "bus_numbers")
+            }
+    except (OSError, ValueError, KeyError):
+        return None
+
+    states = list(arrays["vm"].astype(float) * np.exp(1j * arrays["va"].astype(float)))
+    capture = BusVoltages(arrays["vm"], arrays["bus_numbers"], meta["compression"]) if meta["compression"] else None
+    curve = PVCurve(
+        arrays["transfer"].astype(float), arrays["voltage"].astype(float), arrays["lower"], states,
+        meta["monitor_bus"], meta["stop_reason"], meta["stats"], list(arrays["limit_states"]), capture
+    )
+    curve.nose_transfer, curve.nose_voltage = meta["nose_transfer"], meta["nose_voltage"]
+    return curve
+
+class CurveStore:
+    """
+    Size-bounded directory of stored curves, with hit and miss counts.
+
+    Args:
+        directory (str, optional): Store directory. Defaults to STORE_DIR.
+        max_bytes (int): Size bound; the least recently used curves are evicted past it.
+    """
+
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        self.directory = directory or STORE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """The stored curve with this key, or None. A hit marks the curve as recently used."""
+        curve = load_curve(self.path(key))
+        if curve is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+        return curve
+
+    def put(self, key, curve):
+        """Store a curve, then evict least recently used curves until the store fits max_bytes."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            save_curve(curve, self.path(key))
+        except OSError:
+            return
+        self.evict()
+
+    def entries(self):
+        """(path, bytes, last use) of every stored curve, least recently used first."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".npz")]
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((os.path.join(self.directory, name), info.st_size, info.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        for path, nbytes, _ in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= nbytes
+            self.evictions += 1
+
+    def stats(self):
+        """Hit rate of this store object and current size of the directory."""
+        entries = self.entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "curves": len(entries),
+            "bytes": sum(entry[1] for entry in entries),
+            "max_bytes": self.max_bytes
+        }
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def cached_pv_curve(inputs, net=None, store=None, reuse_factorization=True):
+    """
+    generate_pv_curve, answered from the curve store when the same curve was traced before.
+
+    Args:
+        inputs (dict): PV inputs, e.g. as read from inputs.json or pv_inputs.json.
+        net (Network, optional): Already loaded network for the grid model.
+        store (CurveStore, optional): Store to use. Defaults to one at STORE_DIR.
+        reuse_factorization (bool): Passed to generate_pv_curve; part of the key.
+
+    Returns:
+        PVCurve, with stats["store"] set to "hit" or "miss".
+    """
+    store = store or CurveStore()
+    study = PVStudy(inputs, net)
+    key = curve_key(study, reuse_factorization)
+    curve = store.get(key)
+    if curve is None:
+        curve = generate_pv_curve(study.inputs, study.net, reuse_factorization=reuse_factorization)
+        store.put(key, curve)
+        curve.stats["store"] = "miss"
+    else:
+        curve.stats["store"] = "hit"
+    return curve
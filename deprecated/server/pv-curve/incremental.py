@@ -0,0 +1,228 @@
+"""
+Incremental PV-curve recomputation after edits to the inputs.
+
+The agents change one input at a time in inputs.json (agent/main.py: command_agent) or pv_inputs.json
+(ai/main2.py: modify_pv_input). Each input feeds one computation stage, and a change reruns that stage and
+the ones after it:
+
+    network    grid_model, base_mva                           load the case, then everything below
+    base_case  load model, generator_limits, mva_tolerance    zero-transfer power flow and the whole trace
+    trace      source/sink buses, initial_step, step_reduction the trace, from the stored base case
+    resume     max_transfer, min_step                         the trace from a stored point onwards
+    readout    monitor_bus                                    monitored voltages, read from the curve's capture
+    none       every other input                              nothing
+
+A curve keeps every bus's voltages and the generator limit state at each point, so any upper-branch point
+can serve as a start. A raised max_transfer continues from the last point, and a lowered one from the last
+point below it. A smaller min_step retraces from the point before the nose. Resumed curves converge to the
+same tolerance as full traces but are stepped differently from the start point onwards, so they are not
+stored in the curve store, whose keys promise the curve of a full trace.
+"""
+import json
+import time
+from collections import deque
+import numpy as np
+from continuation import ContinuationProblem, PVCurve, PVStudy, generate_pv_curve, trace_curve
+from curvestore import curve_key
+from inputs import normalize_inputs
+from voltages import BusVoltages
+
+# Computation stages, upstream first.
+STAGES = ("network", "base_case", "trace", "resume", "readout", "none")
+# Stage each input feeds; inputs not listed do not affect the curve.
+INPUT_STAGES = {
+    "grid_model": "network",
+    "base_mva": "network",
+    "load_model": "base_case",
+    "voltage_exponent": "base_case",
+    "zip_coefficients": "base_case",
+    "generator_limits": "base_case",
+    "mva_tolerance": "base_case",
+    "source_buses": "trace",
+    "sink_buses": "trace",
+    "initial_step": "trace",
+    "step_reduction": "trace",
+    "max_transfer": "resume",
+    "min_step": "resume",
+    "monitor_bus": "readout"
+}
+# Recomputations kept in PVSession.log.
+LOG_SIZE = 200
+
+def changed_inputs(old, new):
+    """Normalized inputs whose value differs, as {name: (old, new)}."""
+    return {key: (old.get(key), value) for key, value in new.items() if old.get(key) != value}
+
+def recompute_stage(changed):
+    """Most upstream stage fed by the changed inputs."""
+    stages = [INPUT_STAGES.get(key, "none") for key in changed]
+    return min(stages, key=STAGES.index, default="none")
+
+def resume_point(curve, old, new):
+    """
+    Point a trace can resume from after max_transfer or min_step changed, and why.
+
+    Returns:
+        tuple: (point index or None if the curve is still valid, reason)
+    """
+    candidates = []
+    upper = ~curve.lower
+    if old["max_transfer"] != new["max_transfer"]:
+        old_max, new_max = old["max_transfer"], new["max_transfer"]
+        if curve.stop_reason == "max_transfer" and (not new_max or new_max > old_max):
+            candidates.append((len(curve.transfer) - 1, f"max_transfer raised: extending from {old_max:g} MW"))
+        elif new_max and (upper & (curve.transfer >= new_max)).any():
+            below = np.flatnonzero(upper & (curve.transfer < new_max))
+            candidates.append((int(below[-1]), f"max_transfer lowered to {new_max:g} MW: cutting back"))
+
+    if new["min_step"] < old["min_step"] and curve.stop_reason != "max_transfer":
+        if curve.reached_nose:
+            candidates.append((max(curve.nose_index - 1, 0), f"min_step reduced to {new['min_step']:g} MW: "
+                                                             "refining from the point before the nose"))
+        else:
+            candidates.append((len(curve.transfer) - 1, f"min_step reduced to {new['min_step']:g} MW: "
+                                                        "continuing past the min_step stop"))
+
+    if not candidates:
+        return None, "the curve still satisfies the new max_transfer and min_step"
+    return min(candidates)
+
+def resume_curve(study, curve, index, reuse_factorization=True):
+    """
+    Trace a study's curve onwards from point `index` of a previous curve of the same network and direction.
+
+    The points before `index` are kept; their monitored voltages are read for the study's monitor bus.
+    """
+    base = study.net.base_mva
+    pattern = study.jacobian_pattern()
+    pattern.restore_limits(curve.limit_states[index])
+    problem = ContinuationProblem(
+        study.net, study.net.sbus(), study.d, study.tol, pattern=pattern, reuse_factorization=reuse_factorization,
+        load_model=study.load_model, d_load=study.d_load
+    )
+    lam0 = curve.transfer[index] / base
+    lambdas, voltages, lower, states, limit_states, stop_reason, stats = trace_curve(
+        problem, curve.states[index], study.monitor, study.initial_step, study.min_step, study.step_reduction,
+        study.max_transfer, lam0
+    )
+    stats["limit_events"][:0] = [
+        event for event in curve.stats.get("limit_events", ()) if event["transfer"] <= curve.transfer[index]
+    ]
+
+    states = list(curve.states[:index]) + states
+    compression = curve.bus_voltages.compression if curve.bus_voltages is not None else None
+    return PVCurve(
+        np.r_[curve.transfer[:index], np.asarray(lambdas) * base],
+        np.r_[[abs(V[study.monitor]) for V in states[:index]], voltages],
+        np.r_[np.zeros(index, dtype=bool), lower],
+        states, study.monitor_bus, stop_reason, stats, list(curve.limit_states[:index]) + limit_states,
+        BusVoltages.from_states(states, study.net.bus_numbers, compression)
+    )
+
+def read_monitor(study, curve):
+    """The same curve read at the study's monitor bus from its all-bus voltage capture, without solving."""
+    stats = {**curve.stats, "solves": 0, "iterations": 0, "factorizations": 0}
+    return PVCurve(
+        curve.transfer, curve.voltage_at(study.monitor_bus), curve.lower, curve.states, study.monitor_bus,
+        curve.stop_reason, stats, curve.limit_states, curve.bus_voltages
+    )
+
+class PVSession:
+    """
+    The current PV curve of an input set, recomputed as little as possible when the inputs change.
+
+    Args:
+        path (str, optional): inputs.json or pv_inputs.json, read by refresh().
+        store (CurveStore, optional): Store consulted before any full trace, and given every full trace.
+        reuse_factorization (bool): Passed to the traces.
+
+    Attributes:
+        curve (PVCurve): Latest curve; its stats["recompute"] says how it was obtained.
+        log (collections.deque): One entry per update: changed inputs, stage, reason, reused points, solves
+            and seconds.
+    """
+
+    def __init__(self, path=None, store=None, reuse_factorization=True):
+        self.path = path
+        self.store = store
+        self.reuse_factorization = reuse_factorization
+        self.inputs = None
+        self.study = None
+        self.curve = None
+        self.log = deque(maxlen=LOG_SIZE)
+
+    def refresh(self):
+        """Reread the inputs file and update the curve."""
+        with open(self.path) as f:
+            return self.update(json.load(f))
+
+    def update(self, inputs):
+        """
+        The curve of `inputs`, recomputing only the stages the changed inputs feed.
+
+        Returns:
+            PVCurve
+        """
+        start = time.perf_counter()
+        new = normalize_inputs(inputs)
+        if self.curve is None:
+            changed, stage, reason = {}, "network", "first curve of the session"
+        else:
+            changed = changed_inputs(self.inputs, new)
+            stage = recompute_stage(changed)
+            reason = ", ".join(f"{key} changed" for key in changed) or "no input changed"
+
+        if stage == "none":
+            if changed:
+                reason = f"{', '.join(changed)} changed, which the curve does not depend on"
+            return self._finish(self.curve, new, changed, stage, reason, len(self.curve.transfer), start)
+
+        study = PVStudy(new, None if stage == "network" else self.study.net)
+        curve, reused = None, 0
+        if stage == "resume":
+            index, reason = resume_point(self.curve, self.inputs, new)
+            if index is None:
+                stage = "readout"
+            else:
+                curve, reused = resume_curve(study, self.curve, index, self.reuse_factorization), index
+        if stage == "readout":
+            curve, reused = read_monitor(study, self.curve), len(self.curve.transfer)
+            if "monitor_bus" in changed:
+                reason = f"monitor_bus changed to {study.monitor_bus}: read from stored voltages" + \
+                    ("" if "monitor_bus" in reason else f"; {reason}")
+        elif stage == "trace":
+            reason = f"{reason}: retracing from the stored base case"
+            curve = resume_curve(study, self.curve, 0, self.reuse_factorization)
+            reused = 1
+        elif curve is None:
+            curve, stored = self._full_trace(study)
+            reason = f"{reason}: {'stored curve for these inputs' if stored else 'full trace'}"
+
+        self.study = study
+        return self._finish(curve, new, changed, stage, reason, reused, start)
+
+    def _full_trace(self, study):
+        if self.store is None:
+            return generate_pv_curve(study.inputs, study.net, reuse_factorization=self.reuse_factorization), False
+        key = curve_key(study, self.reuse_factorization)
+        curve = self.store.get(key)
+        if curve is not None:
+            return curve, True
+        curve = generate_pv_curve(study.inputs, study.net, reuse_factorization=self.reuse_factorization)
+        self.store.put(key, curve)
+        return curve, False
+
+    def _finish(self, curve, inputs, changed, stage, reason, reused, start):
+        entry = {
+            "changed": changed,
+            "stage": stage,
+            "reason": reason,
+            "reused_points": reused,
+            "points": len(curve.transfer),
+            "solves": curve.stats["solves"] if stage != "none" else 0,
+            "seconds": time.perf_counter() - start
+        }
+        curve.stats["recompute"] = {key: entry[key] for key in ("stage", "reason", "reused_points")}
+        self.log.append(entry)
+        self.inputs, self.curve = inputs, curve
+        return curve
@@ -33,7 +33,7 @@ def collect_simple_pv_inputs():
     
     # This specifies the name or identifier of the electrical power system network being analyzed.
     # In PV-curve analysis, the grid model determines the network topology, impedances, and generation/load distribution that affect voltage stability limits.
-    grid_model = input("Grid model (e.g., IEEE 39): ")
+    grid_model = input("Grid model (e.g., IEEE 39, or a .m or .raw case file): ")
     
     # This is the reference power value (in MVA) used to normalize all power quantities in the system.
     # For PV-curves, the base MVA ensures consistent per-unit calculations when determining maximum power transfer limits before voltage collapse.
@@ -141,6 +141,81 @@ def collect_simple_pv_inputs():
     
     return inputs
 
+# Defaults used by collect_simple_pv_inputs, also applied when inputs come from a JSON file.
+DEFAULT_INPUTS = {
+    'grid_model': 'IEEE 39',
+    'base_mva': 100.0,
+    'frequency': 60.0,
+    'source_buses': [],
+    'sink_buses': [],
+    'monitor_bus': None,
+    'initial_step': 100.0,
+    'min_step': 10.0,
+    'step_reduction': 2.0,
+    'max_transfer': None,
+    'load_model': 'constant_power',
+    'voltage_exponent': 0.0,
+    'zip_coefficients': None,
+    'include_contingencies': False,
+    'contingencies': [],
+    'critical_scenarios': 5,
+    'run_base_completion': True,
+    'generator_limits': True,
+    'mva_tolerance': 1.0,
+    'agc_tolerance': 5.0
+}
+
+def _parse_int(value):
+    # Numbers edited by the agents are written as floats, e.g. 30.0 or "30.0".
+    return int(float(value))
+
+def _parse_list(value, cast):
+    if isinstance(value, str):
+        value = value.strip().strip('[]')
+        return [cast(x.strip().strip('"\'')) for x in value.split(',') if x.strip()]
+    if isinstance(value, (int, float)):
+        # A single entry, e.g. `source_buses: 30.0` from the command agent.
+        value = [value]
+    return [cast(x) for x in value]
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ['y', 'yes', 'true', '1']
+    return bool(value)
+
+def normalize_inputs(inputs):
+    """
+    Convert inputs from collect_simple_pv_inputs, inputs.json or pv_inputs.json to one canonical form.
+
+    The JSON files hold values edited by the agents, so numbers may arrive as strings, lists as "[5, 12]" and
+    unset values as "". Unset values fall back to DEFAULT_INPUTS.
+    """
+    normalized = dict(DEFAULT_INPUTS)
+    for key, value in inputs.items():
+        if key in normalized and value not in ("", None):
+            normalized[key] = value
+
+    for key in ['base_mva', 'frequency', 'initial_step', 'min_step', 'step_reduction', 'voltage_exponent',
+                'mva_tolerance', 'agc_tolerance']:
+        normalized[key] = float(normalized[key])
+    for key in ['include_contingencies', 'run_base_completion', 'generator_limits']:
+        normalized[key] = _parse_bool(normalized[key])
+
+    normalized['grid_model'] = str(normalized['grid_model']).strip()
+    normalized['source_buses'] = _parse_list(normalized['source_buses'], _parse_int)
+    normalized['sink_buses'] = _parse_list(normalized['sink_buses'], _parse_int)
+    normalized['contingencies'] = _parse_list(normalized['contingencies'], str)
+    normalized['critical_scenarios'] = _parse_int(normalized['critical_scenarios'])
+    normalized['load_model'] = str(normalized['load_model']).strip().lower()
+    if normalized['monitor_bus'] is not None:
+        normalized['monitor_bus'] = _parse_int(normalized['monitor_bus'])
+    if normalized['max_transfer'] is not None:
+        normalized['max_transfer'] = float(normalized['max_transfer'])
+    if normalized['zip_coefficients'] is not None:
+        normalized['zip_coefficients'] = _parse_list(normalized['zip_coefficients'], float)
+
+    return normalized
+
 def print_inputs(inputs):
     """Print all collected inputs"""
     print("\n=== ALL COLLECTED INPUTS ===")
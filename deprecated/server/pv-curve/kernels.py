@@ -0,0 +1,89 @@
+"""
+Compiled kernels for the power-flow mismatch and Jacobian values.
+
+Every Newton iteration of every continuation step evaluates the complex power mismatch and the Jacobian values
+over the Ybus nonzeros. The NumPy expressions in powerflow.JacobianPattern build about ten temporary arrays of
+Ybus size for that. The kernels here make one pass over the CSR structure for each: the Jacobian kernel writes
+every nonzero's four derivatives and adds the diagonal's current and load terms as it finishes a row, then
+gathers the values into Jacobian order.
+
+They are compiled by numba when it is installed. Compiled code is cached on disk (numba's `cache=True`, in
+__pycache__ or NUMBA_CACHE_DIR), so a new process, such as a contingency worker, loads it instead of compiling
+it again. Without numba, or with PV_NUMBA=0, ENABLED is False and JacobianPattern keeps its NumPy expressions.
+The kernels take a single scenario; stacked scenarios (batch.py) always use NumPy.
+"""
+import os
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Whether JacobianPattern uses the compiled kernels by default.
+ENABLED = numba is not None and os.environ.get("PV_NUMBA", "1") != "0"
+
+def _jit(function):
+    if numba is None:
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+@_jit
+def _power_mismatch(indptr, indices, data, V, Sbus, out):
+    for i in range(len(indptr) - 1):
+        current = 0j
+        for p in range(indptr[i], indptr[i + 1]):
+            current += data[p] * V[indices[p]]
+        out[i] = V[i] * np.conj(current) - Sbus[i]
+
+@_jit
+def _jacobian_values(indptr, indices, data, V, load_derivative, src, out):
+    n = len(indptr) - 1
+    nnz = len(data)
+    Vm = np.abs(V)
+    # Derivatives of every nonzero, in the block layout `src` indexes: Re dS/dVa, Re dS/dVm, Im dS/dVa, Im dS/dVm.
+    stacked = np.empty(4 * nnz)
+    for i in range(n):
+        current = 0j
+        diagonal = -1
+        for p in range(indptr[i], indptr[i + 1]):
+            k = indices[p]
+            YV = data[p] * V[k]
+            current += YV
+            VY = V[i] * np.conj(YV)
+            stacked[p] = VY.imag
+            stacked[2 * nnz + p] = -VY.real
+            dS_dVm = VY / Vm[k]
+            stacked[nnz + p] = dS_dVm.real
+            stacked[3 * nnz + p] = dS_dVm.imag
+            if k == i:
+                diagonal = p
+        # The diagonal also carries the bus's own current (and load) terms.
+        VI = V[i] * np.conj(current)
+        stacked[diagonal] -= VI.imag
+        stacked[2 * nnz + diagonal] += VI.real
+        dS_dVm = VI / Vm[i] + load_derivative[i]
+        stacked[nnz + diagonal] += dS_dVm.real
+        stacked[3 * nnz + diagonal] += dS_dVm.imag
+
+    for j in range(len(src)):
+        out[j] = stacked[src[j]]
+
+def power_mismatch(ybus, V, Sbus):
+    """Complex mismatch V * conj(Ybus V) - Sbus of one scenario."""
+    out = np.empty(len(V), dtype=np.complex128)
+    _power_mismatch(ybus.indptr, ybus.indices, ybus.data, V, np.broadcast_to(Sbus, V.shape), out)
+    return out
+
+def jacobian_values(src, ybus, V, load_derivative=None):
+    """
+    Jacobian nonzeros of one scenario, gathered by `src` (JacobianPattern.src) from the stacked derivatives.
+
+    Args:
+        load_derivative (np.ndarray, optional): dS/dVm of the voltage-dependent loads at each bus.
+    """
+    if load_derivative is None:
+        load_derivative = np.zeros(len(V), dtype=np.complex128)
+    out = np.empty(len(src))
+    _jacobian_values(ybus.indptr, ybus.indices, ybus.data, V, load_derivative.astype(np.complex128), src, out)
+    return out
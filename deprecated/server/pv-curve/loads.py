@@ -0,0 +1,149 @@
+"""
+Voltage-dependent load models selected by the `load_model` and `voltage_exponent` inputs.
+
+A load model scales the nominal load S0 (its value at 1 p.u.) by f(Vm) = sum_k c_k * Vm ** n_k, which covers
+both ZIP (exponents 2, 1, 0) and exponential (one exponent) loads. f and df/dVm are evaluated for every bus in
+one pass, and BusLoads turns them into the mismatch and Jacobian terms the power flow adds on top of its
+constant-power injections. A batch of scenarios (batch.py) may give each scenario its own coefficients and
+exponents.
+"""
+import numpy as np
+
+# Exponents of the named load models.
+LOAD_MODELS = {
+    "constant_power": 0.0,
+    "constant_current": 1.0,
+    "constant_impedance": 2.0
+}
+
+class LoadModel:
+    """
+    S(Vm) = S0 * sum_k coefficients[k] * Vm ** exponents[k].
+
+    Args:
+        coefficients (array-like): Component weights, summing to 1 so that S(1) = S0. Shape (n_components,),
+            or (n_scenarios, n_components) for one model per scenario of a batch.
+        exponents (array-like): Voltage exponent of each component, shaped like `coefficients` or broadcast to
+            it.
+    """
+
+    def __init__(self, coefficients, exponents):
+        coefficients, exponents = np.broadcast_arrays(
+            np.asarray(coefficients, dtype=float), np.asarray(exponents, dtype=float)
+        )
+        self.coefficients = coefficients.copy()
+        self.exponents = exponents.copy()
+        self.weighted_exponents = self.coefficients * self.exponents
+        self.per_scenario = self.coefficients.ndim > 1
+
+        # ZIP-type models (exponents 0, 1 and 2 only) are evaluated as a quadratic in Vm, avoiding pow().
+        self.quadratic = None
+        if np.isin(self.exponents, [0.0, 1.0, 2.0]).all():
+            self.quadratic = np.stack(
+                [np.where(self.exponents == n, self.coefficients, 0.0).sum(axis=-1) for n in range(3)], axis=-1
+            )
+
+    @classmethod
+    def stack(cls, models):
+        """One model per scenario from a list of models; shorter ones are padded with zero-weight components."""
+        n = max(len(model.coefficients) for model in models)
+        return cls(
+            [np.pad(model.coefficients, (0, n - len(model.coefficients))) for model in models],
+            [np.pad(model.exponents, (0, n - len(model.exponents))) for model in models]
+        )
+
+    @classmethod
+    def exponential(cls, exponent):
+        return cls([1.0], [exponent])
+
+    @classmethod
+    def zip(cls, z, i, p):
+        """Constant-impedance, constant-current and constant-power fractions."""
+        return cls([z, i, p], [2.0, 1.0, 0.0])
+
+    @property
+    def constant_power(self):
+        return not self.weighted_exponents.any()
+
+    def evaluate(self, Vm):
+        """
+        f(Vm) and df/dVm for an array of voltage magnitudes; with a model per scenario, Vm has shape
+        (n_scenarios, n_bus).
+        """
+        if self.per_scenario:
+            # Scenario axis first, then buses, then components.
+            if self.quadratic is not None:
+                p, i, z = self.quadratic.T[..., None]
+                return (z * Vm + i) * Vm + p, 2 * z * Vm + i
+            powers = Vm[..., None] ** self.exponents[:, None, :]
+            return (
+                (powers * self.coefficients[:, None, :]).sum(axis=-1),
+                (powers / Vm[..., None] * self.weighted_exponents[:, None, :]).sum(axis=-1)
+            )
+        if self.quadratic is not None:
+            p, i, z = self.quadratic
+            return (z * Vm + i) * Vm + p, 2 * z * Vm + i
+        if len(self.exponents) == 1:
+            f = self.coefficients[0] * Vm ** self.exponents[0]
+            return f, self.exponents[0] * f / Vm
+        powers = Vm[..., None] ** self.exponents
+        return powers @ self.coefficients, (powers / Vm[..., None]) @ self.weighted_exponents
+
+    def __getitem__(self, rows):
+        """Models of a subset of scenarios; a model shared by every scenario is returned as is."""
+        if not self.per_scenario:
+            return self
+        return LoadModel(self.coefficients[rows], self.exponents[rows])
+
+    def __repr__(self):
+        return f"LoadModel(coefficients={self.coefficients.tolist()}, exponents={self.exponents.tolist()})"
+
+class BusLoads:
+    """
+    Nominal bus loads under a voltage-dependent model.
+
+    The power flow schedules every load at its nominal value; `deviation` is what the model changes about that
+    (S0 * (f(Vm) - 1)), and `derivative` its sensitivity to Vm (S0 * df/dVm), both per bus.
+
+    Args:
+        model (LoadModel): Voltage dependence, shared by every scenario or one per scenario.
+        S (np.ndarray): Nominal complex load per bus in per-unit, optionally with a leading scenario axis.
+    """
+
+    def __init__(self, model, S):
+        self.model = model
+        self.S = S
+
+    def deviation(self, Vm):
+        f, _ = self.model.evaluate(Vm)
+        return self.S * (f - 1.0)
+
+    def derivative(self, Vm):
+        _, df = self.model.evaluate(Vm)
+        return self.S * df
+
+    def __getitem__(self, rows):
+        """Loads of a subset of scenarios."""
+        return BusLoads(self.model[rows], self.S[rows])
+
+def load_model_from_inputs(inputs):
+    """
+    Load model of a normalized PV input set.
+
+    A nonzero `voltage_exponent` selects an exponential model with that exponent, whatever `load_model` says;
+    otherwise `load_model` picks constant power, current or impedance, or "zip" with `zip_coefficients`.
+
+    Returns:
+        LoadModel
+    """
+    exponent = inputs["voltage_exponent"]
+    name = inputs["load_model"]
+    if exponent or name == "exponential":
+        return LoadModel.exponential(exponent)
+    if name == "zip":
+        if not inputs.get("zip_coefficients") or len(inputs["zip_coefficients"]) != 3:
+            raise ValueError("The zip load model needs zip_coefficients as [z, i, p]")
+        return LoadModel.zip(*inputs["zip_coefficients"])
+    if name not in LOAD_MODELS:
+        raise ValueError(f"Unknown load model '{name}'. Available: {list(LOAD_MODELS) + ['exponential', 'zip']}")
+    return LoadModel.exponential(LOAD_MODELS[name])
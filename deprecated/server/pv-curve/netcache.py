@@ -0,0 +1,157 @@
+"""
+On-disk cache of compiled networks.
+
+compile_network writes a Network as one directory of .npy files: every per-unit array in Network.ARRAYS
+(bus types, generator and branch tables) plus the CSR Ybus. load_compiled maps them back with
+np.load(mmap_mode="r"), so a cached case starts without pandapower, parsing or a Ybus build. Its arrays are
+read-only views of the page cache, and processes sharing one artifact share the memory.
+
+Artifacts are named by a hash of the network content. Named cases (e.g. "IEEE 39" at a given base) reach
+their artifact through an alias file, so a cache hit does not need the source case at all.
+"""
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import scipy.sparse as sp
+from network import Network
+
+# Bump when the artifact layout or the Network arrays change; old artifacts are then ignored.
+FORMAT_VERSION = 2
+# Default cache location; PV_NETWORK_CACHE overrides it.
+CACHE_DIR = os.environ.get(
+    "PV_NETWORK_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "network-cache")
+)
+# Arrays stored next to Network.ARRAYS.
+YBUS_ARRAYS = ("ybus_data", "ybus_indices", "ybus_indptr")
+
+def network_hash(net):
+    """Content hash of a Network: its base and every array, including dtypes and shapes."""
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}:{net.base_mva!r}".encode())
+    for name in Network.ARRAYS:
+        array = np.ascontiguousarray(getattr(net, name))
+        digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+        digest.update(array.data)
+    return digest.hexdigest()[:24]
+
+def compile_network(net, path):
+    """
+    Write a Network as a compiled artifact directory.
+
+    The directory is written under a temporary name and renamed into place, so concurrent compilers of the
+    same case never expose a partial artifact.
+    """
+    tmp = f"{path}.tmp{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    ybus = net.ybus
+    arrays = {name: getattr(net, name) for name in Network.ARRAYS}
+    arrays.update(ybus_data=ybus.data, ybus_indices=ybus.indices, ybus_indptr=ybus.indptr)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"format": FORMAT_VERSION, "base_mva": net.base_mva, "n_bus": net.n_bus}, f)
+
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # Another process compiled the same case first; its artifact is identical.
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def load_compiled(path):
+    """
+    Map a compiled artifact as a Network whose arrays (and Ybus) are read-only memory maps.
+
+    Returns:
+        Network, or None if there is no usable artifact at `path`.
+    """
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != FORMAT_VERSION:
+        return None
+
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in Network.ARRAYS + YBUS_ARRAYS
+    }
+    n = meta["n_bus"]
+    ybus = sp.csr_matrix(
+        (arrays.pop("ybus_data"), arrays.pop("ybus_indices"), arrays.pop("ybus_indptr")), shape=(n, n), copy=False
+    )
+    ybus.has_sorted_indices = True
+    return Network(meta["base_mva"], ybus=ybus, **arrays)
+
+class NetworkCache:
+    """
+    Directory of compiled networks keyed by content hash, with aliases from case names to hashes.
+
+    Args:
+        directory (str, optional): Cache directory. Defaults to CACHE_DIR.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or CACHE_DIR
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def alias_path(self, alias):
+        name = hashlib.sha256(alias.encode()).hexdigest()[:24]
+        return os.path.join(self.directory, "aliases", name)
+
+    def get(self, key):
+        """The compiled network with content hash `key`, or None."""
+        return load_compiled(self.path(key))
+
+    def put(self, net):
+        """
+        Compile a network into the cache unless it is already there.
+
+        Returns:
+            str: Its content hash.
+        """
+        key = network_hash(net)
+        if not os.path.isdir(self.path(key)):
+            os.makedirs(self.directory, exist_ok=True)
+            compile_network(net, self.path(key))
+        return key
+
+    def load(self, alias, build):
+        """
+        The network an alias names, compiling it with `build()` on a miss.
+
+        A hit maps the artifact; a miss returns the freshly built network after caching it. Cache directories
+        that cannot be written only cost the compile, never the load.
+
+        Args:
+            alias (str): Stable description of the source, e.g. case name, source version and base.
+            build (callable): Builds the Network from its source.
+
+        Returns:
+            Network
+        """
+        alias_path = self.alias_path(alias)
+        try:
+            with open(alias_path) as f:
+                net = self.get(f.read().strip())
+            if net is not None:
+                return net
+        except OSError:
+            pass
+
+        net = build()
+        try:
+            key = self.put(net)
+            os.makedirs(os.path.dirname(alias_path), exist_ok=True)
+            with open(f"{alias_path}.tmp{os.getpid()}", "w") as f:
+                f.write(key)
+            os.replace(f"{alias_path}.tmp{os.getpid()}", alias_path)
+        except OSError:
+            pass
+        return net
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,187 @@
+"""
+Internal network representation used by the PV-curve engine.
+
+A Network holds per-unit NumPy arrays indexed by internal bus position (0..n_bus-1), plus the bus admittance
+matrix in CSR form. Branches that are out of service keep their place in the Ybus sparsity pattern as
+explicit zeros, so every contingency of a case shares one pattern (and one symbolic factorization).
+"""
+import numpy as np
+import scipy.sparse as sp
+
+# MATPOWER bus types
+PQ = 1
+PV = 2
+REF = 3
+ISOLATED = 4
+
+# MATPOWER column indices used by from_matpower
+BUS_I, BUS_TYPE, PD, QD, GS, BS, VM, VA = 0, 1, 2, 3, 4, 5, 7, 8
+GEN_BUS, PG, QG, QMAX, QMIN, VG, GEN_STATUS = 0, 1, 2, 3, 4, 5, 7
+F_BUS, T_BUS, BR_R, BR_X, BR_B, TAP, SHIFT, BR_STATUS = 0, 1, 2, 3, 4, 8, 9, 10
+
+class Network:
+    """
+    Per-unit arrays of a power system case.
+
+    Bus arrays have length n_bus, generator arrays n_gen and branch arrays n_branch. Powers are in per-unit on
+    `base_mva`, angles in radians and bus/branch references are internal bus positions, stored as int32.
+    """
+
+    ARRAYS = (
+        "bus_numbers", "bus_type", "Pd", "Qd", "Gs", "Bs", "Vm0", "Va0",
+        "gen_bus", "Pg", "Qg", "Qmax", "Qmin", "Vg", "gen_status",
+        "branch_from", "branch_to", "r", "x", "b", "ratio", "shift", "branch_status"
+    )
+
+    def __init__(self, base_mva, ybus=None, **arrays):
+        self.base_mva = float(base_mva)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+        self.n_bus = len(self.bus_numbers)
+        # Bus numbers in sorted order and their positions, searched by bus_index; a dict of every bus costs about
+        # eight times the memory on large systems.
+        self._bus_order = np.argsort(self.bus_numbers, kind="stable").astype(np.int32)
+        self._sorted_numbers = self.bus_numbers[self._bus_order]
+        # A precompiled Ybus (see netcache.py) must be the one build_ybus would produce.
+        self.ybus = self.build_ybus() if ybus is None else ybus
+        self.classify_buses()
+
+    @property
+    def n_branch(self):
+        return len(self.branch_from)
+
+    def classify_buses(self):
+        """Derive the ref/pv/pq index sets. Generator buses without an in-service generator become PQ."""
+        has_gen = np.zeros(self.n_bus, dtype=bool)
+        has_gen[self.gen_bus[self.gen_status > 0]] = True
+
+        bus_type = self.bus_type.copy()
+        bus_type[(bus_type == PV) & ~has_gen] = PQ
+
+        self.ref = np.flatnonzero(bus_type == REF)
+        self.pv = np.flatnonzero(bus_type == PV)
+        self.pq = np.flatnonzero(bus_type == PQ)
+
+        if len(self.ref) != 1:
+            raise ValueError(f"Expected exactly one reference bus, found {len(self.ref)}")
+
+    def bus_index(self, numbers):
+        """Map external bus numbers (as entered by the user) to internal positions."""
+        numbers = np.array([int(n) for n in np.atleast_1d(numbers)], dtype=np.int64)
+        at = np.minimum(np.searchsorted(self._sorted_numbers, numbers), self.n_bus - 1)
+        missing = self._sorted_numbers[at] != numbers
+        if missing.any():
+            raise ValueError(f"Bus {numbers[missing][0]} does not exist in this network")
+        return self._bus_order[at].astype(np.int64)
+
+    def branch_index(self, bus1, bus2):
+        """Positions of the in-service branches between two external bus numbers, in either direction."""
+        i, j = self.bus_index([bus1, bus2])
+        mask = ((self.branch_from == i) & (self.branch_to == j)) | ((self.branch_from == j) & (self.branch_to == i))
+        return np.flatnonzero(mask & (self.branch_status > 0))
+
+    def build_ybus(self, branch_status=None):
+        """
+        Build the bus admittance matrix.
+
+        Args:
+            branch_status (np.ndarray, optional): Override of the branch status, e.g. for a contingency.
+
+        Returns:
+            scipy.sparse.csr_matrix: Complex Ybus with every branch and every diagonal entry in its pattern.
+        """
+        status = self.branch_status if branch_status is None else branch_status
+        f, t = self.branch_from, self.branch_to
+
+        Ys = status / (self.r + 1j * self.x)
+        Bc = status * self.b
+        tap = np.where(self.ratio == 0, 1.0, self.ratio) * np.exp(1j * self.shift)
+
+        Ytt = Ys + 1j * Bc / 2
+        Yff = Ytt / (tap * np.conj(tap))
+        Yft = -Ys / np.conj(tap)
+        Ytf = -Ys / tap
+        Ysh = (self.Gs + 1j * self.Bs)
+
+        buses = np.arange(self.n_bus)
+        rows = np.concatenate([f, f, t, t, buses])
+        cols = np.concatenate([f, t, f, t, buses])
+        data = np.concatenate([Yff, Yft, Ytf, Ytt, Ysh])
+
+        ybus = sp.coo_matrix((data, (rows, cols)), shape=(self.n_bus, self.n_bus)).tocsr()
+        ybus.sort_indices()
+        return ybus
+
+    def sbus(self):
+        """Complex power injection at every bus from scheduled generation and constant-power load."""
+        on = self.gen_status > 0
+        Sg = np.bincount(self.gen_bus[on], weights=self.Pg[on], minlength=self.n_bus) + \
+            1j * np.bincount(self.gen_bus[on], weights=self.Qg[on], minlength=self.n_bus)
+        return Sg - (self.Pd + 1j * self.Qd)
+
+    def initial_voltage(self):
+        """Starting voltages: case angles and magnitudes, with generator setpoints at PV and reference buses."""
+        Vm = self.Vm0.copy()
+        on = self.gen_status > 0
+        Vm[self.gen_bus[on]] = self.Vg[on]
+        return Vm * np.exp(1j * self.Va0)
+
+    def flat_start(self):
+        """Flat start: 1 p.u. at every PQ bus, generator setpoints elsewhere, all angles at the reference angle."""
+        V = self.initial_voltage()
+        Vm = np.abs(V)
+        Vm[self.pq] = 1.0
+        return Vm * np.exp(1j * self.Va0[self.ref[0]])
+
+def from_matpower(ppc, base_mva=None, bus_numbers=None):
+    """
+    Build a Network from a MATPOWER/PYPOWER case dict.
+
+    Args:
+        ppc (dict): Case with "baseMVA", "bus", "gen" and "branch" arrays in MATPOWER column layout.
+        base_mva (float, optional): System base to convert to. Defaults to the case base.
+        bus_numbers (array-like, optional): External bus numbers, if the case bus column holds internal ones.
+
+    Returns:
+        Network
+    """
+    bus = np.asarray(ppc["bus"], dtype=float)
+    gen = np.asarray(ppc["gen"], dtype=float)
+    branch = np.asarray(ppc["branch"], dtype=float)
+
+    case_base = float(ppc["baseMVA"])
+    base = float(base_mva or case_base)
+    # Impedances are per-unit on the case base; rescale them to the requested base.
+    z_scale = base / case_base
+
+    numbers = bus[:, BUS_I].astype(np.int64)
+    lookup = np.full(numbers.max() + 1, -1, dtype=np.int64)
+    lookup[numbers] = np.arange(len(numbers))
+
+    return Network(
+        base,
+        bus_numbers=np.asarray(bus_numbers if bus_numbers is not None else numbers, dtype=np.int64),
+        bus_type=bus[:, BUS_TYPE].astype(np.int8),
+        Pd=bus[:, PD] / base,
+        Qd=bus[:, QD] / base,
+        Gs=bus[:, GS] / base,
+        Bs=bus[:, BS] / base,
+        Vm0=bus[:, VM],
+        Va0=np.deg2rad(bus[:, VA]),
+        gen_bus=lookup[gen[:, GEN_BUS].astype(np.int64)].astype(np.int32),
+        Pg=gen[:, PG] / base,
+        Qg=gen[:, QG] / base,
+        Qmax=gen[:, QMAX] / base,
+        Qmin=gen[:, QMIN] / base,
+        Vg=gen[:, VG],
+        gen_status=(gen[:, GEN_STATUS] > 0).astype(np.int8),
+        branch_from=lookup[branch[:, F_BUS].astype(np.int64)].astype(np.int32),
+        branch_to=lookup[branch[:, T_BUS].astype(np.int64)].astype(np.int32),
+        r=branch[:, BR_R] * z_scale,
+        x=branch[:, BR_X] * z_scale,
+        b=branch[:, BR_B] / z_scale,
+        ratio=branch[:, TAP],
+        shift=np.deg2rad(branch[:, SHIFT]),
+        branch_status=(branch[:, BR_STATUS] > 0).astype(float)
+    )
@@ -0,0 +1,291 @@
+"""
+PV-curve plots rendered off the request path.
+
+Plots are rendered by PlotService in its own process pool, so a request thread only waits on a future and the
+server's interpreter never spends its time in matplotlib. Before rendering, each curve is thinned to MAX_POINTS
+with Largest-Triangle-Three-Buckets (LTTB), which keeps the points that carry the curve's shape. It runs
+separately on either side of the nose, so the nose point itself is always kept. Rendered plots are either a
+Plotly figure spec (JSON, drawn by the client) or a PNG made with matplotlib. They are cached by a hash of the
+curves and the rendering options, so a curve that was already drawn is never drawn again.
+
+PlotService.render_study plots a whole PV input set. The request thread only hashes the study (the curve store
+key of its base case, its contingencies and the options), so a study that was plotted before is answered from
+the cache without tracing. Otherwise a worker traces the study, taking the base-case curve from the curve store
+(curvestore.py), and renders it.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Points per curve sent to a renderer; a plot a screen wide shows no more.
+MAX_POINTS = 500
+# Rendering formats.
+FORMATS = ("json", "png")
+# Default size of the rendering pool.
+PLOT_WORKERS = 2
+# Rendered plots kept by PlotService, in bytes.
+CACHE_BYTES = 64 * 1024 * 1024
+# PNG figure size (inches) and resolution.
+FIGURE_SIZE = (8, 5)
+DPI = 100
+
+def lttb(x, y, threshold, keep=()):
+    """
+    Indices of at most `threshold` points of the polyline (x, y) that preserve its shape.
+
+    Largest-Triangle-Three-Buckets: the interior is split into equal buckets by point order, and each bucket
+    keeps the point that spans the largest triangle with the point kept before it and the mean of the next
+    bucket. The ends and the indices in `keep` are always kept; the buckets never straddle them.
+
+    Returns:
+        np.ndarray: Sorted point indices.
+    """
+    n = len(x)
+    anchors = np.unique(np.r_[0, n - 1, np.asarray(keep, dtype=np.int64)])
+    if n <= max(threshold, len(anchors)):
+        return np.arange(n)
+
+    budget = threshold - len(anchors)
+    gaps = np.diff(anchors) - 1
+    shares = np.floor(budget * gaps / max(gaps.sum(), 1)).astype(np.int64)
+    selected = [anchors]
+    for start, end, share in zip(anchors[:-1], anchors[1:], shares):
+        if share >= end - start - 1:
+            selected.append(np.arange(start + 1, end))
+        elif share > 0:
+            selected.append(_lttb_interior(x, y, start, end, share))
+    return np.unique(np.concatenate(selected))
+
+def _lttb_interior(x, y, start, end, count):
+    """`count` LTTB picks strictly between the kept points `start` and `end`."""
+    edges = np.linspace(start + 1, end, count + 1).astype(np.int64)
+    picks = np.empty(count, dtype=np.int64)
+    previous = start
+    for k in range(count):
+        lo, hi = edges[k], edges[k + 1]
+        if k + 1 < count:
+            next_x, next_y = x[hi:edges[k + 2]].mean(), y[hi:edges[k + 2]].mean()
+        else:
+            next_x, next_y = x[end], y[end]
+        area = np.abs(
+            (x[previous] - next_x) * (y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi]) * (next_y - y[previous])
+        )
+        previous = picks[k] = lo + int(np.argmax(area))
+    return picks
+
+def curve_series(label, curve):
+    """Plot series of a PVCurve: its points, branch flags and nose."""
+    return {
+        "label": label,
+        "transfer": np.asarray(curve.transfer, dtype=float),
+        "voltage": np.asarray(curve.voltage, dtype=float),
+        "lower": np.asarray(curve.lower, dtype=bool),
+        "nose_index": int(curve.nose_index)
+    }
+
+def study_series(inputs, store=None):
+    """
+    Plot series of a PV input set: the base-case curve, from the curve store when it was traced before, then the
+    contingency curves in the order of the `contingencies` input when `include_contingencies` is set.
+    """
+    from continuation import PVStudy
+    from contingency import sweep_contingencies
+    from curvestore import cached_pv_curve
+
+    study = PVStudy(inputs)
+    series = [curve_series("base", cached_pv_curve(study.inputs, study.net, store))]
+    if study.inputs["include_contingencies"]:
+        order = {label: i for i, label in enumerate(study.inputs["contingencies"])}
+        results = [r for r in sweep_contingencies(study.inputs, net=study.net) if r.curve is not None]
+        series += [curve_series(r.contingency, r.curve) for r in sorted(results, key=lambda r: order[r.contingency])]
+    return series
+
+def study_plot_key(inputs, fmt="json", max_points=MAX_POINTS, title=None):
+    """Hash of the curves a PV input set plots and the rendering options, found without tracing them."""
+    from continuation import PVStudy
+    from curvestore import curve_key
+
+    study = PVStudy(inputs)
+    contingencies = study.inputs["contingencies"] if study.inputs["include_contingencies"] else []
+    digest = hashlib.sha256(json.dumps(["study", curve_key(study), contingencies, fmt, max_points, title]).encode())
+    return digest.hexdigest()[:24]
+
+def plot_key(series, fmt="json", max_points=MAX_POINTS, title=None):
+    """Hash of the curves and rendering options: equal keys render to equal plots."""
+    digest = hashlib.sha256(json.dumps([fmt, max_points, title]).encode())
+    for s in series:
+        digest.update(json.dumps([s["label"], s["nose_index"]]).encode())
+        for name in ("transfer", "voltage", "lower"):
+            digest.update(np.ascontiguousarray(s[name]).tobytes())
+    return digest.hexdigest()[:24]
+
+def decimate(series, max_points=MAX_POINTS):
+    """Series thinned to at most `max_points` points each by LTTB, keeping the nose."""
+    thinned = []
+    for s in series:
+        index = lttb(s["transfer"], s["voltage"], max_points, keep=[s["nose_index"]])
+        thinned.append({
+            "label": s["label"],
+            "transfer": s["transfer"][index],
+            "voltage": s["voltage"][index],
+            "lower": s["lower"][index],
+            "nose_index": int(np.searchsorted(index, s["nose_index"]))
+        })
+    return thinned
+
+def render(series, fmt="json", max_points=MAX_POINTS, title=None):
+    """
+    Decimate and render curves; run by PlotService's worker processes.
+
+    Returns:
+        bytes: A Plotly figure spec as JSON, or a PNG image.
+    """
+    series = decimate(series, max_points)
+    if fmt == "json":
+        return json.dumps(figure_spec(series, title)).encode()
+    if fmt == "png":
+        return render_png(series, title)
+    raise ValueError(f"Unknown plot format {fmt!r}; expected one of {FORMATS}")
+
+def render_study(inputs, fmt="json", max_points=MAX_POINTS, title=None):
+    """Trace and render a PV input set; run by PlotService's worker processes."""
+    return render(study_series(inputs), fmt, max_points, title)
+
+def figure_spec(series, title=None):
+    """Plotly figure of decimated series: one line per curve and a marker at each nose."""
+    data = []
+    for s in series:
+        nose = s["nose_index"]
+        data.append({
+            "type": "scatter", "mode": "lines", "name": s["label"],
+            "x": s["transfer"].tolist(), "y": s["voltage"].tolist()
+        })
+        data.append({
+            "type": "scatter", "mode": "markers", "name": f"{s['label']} nose", "showlegend": False,
+            "x": [float(s["transfer"][nose])], "y": [float(s["voltage"][nose])]
+        })
+    return {
+        "data": data,
+        "layout": {
+            "title": {"text": title or "PV curve"},
+            "xaxis": {"title": {"text": "Transfer (MW)"}},
+            "yaxis": {"title": {"text": "Voltage (p.u.)"}}
+        }
+    }
+
+def render_png(series, title=None):
+    """PNG of decimated series, drawn with matplotlib's Agg backend."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE, dpi=DPI)
+    try:
+        for s in series:
+            line, = ax.plot(s["transfer"], s["voltage"], label=s["label"])
+            nose = s["nose_index"]
+            ax.plot(s["transfer"][nose], s["voltage"][nose], "o", color=line.get_color())
+        ax.set_xlabel("Transfer (MW)")
+        ax.set_ylabel("Voltage (p.u.)")
+        ax.set_title(title or "PV curve")
+        ax.grid(True, alpha=0.3)
+        if len(series) > 1:
+            ax.legend()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+class PlotService:
+    """
+    Process pool rendering plots, with a byte-bounded cache of rendered plots by plot_key or study_plot_key.
+
+    Identical requests share one render: a request for a plot that is still rendering gets the same future.
+
+    Args:
+        workers (int): Rendering processes, started on the first render.
+        max_bytes (int): Size bound of the cache; the least recently used plots are dropped past it.
+    """
+
+    def __init__(self, workers=PLOT_WORKERS, max_bytes=CACHE_BYTES):
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.pool = None
+        self.cache = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def render(self, series, fmt="json", max_points=MAX_POINTS, title=None):
+        """
+        Future of a rendered plot of `series` (see curve_series).
+
+        Returns:
+            concurrent.futures.Future: Resolves to the plot bytes.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown plot format {fmt!r}; expected one of {FORMATS}")
+        return self._submit(plot_key(series, fmt, max_points, title), render, series, fmt, max_points, title)
+
+    def render_study(self, inputs, fmt="json", max_points=MAX_POINTS, title=None):
+        """
+        Future of a rendered plot of a PV input set's curves, traced by a worker unless it was plotted before.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the plot bytes.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown plot format {fmt!r}; expected one of {FORMATS}")
+        key = study_plot_key(inputs, fmt, max_points, title)
+        return self._submit(key, render_study, inputs, fmt, max_points, title)
+
+    def _submit(self, key, function, *args):
+        with self.lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.misses += 1
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(min(self.workers, os.cpu_count() or 1))
+            future = self.pool.submit(function, *args)
+            self.cache[key] = future
+        future.add_done_callback(lambda done: self._rendered(key, done))
+        return future
+
+    def _rendered(self, key, future):
+        with self.lock:
+            if self.cache.get(key) is not future:
+                return
+            if future.cancelled() or future.exception() is not None:
+                del self.cache[key]
+                return
+            self.bytes += len(future.result())
+            for old in list(self.cache):
+                if self.bytes <= self.max_bytes:
+                    break
+                if old != key and self.cache[old].done():
+                    self.bytes -= len(self.cache.pop(old).result())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "plots": len(self.cache),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,353 @@
+"""
+Sparse Newton-Raphson AC power flow in polar coordinates.
+
+Mismatches and Jacobian values are computed for all buses at once from the Ybus nonzeros; there are no per-bus
+Python loops. Voltage and injection arrays may carry leading scenario axes, which batch.py uses to evaluate
+many scenarios of one topology together. The Jacobian sparsity structure is derived once per (Ybus pattern,
+PV/PQ split) and every iteration only gathers fresh values into it. The fill-reducing ordering of the LU
+factorization (COLAMD, or minimum degree for mid-sized matrices) is likewise computed once per structure, and
+a numeric factorization can be kept for several iterations while the mismatch keeps contracting (dishonest
+Newton), falling back to a fresh one when it does not. Generator reactive limits (qlimits.py) switch buses
+between PV and PQ inside the same Newton loop. With numba installed, single-scenario mismatches and Jacobian
+values come from the compiled kernels in kernels.py.
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+import kernels
+
+# Newton iterations before a power flow is declared non-convergent.
+MAX_ITERATIONS = 20
+# A reused factorization is kept while every step shrinks the largest mismatch by at least this factor.
+CONTRACTION = 0.25
+# Rounds of generator limit switching allowed per power flow, so buses cannot cycle between PV and PQ forever.
+MAX_LIMIT_ROUNDS = 10
+# SuperLU column orderings by name: COLAMD, or minimum degree on the pattern of A + A^T (SuperLU's multiple
+# minimum degree, the nearest scipy offers to AMD).
+ORDERINGS = {"COLAMD": "COLAMD", "AMD": "MMD_AT_PLUS_A"}
+# Matrices with rows in [low, high) are ordered by minimum degree unless asked otherwise. It fills 20-25% less
+# than COLAMD on power-flow matrices and factors faster up to about 20k rows; past that its factors are slower
+# despite the lower fill (see the scaling benchmark), and tiny matrices gain nothing.
+AMD_DIMS = (500, 20000)
+# Refactorizations pivot on the diagonal while it is at least this fraction of the column's largest entry.
+DIAGONAL_PIVOT_THRESHOLD = 0.1
+
+class Factorization:
+    """Numeric LU factors of one matrix, solving in the original row and column order."""
+
+    def __init__(self, lu, order=None):
+        self.lu = lu
+        self.order = order
+
+    def solve(self, b):
+        if self.order is None:
+            return self.lu.solve(b)
+        y = self.lu.solve(b[self.order])
+        x = np.empty_like(y)
+        x[self.order] = y
+        return x
+
+class SparseLU:
+    """
+    LU factorizations of matrices that share one CSC structure.
+
+    The first factorization computes a fill-reducing ordering: minimum degree on the pattern of A + A^T ("AMD")
+    for matrices within AMD_DIMS rows, whose structurally near-symmetric Jacobians fill less under it, and
+    COLAMD otherwise. Later matrices are permuted symmetrically into that order through a precomputed gather
+    index and factorized without reordering, which is the part of SuperLU's symbolic analysis scipy lets us
+    reuse. Keeping the diagonal where it is keeps the fill of the ordering, so the diagonal is the pivot while
+    it is within DIAGONAL_PIVOT_THRESHOLD of its column's largest entry; smaller ones are still pivoted away.
+
+    Args:
+        ordering (str, optional): "COLAMD" or "AMD". Defaults by matrix size.
+
+    Attributes:
+        fill (int): Nonzeros of L + U in the last factorization.
+    """
+
+    def __init__(self, ordering=None):
+        if ordering is not None and ordering not in ORDERINGS:
+            raise ValueError(f"Unknown ordering {ordering!r}; expected one of {tuple(ORDERINGS)}")
+        self.ordering = ordering
+        self.indptr = None
+        self.indices = None
+        self.fill = 0
+
+    def matches(self, A):
+        return A.indptr is self.indptr or (
+            self.indptr is not None and np.array_equal(A.indptr, self.indptr)
+            and np.array_equal(A.indices, self.indices)
+        )
+
+    def factorize(self, A):
+        """
+        Factorize a CSC matrix, raising RuntimeError if it is singular.
+
+        Returns:
+            Factorization
+        """
+        if not self.matches(A):
+            low, high = AMD_DIMS
+            ordering = self.ordering or ("AMD" if low <= A.shape[0] < high else "COLAMD")
+            lu = splu(A, permc_spec=ORDERINGS[ordering])
+            self.indptr, self.indices = A.indptr, A.indices
+            self.fill = lu.nnz
+
+            # Tag every entry with its position (offset by one, so none is an explicit zero) and permute the tags.
+            self.order = np.argsort(lu.perm_c).astype(np.int32)
+            tags = sp.csc_matrix((np.arange(1.0, A.nnz + 1), A.indices, A.indptr), A.shape)
+            permuted = tags[self.order][:, self.order].tocsc()
+            permuted.sort_indices()
+            self.gather = (permuted.data - 1).astype(np.int32)
+            self.permuted = sp.csc_matrix(
+                (A.data[self.gather], permuted.indices.astype(np.int32), permuted.indptr.astype(np.int32)), A.shape
+            )
+            return Factorization(lu)
+
+        # Swapping in new values skips the format checks of building a matrix per factorization.
+        self.permuted.data = A.data[self.gather]
+        lu = splu(
+            self.permuted, permc_spec="NATURAL", diag_pivot_thresh=DIAGONAL_PIVOT_THRESHOLD,
+            options={"SymmetricMode": True}
+        )
+        self.fill = lu.nnz
+        return Factorization(lu, self.order)
+
+class JacobianPattern:
+    """
+    Fixed structure of the power-flow Jacobian for one Ybus sparsity pattern and one PV/PQ classification.
+
+    Unknowns are the angles of the PV and PQ buses followed by the magnitudes of the PQ buses; equations are
+    the P mismatches of PV and PQ buses followed by the Q mismatches of PQ buses. Each Jacobian entry comes
+    from exactly one Ybus entry (i, k), so the CSC structure and a gather index into the per-entry derivative
+    values are precomputed here.
+
+    Args:
+        ybus (scipy.sparse.csr_matrix): Bus admittance matrix with sorted indices and an explicit diagonal.
+        pv (np.ndarray): Internal indices of PV buses.
+        pq (np.ndarray): Internal indices of PQ buses.
+
+    Attributes:
+        jit (bool): Evaluate single scenarios with the compiled kernels; defaults to kernels.ENABLED.
+    """
+
+    def __init__(self, ybus, pv, pq):
+        n = ybus.shape[0]
+        self.pv = pv
+        self.pq = pq
+        self.pvpq = np.r_[pv, pq]
+        self.n_angle = len(self.pvpq)
+        self.dim = self.n_angle + len(pq)
+        self.shape = (self.dim, self.dim)
+
+        self.ybus_indptr = ybus.indptr
+        self.ybus_indices = ybus.indices
+        self.yi = np.repeat(np.arange(n, dtype=np.int32), np.diff(ybus.indptr))
+        self.yk = ybus.indices.astype(np.int32)
+        self.diag_pos = np.flatnonzero(self.yi == self.yk)
+        self.diag_bus = self.yi[self.diag_pos]
+        if len(self.diag_pos) != n:
+            raise ValueError("Ybus must store every diagonal entry")
+
+        angle = np.full(n, -1)
+        angle[self.pvpq] = np.arange(self.n_angle)
+        magnitude = np.full(n, -1)
+        magnitude[pq] = self.n_angle + np.arange(len(pq))
+
+        # Blocks in the order of the stacked derivative values: Re dS/dVa, Re dS/dVm, Im dS/dVa, Im dS/dVm.
+        nnz = len(self.yk)
+        rows, cols, src = [], [], []
+        for block, (row_map, col_map) in enumerate([
+            (angle, angle), (angle, magnitude), (magnitude, angle), (magnitude, magnitude)
+        ]):
+            r, c = row_map[self.yi], col_map[self.yk]
+            valid = np.flatnonzero((r >= 0) & (c >= 0))
+            rows.append(r[valid])
+            cols.append(c[valid])
+            src.append(block * nnz + valid)
+
+        rows, cols, src = np.concatenate(rows), np.concatenate(cols), np.concatenate(src)
+        order = np.lexsort((rows, cols))
+        self.indices = rows[order].astype(np.int32)
+        self.src = src[order].astype(np.int32)
+        self.indptr = np.r_[0, np.cumsum(np.bincount(cols, minlength=self.dim))].astype(np.int32)
+        self.lu = SparseLU()
+        # Rows holding a voltage magnitude fixed instead of a Q mismatch; only QLimitPattern has any.
+        self.voltage_rows = np.empty(0, dtype=np.int64)
+        self.jit = kernels.ENABLED
+
+    def matches(self, ybus):
+        """True if `ybus` has the sparsity pattern this Jacobian structure was built for."""
+        return ybus.indptr is self.ybus_indptr or (
+            np.array_equal(ybus.indptr, self.ybus_indptr) and np.array_equal(ybus.indices, self.ybus_indices)
+        )
+
+    def derivatives(self, ybus, V, load=None):
+        """dS/dVa and dS/dVm for every Ybus nonzero, plus the voltage-dependent load term on the diagonal."""
+        I = (ybus @ V.T).T
+        Vm = np.abs(V)
+        d = self.diag_bus
+
+        VY = V[..., self.yi] * np.conj(ybus.data * V[..., self.yk])
+        dS_dVa = -1j * VY
+        dS_dVa[..., self.diag_pos] += 1j * V[..., d] * np.conj(I[..., d])
+        dS_dVm = VY / Vm[..., self.yk]
+        dS_dVm[..., self.diag_pos] += np.conj(I[..., d]) * V[..., d] / Vm[..., d]
+        if load is not None:
+            dS_dVm[..., self.diag_pos] += load.derivative(Vm)[..., d]
+        return dS_dVa, dS_dVm
+
+    def values(self, ybus, V, load=None):
+        """Jacobian nonzeros at V, in the order of `indices`."""
+        if self.jit and V.ndim == 1:
+            return kernels.jacobian_values(self.src, ybus, V, None if load is None else load.derivative(np.abs(V)))
+        dS_dVa, dS_dVm = self.derivatives(ybus, V, load)
+        values = np.concatenate([dS_dVa.real, dS_dVm.real, dS_dVa.imag, dS_dVm.imag], axis=-1)
+        return values[..., self.src]
+
+    def jacobian(self, ybus, V, load=None):
+        """The Jacobian at V as a CSC matrix sharing this structure's index arrays."""
+        return sp.csc_matrix((self.values(ybus, V, load), self.indices, self.indptr), shape=self.shape)
+
+    def mismatch(self, ybus, V, Sbus, load=None):
+        """
+        Stacked real-valued mismatch vector [dP(pv, pq), dQ(pq)].
+
+        `Sbus` schedules loads at their nominal value; `load` (BusLoads) adds their voltage dependence.
+        """
+        if self.jit and V.ndim == 1:
+            mis = kernels.power_mismatch(ybus, V, Sbus)
+        else:
+            mis = V * np.conj((ybus @ V.T).T) - Sbus
+        if load is not None:
+            mis += load.deviation(np.abs(V))
+        return np.concatenate([mis[..., self.pvpq].real, mis[..., self.pq].imag], axis=-1)
+
+    def update(self, V, dx):
+        """Apply a Newton step to the voltage vector."""
+        Va = np.angle(V)
+        Vm = np.abs(V)
+        Va[..., self.pvpq] += dx[..., :self.n_angle]
+        Vm[..., self.pq] += dx[..., self.n_angle:]
+        return Vm * np.exp(1j * Va)
+
+    # Generator limit hooks. The PV/PQ split of this structure is fixed, so there is nothing to enforce.
+    def reset_limits(self):
+        pass
+
+    def limit_state(self):
+        return np.empty(0, dtype=np.int8)
+
+    def restore_limits(self, state):
+        pass
+
+    def limit_margins(self, ybus, V, Sbus, load=None):
+        return np.empty(0)
+
+    def switch_limits(self, ybus, V, Sbus, load=None, tol=0.0, generators=None):
+        return []
+
+class PowerFlowResult:
+    """
+    Outcome of one power flow.
+
+    `limit_events` lists the (internal bus, limit) switches made by generator limit enforcement, in order.
+    """
+
+    def __init__(self, V, converged, iterations, mismatch, factorizations, limit_events=()):
+        self.V = V
+        self.converged = converged
+        self.iterations = iterations
+        self.mismatch = mismatch
+        self.factorizations = factorizations
+        self.limit_events = list(limit_events)
+
+def solve_power_flow(net, Sbus=None, V0=None, tol=1e-8, max_iter=MAX_ITERATIONS, ybus=None, pattern=None,
+                     reuse_factorization=False, load=None):
+    """
+    Solve the AC power flow with Newton-Raphson.
+
+    Args:
+        net (Network): Network to solve.
+        Sbus (np.ndarray, optional): Complex bus injections in per-unit. Defaults to the scheduled injections.
+        V0 (np.ndarray, optional): Initial complex voltages. Defaults to a flat start.
+        tol (float): Convergence tolerance on the largest P/Q mismatch, in per-unit.
+        max_iter (int): Newton iterations allowed.
+        ybus (scipy.sparse.csr_matrix, optional): Admittance matrix override, e.g. for a contingency.
+        pattern (JacobianPattern, optional): Precomputed Jacobian structure to reuse across solves. A
+            QLimitPattern enforces generator reactive limits: once the mismatch converges, buses past a limit
+            switch type and the iteration continues from the same voltages.
+        reuse_factorization (bool): Keep the LU factors across iterations while the mismatch contracts by
+            CONTRACTION per step, refactorizing (and retrying from the last point if the step diverged) when not.
+        load (BusLoads, optional): Voltage dependence of the loads scheduled in Sbus. Defaults to constant power.
+
+    Returns:
+        PowerFlowResult
+    """
+    ybus = net.ybus if ybus is None else ybus
+    Sbus = net.sbus() if Sbus is None else Sbus
+    V = net.flat_start() if V0 is None else V0.copy()
+    if pattern is None or not pattern.matches(ybus):
+        pattern = JacobianPattern(ybus, net.pv, net.pq)
+
+    factorizations = 0
+    events, rounds = [], 0
+    lu, fresh, last = None, False, np.inf
+    for iteration in range(max_iter + 1):
+        F = pattern.mismatch(ybus, V, Sbus, load)
+        worst = np.abs(F).max() if len(F) else 0.0
+
+        if worst < tol:
+            switched = pattern.switch_limits(ybus, V, Sbus, load, tol) if rounds < MAX_LIMIT_ROUNDS else []
+            if not switched:
+                return PowerFlowResult(V, True, iteration, worst, factorizations, events)
+            # Only a few Jacobian rows changed; keep iterating from here with fresh factors.
+            events += switched
+            rounds += 1
+            F = pattern.mismatch(ybus, V, Sbus, load)
+            worst = np.abs(F).max()
+            lu, last = None, np.inf
+        if lu is not None and not worst < CONTRACTION * last:
+            if not fresh and not worst < last:
+                V, F, worst = V_last, F_last, last
+            lu = None
+        if iteration == max_iter or not np.isfinite(worst):
+            break
+
+        fresh = lu is None
+        if fresh:
+            try:
+                lu = pattern.lu.factorize(pattern.jacobian(ybus, V, load))
+            except RuntimeError:
+                # Singular Jacobian, e.g. an islanded bus after a contingency.
+                break
+            factorizations += 1
+        V_last, F_last, last = V, F, worst
+        V = pattern.update(V, lu.solve(-F))
+        if not reuse_factorization:
+            lu = None
+
+    return PowerFlowResult(V, False, iteration, worst, factorizations, events)
+
+def solve_base_case(inputs):
+    """
+    Solve the base-case power flow of the grid model in a PV input set.
+
+    Args:
+        inputs (dict): PV inputs as collected by inputs.py; uses grid_model, base_mva, mva_tolerance,
+            generator_limits and the load model inputs.
+
+    Returns:
+        tuple: (Network, PowerFlowResult)
+    """
+    from cases import load_case
+    from inputs import normalize_inputs
+    from loads import BusLoads, load_model_from_inputs
+    from qlimits import QLimitPattern
+
+    inputs = normalize_inputs(inputs)
+    net = load_case(inputs["grid_model"], inputs["base_mva"])
+    model = load_model_from_inputs(inputs)
+    load = None if model.constant_power else BusLoads(model, net.Pd + 1j * net.Qd)
+    pattern = QLimitPattern(net.ybus, net) if inputs["generator_limits"] else None
+    return net, solve_power_flow(net, tol=inputs["mva_tolerance"] / net.base_mva, pattern=pattern, load=load)
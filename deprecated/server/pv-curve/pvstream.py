@@ -0,0 +1,129 @@
+"""
+PV study as a stream of events, for clients that draw the curves while they are traced.
+
+The base-case curve is traced in a background thread that hands each converged point to the consumer through a
+bounded queue, so points reach the client as the continuation accepts them and nothing holds the whole curve
+for sending. Contingency curves are traced in worker processes (contingency.sweep_contingencies) and arrive
+whole, one event per contingency as it finishes. Every event is a JSON-serializable dict with an "event" key:
+
+    point                 curve, transfer (MW), voltage (p.u.), lower
+    nose                  curve, transfer, voltage: the last upper-branch point, once the trace turns
+    curve_complete        curve, refined nose, reached_nose, stop_reason, points, stats, seconds
+    contingency_complete  contingency, margin_mw, the curve's transfer and voltage lists or an error, seconds
+    done                  curves, seconds
+
+A consumer that stops reading (a client disconnecting) stops the trace at its next point.
+"""
+import queue
+import threading
+import time
+from contingency import sweep_contingencies
+from continuation import generate_pv_curve
+
+# Events waiting for the consumer before the tracing thread pauses.
+QUEUE_SIZE = 256
+# How often (s) a paused tracing thread checks whether the consumer has gone.
+PUT_TIMEOUT = 0.1
+
+class _StreamClosed(Exception):
+    pass
+
+def stream_curve(inputs, net=None, label="base"):
+    """
+    Trace one PV curve in a background thread, yielding its events as they happen.
+
+    Yields:
+        dict: point and nose events, then curve_complete. Errors of the trace are raised here.
+    """
+    events = queue.Queue(QUEUE_SIZE)
+    closed = threading.Event()
+    last = {}
+
+    def put(event):
+        while not closed.is_set():
+            try:
+                events.put(event, timeout=PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+        raise _StreamClosed
+
+    def on_point(transfer, voltage, lower):
+        if lower and "nose" not in last:
+            last["nose"] = True
+            put({"event": "nose", "curve": label, "transfer": last["transfer"], "voltage": last["voltage"]})
+        last["transfer"], last["voltage"] = float(transfer), float(voltage)
+        put({"event": "point", "curve": label, "transfer": last["transfer"], "voltage": last["voltage"],
+             "lower": bool(lower)})
+
+    def trace():
+        start = time.perf_counter()
+        try:
+            try:
+                curve = generate_pv_curve(inputs, net, on_point=on_point)
+                outcome = {
+                    "event": "curve_complete", "curve": label, "nose_transfer": curve.nose_transfer,
+                    "nose_voltage": curve.nose_voltage, "reached_nose": curve.reached_nose,
+                    "stop_reason": curve.stop_reason, "points": len(curve.transfer), "stats": curve.stats,
+                    "seconds": time.perf_counter() - start
+                }
+            except _StreamClosed:
+                raise
+            except Exception as e:
+                # Raised again in the consumer.
+                outcome = e
+            put(outcome)
+            put(None)
+        except _StreamClosed:
+            pass
+
+    thread = threading.Thread(target=trace, daemon=True)
+    thread.start()
+    try:
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+    finally:
+        closed.set()
+
+def stream_pv_curves(inputs, workers=None, net=None):
+    """
+    Events of the base-case curve as it is traced, then of each contingency when `include_contingencies` is set.
+
+    Args:
+        inputs (dict): PV inputs, e.g. as read from inputs.json or pv_inputs.json.
+        workers (int, optional): Worker processes for the contingency sweep.
+        net (Network, optional): Already loaded network for the grid model.
+
+    Yields:
+        dict: Events as listed in the module docstring.
+    """
+    from cases import load_case
+    from inputs import normalize_inputs
+
+    start = time.perf_counter()
+    inputs = normalize_inputs(inputs)
+    net = net or load_case(inputs["grid_model"], inputs["base_mva"])
+    yield from stream_curve(inputs, net)
+    curves = 1
+
+    if inputs["include_contingencies"]:
+        for result in sweep_contingencies(inputs, workers=workers, net=net):
+            curve = result.curve
+            yield {
+                "event": "contingency_complete",
+                "contingency": result.contingency,
+                "margin_mw": curve.nose_transfer if curve is not None else None,
+                "transfer": curve.transfer.tolist() if curve is not None else None,
+                "voltage": curve.voltage.tolist() if curve is not None else None,
+                "stop_reason": curve.stop_reason if curve is not None else None,
+                "error": result.error,
+                "seconds": result.seconds
+            }
+            curves += 1
+
+    yield {"event": "done", "curves": curves, "seconds": time.perf_counter() - start}
@@ -0,0 +1,150 @@
+"""
+Generator reactive-power limits, enforced when the `generator_limits` input is set.
+
+QLimitPattern gives every non-reference bus an angle and a magnitude unknown and both a P and a Q equation.
+At a generator bus that regulates its voltage, the Q row is replaced by Vm - Vset = 0. When the generation the
+bus needs leaves [Qmin, Qmax], the row goes back to a Q mismatch with generation held at the limit. Switching
+a bus between PV and PQ therefore rewrites one mismatch entry and the entries of one Jacobian row, and never
+the sparsity structure, so LU orderings and the continuation's augmented matrix survive every switch.
+"""
+import numpy as np
+from powerflow import JacobianPattern
+
+# Generator states: regulating voltage, or generation held at Qmax / Qmin.
+REGULATING, AT_QMAX, AT_QMIN = 0, 1, -1
+# Event names of switching into each state.
+LIMIT_NAMES = {AT_QMAX: "Qmax", AT_QMIN: "Qmin", REGULATING: "released"}
+
+class QLimitPattern(JacobianPattern):
+    """
+    Jacobian structure of a network whose PV buses switch to PQ at their generators' reactive limits.
+
+    Limits are the sums over the in-service generators of each PV bus; the reference bus is never limited.
+    The switching state lives on the pattern, so reset_limits must be called before it is reused for a new
+    case.
+
+    Args:
+        ybus (scipy.sparse.csr_matrix): Bus admittance matrix with sorted indices and an explicit diagonal.
+        net (Network): Network providing the PV buses, their setpoints and their generator limits.
+    """
+
+    def __init__(self, ybus, net):
+        n = net.n_bus
+        super().__init__(ybus, np.empty(0, dtype=np.int64), np.setdiff1d(np.arange(n), net.ref))
+
+        on = net.gen_status > 0
+        self.buses = net.pv
+        self.qmax = np.bincount(net.gen_bus[on], net.Qmax[on], n)[self.buses]
+        self.qmin = np.bincount(net.gen_bus[on], net.Qmin[on], n)[self.buses]
+        # Generation already scheduled in Sbus, which a held bus replaces by its limit.
+        self.qg = np.bincount(net.gen_bus[on], net.Qg[on], n)[self.buses]
+        self.vset = np.abs(net.initial_voltage())[self.buses]
+
+        # The Q row of a generator bus shares its index with the bus's Vm column.
+        position = np.full(n, -1)
+        position[self.pq] = np.arange(len(self.pq))
+        self.rows = self.n_angle + position[self.buses]
+
+        owner = np.full(self.dim, -1)
+        owner[self.rows] = np.arange(len(self.buses))
+        owner = owner[self.indices]
+        entries = np.flatnonzero(owner >= 0)
+        entries = entries[np.argsort(owner[entries], kind="stable")]
+        # Entries of generator g's row are row_entries[row_ptr[g]:row_ptr[g + 1]].
+        self.row_entries = entries
+        self.row_ptr = np.r_[0, np.cumsum(np.bincount(owner[entries], minlength=len(self.buses)))]
+        columns = np.repeat(np.arange(self.dim), np.diff(self.indptr))
+        diagonal = np.flatnonzero((owner >= 0) & (self.indices == columns))
+        self.diagonal = diagonal[np.argsort(owner[diagonal])]
+
+        self.held_entries = np.zeros(len(self.indices), dtype=bool)
+        self.reset_limits()
+
+    def reset_limits(self):
+        """Every generator bus back to regulating its voltage."""
+        self.state = np.full(len(self.buses), REGULATING, dtype=np.int8)
+        self.patch(np.arange(len(self.buses)))
+
+    def limit_state(self):
+        """Copy of the switching state, e.g. to resume a trace from a stored point."""
+        return self.state.copy()
+
+    def restore_limits(self, state):
+        self.state = np.array(state, dtype=np.int8)
+        self.patch(np.arange(len(self.buses)))
+
+    def patch(self, generators):
+        """Refresh the row masks of the generator buses whose state changed."""
+        for g in generators:
+            self.held_entries[self.row_entries[self.row_ptr[g]:self.row_ptr[g + 1]]] = self.state[g] == REGULATING
+        regulating = self.state == REGULATING
+        self.voltage_rows = self.rows[regulating]
+        self.unit_entries = self.diagonal[regulating]
+        self.q_limit = np.where(self.state == AT_QMAX, self.qmax, self.qmin)
+
+    def values(self, ybus, V, load=None):
+        values = super().values(ybus, V, load)
+        values[..., self.held_entries] = 0.0
+        values[..., self.unit_entries] = 1.0
+        return values
+
+    def mismatch(self, ybus, V, Sbus, load=None):
+        """Stacked mismatch with Vm - Vset in the rows of regulating buses and limits at held ones."""
+        F = super().mismatch(ybus, V, Sbus, load)
+        held = self.state != REGULATING
+        F[..., self.rows[held]] += (self.qg - self.q_limit)[held]
+        regulating = ~held
+        F[..., self.rows[regulating]] = np.abs(V[..., self.buses[regulating]]) - self.vset[regulating]
+        return F
+
+    def generation(self, ybus, V, Sbus, load=None):
+        """Reactive generation each generator bus needs at V."""
+        return JacobianPattern.mismatch(self, ybus, V, Sbus, load)[..., self.rows] + self.qg
+
+    def limit_margins(self, ybus, V, Sbus, load=None):
+        """
+        Distance of each generator bus from switching; negative once it should switch.
+
+        Regulating buses measure the generation left before the nearer limit, held buses how far their voltage
+        is from the setpoint on the side that keeps them held.
+        """
+        q = self.generation(ybus, V, Sbus, load)
+        Vm = np.abs(V[..., self.buses])
+        return np.select(
+            [self.state == REGULATING, self.state == AT_QMAX],
+            [np.minimum(self.qmax - q, q - self.qmin), self.vset - Vm],
+            Vm - self.vset
+        )
+
+    def held_directions(self, buses):
+        """
+        Unknown columns and signs of the Vm moves that keep newly held buses at their limits: falling voltage
+        at Qmax, rising at Qmin. The curve continues in this direction after a switch, which turns it back at
+        a limit-induced nose instead of retracing it.
+
+        Returns:
+            tuple: (columns, signs) for the held buses among `buses` (internal numbers).
+        """
+        generators = np.searchsorted(self.buses, buses)
+        generators = generators[self.state[generators] != REGULATING]
+        return self.rows[generators], -self.state[generators].astype(float)
+
+    def switch_limits(self, ybus, V, Sbus, load=None, tol=0.0, generators=None):
+        """
+        Switch the generator buses past their limits, or the given ones, at V.
+
+        Returns:
+            list: (internal bus, limit name) per switch.
+        """
+        if generators is None:
+            generators = np.flatnonzero(self.limit_margins(ybus, V, Sbus, load) < -tol)
+        if not len(generators):
+            return []
+
+        q = self.generation(ybus, V, Sbus, load)[generators]
+        middle = (self.qmax + self.qmin)[generators] / 2
+        self.state[generators] = np.where(
+            self.state[generators] == REGULATING, np.where(q > middle, AT_QMAX, AT_QMIN), REGULATING
+        )
+        self.patch(generators)
+        return [(int(self.buses[g]), LIMIT_NAMES[int(self.state[g])]) for g in generators]
@@ -0,0 +1,289 @@
+"""
+Network reduction around the study area of a PV input set.
+
+The source, sink and monitor buses of a study usually sit in one region of a large grid, yet continuation solves
+the whole system at every step. reduce_network keeps the study area (every bus within `depth` in-service
+branches of a study bus) and eliminates the rest by Kron reduction of the bus admittance matrix:
+
+    Y_red = Y_kk - Y_ke Y_ee^-1 Y_ek
+
+The fill this adds between the boundary buses (area buses with a branch to an eliminated one) becomes equivalent
+branches and shunts, so the reduced case is an ordinary Network whose Ybus build_ybus reproduces. Eliminated
+generation and load move to the boundary as constant-power injections that make the base-case solution of the
+full network a solution of the reduced one (a Ward equivalent). With `method="xward"`, each boundary bus without
+a generator also gets one holding its base-case voltage, within the reactive range the eliminated generators
+behind it had left, which stands in for the voltage support of the external system.
+
+The equivalent is exact at the base case and drifts from the full model as the transfer grows. Reduced cases are
+cached in the network cache (netcache.py) per network, area and base case, so later studies of the same area
+start from the compiled equivalent. compare_with_full reports the speedup and the nose error against the full
+model.
+"""
+import hashlib
+import json
+import time
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+from continuation import PVStudy, generate_pv_curve
+from netcache import NetworkCache, network_hash
+from network import PV, REF, Network
+
+# Branches between a study bus and the edge of the kept area.
+AREA_DEPTH = 5
+# Reduction methods: Ward (constant-power boundary injections) or extended Ward (plus boundary voltage support).
+METHODS = ("ward", "xward")
+# Boundary buses solved at a time for Y_ke Y_ee^-1, bounding the dense block to n_external x this.
+BOUNDARY_BLOCK = 64
+# Equivalent admittances below this (p.u.) are dropped rather than turned into branches.
+MIN_ADMITTANCE = 1e-6
+# Network.ARRAYS by table.
+BUS_ARRAYS = Network.ARRAYS[:8]
+GEN_ARRAYS = Network.ARRAYS[8:15]
+BRANCH_ARRAYS = Network.ARRAYS[15:]
+# Inputs the base case of a study depends on, and with it the equivalent injections.
+BASE_CASE_INPUTS = ("base_mva", "load_model", "voltage_exponent", "zip_coefficients", "generator_limits",
+                    "mva_tolerance")
+
+def study_buses(inputs):
+    """External numbers of the source, sink and monitor buses of normalized PV inputs."""
+    buses = list(inputs["source_buses"]) + list(inputs["sink_buses"])
+    if inputs["monitor_bus"] is not None:
+        buses.append(inputs["monitor_bus"])
+    return buses
+
+def study_area(net, buses, depth=AREA_DEPTH):
+    """
+    Internal indices of the buses within `depth` in-service branches of the given external bus numbers.
+
+    Returns:
+        np.ndarray: Sorted internal indices.
+    """
+    on = net.branch_status > 0
+    f, t = net.branch_from[on], net.branch_to[on]
+    graph = sp.coo_matrix((np.ones(2 * len(f)), (np.r_[f, t], np.r_[t, f])), shape=(net.n_bus,) * 2).tocsr()
+    area = np.zeros(net.n_bus, dtype=bool)
+    frontier = np.zeros(net.n_bus, dtype=bool)
+    frontier[net.bus_index(buses)] = True
+    for _ in range(depth + 1):
+        area |= frontier
+        frontier = (graph @ frontier.astype(float) > 0) & ~area
+    return np.flatnonzero(area)
+
+def kron_reduce(ybus, keep):
+    """
+    Y_kk - Y_ke Y_ee^-1 Y_ek for the buses in `keep`, and how it spreads external injections over the boundary.
+
+    External buses with no path to a kept one are dropped, since they cannot affect it.
+
+    Returns:
+        tuple: (reduced admittances as a CSR matrix over `keep`, boundary positions in `keep`, internal indices
+        of the external buses, (n_external, n_boundary) matrix (Y_ke Y_ee^-1)^T whose row e gives the share of
+        a current injected at external bus e that reaches each boundary bus)
+    """
+    kept = np.zeros(ybus.shape[0], dtype=bool)
+    kept[keep] = True
+    _, component = connected_components(ybus != 0, directed=False)
+    external = np.flatnonzero(~kept & np.isin(component, component[keep]))
+
+    Y_kk = ybus[keep][:, keep].tocsr()
+    Y_ke = ybus[keep][:, external].tocsr()
+    boundary = np.flatnonzero(np.diff(Y_ke.indptr) > 0)
+    if not len(boundary):
+        return Y_kk, boundary, external, np.zeros((len(external), 0), dtype=complex)
+
+    # Y_ke is nonzero only in boundary rows, so the correction only needs Y_ee^-T solved for those.
+    lu = splu(ybus[external][:, external].tocsc())
+    Y_ek = ybus[external][:, keep[boundary]].tocsc()
+    spread = np.empty((len(external), len(boundary)), dtype=complex)
+    correction = np.empty((len(boundary), len(boundary)), dtype=complex)
+    for start in range(0, len(boundary), BOUNDARY_BLOCK):
+        rows = slice(start, start + BOUNDARY_BLOCK)
+        spread[:, rows] = lu.solve(Y_ke[boundary[rows]].T.toarray(), trans="T")
+        correction[rows] = (Y_ek.T @ spread[:, rows]).T
+    correction = sp.coo_matrix(correction)
+    Y_red = Y_kk - sp.csr_matrix(
+        (correction.data, (boundary[correction.row], boundary[correction.col])), shape=Y_kk.shape
+    )
+    return Y_red.tocsr(), boundary, external, spread
+
+def reduce_network(net, keep, V, method="ward"):
+    """
+    Ward equivalent of `net` that keeps the buses in `keep`.
+
+    Args:
+        net (Network): Full network.
+        keep (np.ndarray): Sorted internal indices of the buses to keep.
+        V (np.ndarray): Solved base-case voltages of the full network; the equivalent reproduces them.
+        method (str): "ward", or "xward" to add voltage support at the boundary buses.
+
+    Returns:
+        Network: Reduced network, numbering its buses as the full one does.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown reduction method {method!r}; expected one of {METHODS}")
+    keep = np.asarray(keep)
+    position = np.full(net.n_bus, -1)
+    position[keep] = np.arange(len(keep))
+    Y_red, boundary, external, spread = kron_reduce(net.ybus, keep)
+
+    bus = {name: np.array(getattr(net, name)[keep]) for name in BUS_ARRAYS}
+    bus["Vm0"], bus["Va0"] = np.abs(V[keep]), np.angle(V[keep])
+    gens = np.flatnonzero(position[net.gen_bus] >= 0)
+    gen = {name: np.array(getattr(net, name)[gens]) for name in GEN_ARRAYS}
+    gen["gen_bus"] = position[gen["gen_bus"]].astype(np.int32)
+    branches = np.flatnonzero((position[net.branch_from] >= 0) & (position[net.branch_to] >= 0))
+    branch = {name: np.array(getattr(net, name)[branches]) for name in BRANCH_ARRAYS}
+    branch["branch_from"] = position[branch["branch_from"]].astype(np.int32)
+    branch["branch_to"] = position[branch["branch_to"]].astype(np.int32)
+
+    if position[net.ref[0]] < 0:
+        if not len(boundary):
+            raise ValueError("The study area has no path to the reference bus")
+        # The most strongly tied boundary bus stands in for the eliminated reference bus.
+        bus["bus_type"][boundary[np.argmax(np.abs(Y_red.diagonal()[boundary]))]] = REF
+
+    # Whatever of Y_red the kept branches and shunts do not explain becomes equivalent branches and shunts. A
+    # branch takes the symmetric part of each off-diagonal pair; phase shifters outside the area leave an
+    # antisymmetric rest, which is dropped.
+    kept_ybus = Network(net.base_mva, **bus, **gen, **branch).ybus
+    difference = sp.triu(Y_red - kept_ybus, k=1).tocsr() + sp.tril(Y_red - kept_ybus, k=-1).T.tocsr()
+    difference = difference.tocoo()
+    series = -difference.data / 2
+    significant = np.abs(series) >= MIN_ADMITTANCE
+    f, t, series = difference.row[significant], difference.col[significant], series[significant]
+    shunt = (Y_red - kept_ybus).diagonal()
+    np.subtract.at(shunt, np.r_[f, t], np.r_[series, series])
+    bus["Gs"] = bus["Gs"] + shunt.real
+    bus["Bs"] = bus["Bs"] + shunt.imag
+    impedance = 1 / series
+    _append(branch, {
+        "branch_from": f, "branch_to": t, "r": impedance.real, "x": impedance.imag, "b": 0.0, "ratio": 0.0,
+        "shift": 0.0, "branch_status": 1.0
+    })
+
+    # Ward injections: the power the eliminated system exchanged with each boundary bus in the base case.
+    reduced = Network(net.base_mva, **bus, **gen, **branch)
+    exchange = V[keep] * np.conj(reduced.ybus @ V[keep]) - (V * np.conj(net.ybus @ V))[keep]
+    bus["Pd"][boundary] -= exchange.real[boundary]
+    bus["Qd"][boundary] -= exchange.imag[boundary]
+
+    if method == "xward":
+        # Boundary buses with generators of their own keep regulating their setpoints.
+        regulated = np.isin(boundary, gen["gen_bus"][gen["gen_status"] > 0]) | (bus["bus_type"][boundary] == REF)
+        supported = boundary[~regulated]
+        up, down = _reactive_reserve(net, V, external, np.abs(spread))
+        position_in_boundary = np.searchsorted(boundary, supported)
+        bus["bus_type"][supported] = PV
+        _append(gen, {
+            "gen_bus": supported, "Pg": 0.0, "Qg": 0.0, "Qmax": up[position_in_boundary],
+            "Qmin": -down[position_in_boundary], "Vg": bus["Vm0"][supported], "gen_status": 1
+        })
+    return Network(net.base_mva, **bus, **gen, **branch)
+
+def _append(arrays, rows):
+    """Append rows (arrays or scalars broadcast to the length of the first) to a table of arrays."""
+    count = len(next(iter(rows.values())))
+    for name, value in rows.items():
+        arrays[name] = np.concatenate([arrays[name], np.broadcast_to(value, count).astype(arrays[name].dtype)])
+
+def _reactive_reserve(net, V, external, weights):
+    """
+    Reactive range (p.u.) left above and below the base-case output of the eliminated generators, spread over the
+    boundary buses in proportion to how much of each generator's current reaches them.
+
+    Returns:
+        tuple: (reserve up, reserve down) per boundary bus.
+    """
+    on = net.gen_status > 0
+    qmax = np.bincount(net.gen_bus[on], net.Qmax[on], net.n_bus)[external]
+    qmin = np.bincount(net.gen_bus[on], net.Qmin[on], net.n_bus)[external]
+    regulating = np.isin(external, net.gen_bus[on]) & np.isin(external, np.r_[net.pv, net.ref])
+    q = (V * np.conj(net.ybus @ V)).imag[external] + net.Qd[external]
+    shares = weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+    up = np.where(regulating, np.maximum(qmax - q, 0.0), 0.0)
+    down = np.where(regulating, np.maximum(q - qmin, 0.0), 0.0)
+    return shares.T @ up, shares.T @ down
+
+def reduced_network(inputs, net=None, depth=AREA_DEPTH, method="xward", cache=True):
+    """
+    Equivalent of a study's network around its area, from the network cache when it was built before.
+
+    Args:
+        inputs (dict): PV inputs; the source, sink and monitor buses define the area.
+        net (Network, optional): Already loaded full network for the grid model.
+        depth (int): Branches from a study bus to the edge of the area.
+        method (str): "ward" or "xward".
+        cache (bool or NetworkCache): Use the default network cache, a given one, or none.
+
+    Returns:
+        tuple: (reduced Network, whether it came from the cache)
+    """
+    study = PVStudy(inputs, net)
+    keep = study_area(study.net, study_buses(study.inputs), depth)
+    built = []
+
+    def build():
+        built.append(True)
+        return reduce_network(study.net, keep, study.base_case().V, method)
+
+    if not cache:
+        return build(), False
+    digest = hashlib.sha256(json.dumps({
+        "network": network_hash(study.net), "method": method,
+        "base_case": {name: study.inputs[name] for name in BASE_CASE_INPUTS}
+    }, sort_keys=True).encode())
+    digest.update(np.ascontiguousarray(study.net.bus_numbers[keep], dtype=np.int64).data)
+    cache = cache if isinstance(cache, NetworkCache) else NetworkCache()
+    reduced = cache.load(f"reduced|{digest.hexdigest()[:24]}", build)
+    return reduced, not built
+
+def reduced_pv_curve(inputs, net=None, depth=AREA_DEPTH, method="xward", cache=True, **options):
+    """
+    PV curve of a study traced on the equivalent of its area instead of the full network.
+
+    The reduced case starts from the base-case voltages it was built around. `options` go to generate_pv_curve;
+    stats["reduction"] records the method, depth, bus counts and whether the equivalent was cached.
+
+    Returns:
+        PVCurve
+    """
+    study = PVStudy(inputs, net)
+    reduced, cached = reduced_network(study.inputs, study.net, depth, method, cache)
+    curve = generate_pv_curve(study.inputs, reduced, V0=reduced.initial_voltage(), **options)
+    curve.stats["reduction"] = {
+        "method": method, "depth": depth, "buses": study.net.n_bus, "reduced_buses": reduced.n_bus, "cached": cached
+    }
+    return curve
+
+def compare_with_full(inputs, net=None, depth=AREA_DEPTH, method="xward", cache=True):
+    """
+    Speedup and nose error of tracing a study on its area equivalent versus the full network.
+
+    Both traces start from the converged base case. The reduced time counts building the equivalent unless it
+    came from the cache.
+
+    Returns:
+        dict: Bus counts, wall times, speedup, both noses and the nose transfer and voltage errors.
+    """
+    study = PVStudy(inputs, net)
+    start = time.perf_counter()
+    full = generate_pv_curve(study.inputs, study.net)
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    curve = reduced_pv_curve(study.inputs, study.net, depth, method, cache)
+    seconds = time.perf_counter() - start
+    return {
+        "buses": study.net.n_bus,
+        "reduced_buses": curve.stats["reduction"]["reduced_buses"],
+        "cached": curve.stats["reduction"]["cached"],
+        "full_seconds": full_seconds,
+        "reduced_seconds": seconds,
+        "speedup": full_seconds / seconds,
+        "full_nose_mw": full.nose_transfer,
+        "reduced_nose_mw": curve.nose_transfer,
+        "nose_error_pct": 100 * (curve.nose_transfer / full.nose_transfer - 1) if full.nose_transfer else None,
+        "nose_voltage_error": curve.nose_voltage - full.nose_voltage
+    }
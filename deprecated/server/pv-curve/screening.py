@@ -0,0 +1,137 @@
+"""
+Voltage-stability screening of every bus from one operating point, to suggest monitor buses.
+
+Finding the bus whose voltage collapses first by tracing curves means one continuation run per candidate. The
+indices here come from the base case alone and rank all load buses at once:
+
+- L-index (Kessel-Glavitsch): with the load buses L and generator buses G, the load voltages the generators
+  would hold on their own are V0_L = -Y_LL^-1 Y_LG V_G, and L_j = |1 - V0_j / V_j|. It rises from 0 at no load
+  towards 1 at collapse. One sparse LU of Y_LL and one solve give every bus.
+- Modal participation: the reduced Jacobian J_R = J_QV - J_Qtheta J_Ptheta^-1 J_PV maps load-bus voltage changes
+  to reactive mismatches with the active power held. Its smallest singular values measure the distance to
+  collapse, and the squared entries of their right singular vectors say which buses take part. J_R is dense, so
+  ARPACK (scipy.sparse.linalg.svds) runs on J_R^-1 as an operator: each product is one solve with the LU of the
+  full Jacobian, with the right-hand side in the Q rows and the answer read from the magnitudes.
+- Transfer sensitivity: the voltage change of each bus per 100 MW of the study's transfer, dVm/dlambda from the
+  tangent J dx = -dF/dlambda, one more solve with the same LU. The other two indices do not depend on the
+  source and sink buses; this one does.
+
+rank_monitor_buses orders the PQ buses by one index and reports all three for each. By default that is the
+magnitude of the transfer sensitivity (a bus whose voltage first rises with the transfer can still collapse
+later). Against the bus with the largest voltage drop to the nose of a traced curve (python benchmark.py
+screening), it does better on its own than with the L-index or the participation added to its score, since
+those point at the weakest area of the system whichever way the transfer goes. They are reported to qualify a
+suggestion, and the smallest singular values to tell how close the whole system is to collapse. Buses at a
+generator's reactive limit in the base case are screened as regulating.
+"""
+import time
+import numpy as np
+from scipy.sparse.linalg import LinearOperator, splu, svds
+from continuation import ContinuationProblem, PVStudy
+from powerflow import JacobianPattern
+
+# Smallest singular values of the reduced Jacobian computed per screening.
+SINGULAR_MODES = 3
+# Relative accuracy ARPACK stops at; it converges slowly on near-repeated values, as in tiled networks.
+SINGULAR_TOLERANCE = 1e-3
+# Candidate monitor buses suggested to the user.
+SUGGESTIONS = 5
+# Indices rank_monitor_buses can rank by.
+INDICES = ("sensitivity", "l_index", "participation")
+
+def l_index(net, V, ybus=None):
+    """
+    L-index of every PQ bus at the voltages V.
+
+    Returns:
+        np.ndarray: L_j in the order of net.pq.
+    """
+    ybus = net.ybus if ybus is None else ybus
+    generators = np.r_[net.ref, net.pv]
+    loads = ybus[net.pq]
+    open_circuit = -splu(loads[:, net.pq].tocsc()).solve(loads[:, generators] @ V[generators])
+    return np.abs(1 - open_circuit / V[net.pq])
+
+def reduced_jacobian_modes(lu, pattern, k=SINGULAR_MODES):
+    """
+    Smallest singular values of the reduced Jacobian J_R and their right singular vectors.
+
+    Args:
+        lu (scipy.sparse.linalg.SuperLU): LU factors of the power-flow Jacobian J.
+        pattern (JacobianPattern): Structure of J; J_R is over pattern.pq.
+        k (int): Modes to compute, at most len(pattern.pq) - 1.
+
+    Returns:
+        tuple: (singular values in ascending order, (len(pattern.pq), k) unit voltage directions of the modes)
+    """
+    n_angle, n = pattern.n_angle, len(pattern.pq)
+
+    def solve(x, trans):
+        b = np.zeros(pattern.dim)
+        b[n_angle:] = np.ravel(x)
+        return lu.solve(b, trans=trans)[n_angle:]
+
+    inverse = LinearOperator(
+        (n, n), matvec=lambda x: solve(x, "N"), rmatvec=lambda x: solve(x, "T"), dtype=float
+    )
+    k = min(k, n - 1)
+    # J_R^-1 = U S V^T gives J_R = V S^-1 U^T: the largest s are the smallest singular values of J_R and the
+    # columns of U their voltage directions.
+    U, s, _ = svds(inverse, k=k, tol=SINGULAR_TOLERANCE, v0=np.full(n, n ** -0.5))
+    order = np.argsort(s)[::-1]
+    return 1 / s[order], U[:, order]
+
+def rank_monitor_buses(inputs, net=None, V0=None, modes=SINGULAR_MODES, rank_by="sensitivity"):
+    """
+    Rank the PQ buses of a study as monitor buses from its base case.
+
+    Args:
+        inputs (dict): PV inputs; the monitor bus is ignored.
+        net (Network, optional): Already loaded network for the grid model.
+        V0 (np.ndarray, optional): Initial guess for the base case.
+        modes (int): Smallest singular modes of the reduced Jacobian that count towards participation, each
+            weighted by how close it is to the smallest.
+        rank_by (str): Index to rank by, one of INDICES, largest magnitude first.
+
+    Returns:
+        dict: "ranking", a list of {"bus", "voltage", "sensitivity", "l_index", "participation"} from the
+        weakest bus down (sensitivity in p.u. voltage drop per 100 MW of transfer, negative for a rise);
+        "singular_values" of the reduced Jacobian; "seconds" for the screening, base case included.
+    """
+    if rank_by not in INDICES:
+        raise ValueError(f"Unknown screening index {rank_by!r}; expected one of {INDICES}")
+    start = time.perf_counter()
+    study = PVStudy(inputs, net)
+    net = study.net
+    V = study.base_case(V0=V0).V
+
+    pattern = JacobianPattern(net.ybus, net.pv, net.pq)
+    problem = ContinuationProblem(
+        net, net.sbus(), study.d, study.tol, pattern=pattern, load_model=study.load_model, d_load=study.d_load
+    )
+    lu = splu(problem.jacobian(V, 0.0).tocsc())
+    singular_values, vectors = reduced_jacobian_modes(lu, pattern, modes)
+    tangent = lu.solve(-problem.lambda_derivative(V))
+
+    indices = {
+        "sensitivity": -tangent[pattern.n_angle:] * 100 / net.base_mva,
+        "l_index": l_index(net, V),
+        "participation": (vectors ** 2) @ (singular_values[0] / singular_values)
+    }
+    ranking = [
+        {
+            "bus": int(net.bus_numbers[net.pq[i]]),
+            "voltage": float(abs(V[net.pq[i]])),
+            **{name: float(values[i]) for name, values in indices.items()}
+        }
+        for i in np.argsort(-np.abs(indices[rank_by]), kind="stable")
+    ]
+    return {
+        "ranking": ranking,
+        "singular_values": singular_values.tolist(),
+        "seconds": time.perf_counter() - start
+    }
+
+def suggest_monitor_buses(inputs, net=None, count=SUGGESTIONS):
+    """The `count` highest-ranked entries of rank_monitor_buses."""
+    return rank_monitor_buses(inputs, net)["ranking"][:count]
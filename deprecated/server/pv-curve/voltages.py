@@ -0,0 +1,98 @@
+"""
+Voltage magnitude of every bus at every point of a PV curve.
+
+The continuation solves for all bus voltages at each point anyway, so a curve keeps them as one
+(n_points x n_bus) array and the curve of any other monitor bus is a column lookup instead of a new trace.
+Magnitudes are kept as float32 (4 bytes per bus and point), or delta-coded for large systems: each column is
+quantized to QUANTUM p.u. and stored as its first value plus the differences between consecutive points, in the
+smallest integer type that holds them (usually int16, 2 bytes). Quantizing before differencing keeps the
+error of every point within QUANTUM / 2, however long the curve.
+"""
+import numpy as np
+
+# Quantization step (p.u.) of delta-coded magnitudes.
+QUANTUM = 1e-5
+# Captures of systems with at least this many buses are delta-coded unless asked otherwise.
+DELTA_MIN_BUSES = 1000
+# Capture formats.
+COMPRESSIONS = ("float32", "delta")
+
+class BusVoltages:
+    """
+    Voltage magnitudes (p.u.) of every bus at every curve point.
+
+    Args:
+        vm (np.ndarray): (n_points, n_bus) magnitudes.
+        bus_numbers (np.ndarray): External number of each column.
+        compression (str, optional): "float32" or "delta". Defaults to "delta" from DELTA_MIN_BUSES buses on.
+
+    Attributes:
+        shape (tuple): (n_points, n_bus).
+        compression (str): Format of `data`.
+        data (np.ndarray): float32 magnitudes, or integer deltas between consecutive points in QUANTUM steps.
+        first (np.ndarray): First-point magnitudes in QUANTUM steps (int32); empty for float32.
+    """
+
+    def __init__(self, vm, bus_numbers, compression=None):
+        vm = np.asarray(vm)
+        compression = compression or ("delta" if vm.shape[1] >= DELTA_MIN_BUSES else "float32")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown voltage compression {compression!r}; expected one of {COMPRESSIONS}")
+
+        self.bus_numbers = np.asarray(bus_numbers)
+        self.shape = vm.shape
+        self.compression = compression
+        self._lookup = None
+        if compression == "float32":
+            self.data = vm.astype(np.float32)
+            self.first = np.empty(0, dtype=np.int32)
+            return
+
+        codes = np.rint(vm / QUANTUM).astype(np.int32)
+        deltas = np.diff(codes, axis=0)
+        largest = int(np.abs(deltas).max(initial=0))
+        dtype = next(t for t in (np.int8, np.int16, np.int32) if largest <= np.iinfo(t).max)
+        self.first = codes[0]
+        self.data = deltas.astype(dtype)
+
+    @classmethod
+    def from_states(cls, states, bus_numbers, compression=None):
+        """Capture of the complex bus voltages of each point."""
+        return cls(np.abs(np.array(states)), bus_numbers, compression)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.first.nbytes
+
+    def columns(self, buses):
+        """Column of each external bus number."""
+        if self._lookup is None:
+            self._lookup = {int(n): i for i, n in enumerate(self.bus_numbers)}
+        try:
+            return np.array([self._lookup[int(n)] for n in np.atleast_1d(buses)], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Bus {e.args[0]} does not exist in this network") from None
+
+    def column_values(self, columns):
+        """(n_points, len(columns)) magnitudes of the given columns, as float64."""
+        if self.compression == "float32":
+            return self.data[:, columns].astype(float)
+        codes = np.empty((self.shape[0], len(columns)), dtype=np.int64)
+        codes[0] = self.first[columns]
+        np.cumsum(self.data[:, columns], axis=0, dtype=np.int64, out=codes[1:])
+        codes[1:] += codes[0]
+        return codes * QUANTUM
+
+    def at(self, buses):
+        """
+        Voltage magnitudes of one bus or a set of buses (external numbers) at every point.
+
+        Returns:
+            np.ndarray: (n_points,) for a single bus, (n_points, len(buses)) for a set.
+        """
+        values = self.column_values(self.columns(buses))
+        return values[:, 0] if np.ndim(buses) == 0 else values
+
+    def array(self):
+        """The full (n_points, n_bus) magnitudes, as float64."""
+        return self.column_values(np.arange(self.shape[1]))
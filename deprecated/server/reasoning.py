@@ -0,0 +1,148 @@
+"""
+Server-side control of the reasoning tokens emitted by deepseek-r1.
+
+deepseek-r1 writes a <think> section before every answer. Each route picks a policy:
+
+- "visible": stream the <think> section unchanged (the UI folds it away).
+- "hidden": let the model think, but strip the <think> section before it is encoded for SSE.
+- "off": ask Ollama to skip reasoning entirely. Fastest, for extraction/classification style prompts.
+
+With a think_budget, reasoning that runs past the budget is cut off: the stream is closed (which stops
+generation on the Ollama server) and the model is asked to answer straight away, with reasoning disabled and
+its partial reasoning included after the original prompt.
+"""
+from collections import deque
+import time
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# Reasoning policy per route. think_budget is in streamed tokens; None means no limit.
+REASONING_POLICIES = {
+    "/ask": {"mode": "hidden", "think_budget": 512},
+    "command_detection": {"mode": "off", "think_budget": None},
+    "input_extraction": {"mode": "off", "think_budget": None},
+    "chat": {"mode": "hidden", "think_budget": 512}
+}
+DEFAULT_POLICY = {"mode": "visible", "think_budget": None}
+
+# Appended after the original prompt when the thinking budget runs out.
+FORCE_ANSWER_TEMPLATE = "Your reasoning so far:\n{partial_reasoning}\n\nStop reasoning now and give your final answer."
+
+# Thinking/answer token counts of recent requests, newest last.
+reasoning_metrics = deque(maxlen=1000)
+
+class ThinkSplitter:
+    """Splits streamed text into ("thinking", text) and ("answer", text) parts, even when a tag spans chunks."""
+
+    def __init__(self):
+        self.in_think = False
+        self.buffer = ""
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        parts = []
+
+        while True:
+            kind = "thinking" if self.in_think else "answer"
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = self.buffer.find(tag)
+
+            if index < 0:
+                break
+
+            if index:
+                parts.append((kind, self.buffer[:index]))
+            self.buffer = self.buffer[index + len(tag):]
+            self.in_think = not self.in_think
+
+        # Hold back a trailing fragment that could be the start of the next tag.
+        hold = next((n for n in range(len(tag) - 1, 0, -1) if self.buffer.endswith(tag[:n])), 0)
+        text = self.buffer[:len(self.buffer) - hold]
+        if text:
+            parts.append((kind, text))
+        self.buffer = self.buffer[len(self.buffer) - hold:]
+
+        return parts
+
+    def flush(self):
+        parts = [("thinking" if self.in_think else "answer", self.buffer)] if self.buffer else []
+        self.buffer = ""
+        return parts
+
+def stream_with_policy(prompt, model, inputs, route, metrics=None):
+    """
+    Stream a prompt | model chain under the reasoning policy of `route`.
+
+    Args:
+        prompt: ChatPromptTemplate of the route.
+        model: OllamaLLM running a reasoning model.
+        inputs (dict): Template variables for `prompt`.
+        route (str): Key into REASONING_POLICIES.
+        metrics (dict, optional): Filled with thinking/answer token counts once the stream finishes.
+
+    Yields:
+        str: Text to send to the client.
+    """
+    policy = REASONING_POLICIES.get(route, DEFAULT_POLICY)
+    visible = policy["mode"] == "visible"
+    budget = policy["think_budget"]
+
+    counts = {
+        "route": route,
+        "mode": policy["mode"],
+        "thinking_tokens": 0,
+        "answer_tokens": 0,
+        "budget_exceeded": False
+    }
+    start = time.perf_counter()
+
+    if policy["mode"] == "off":
+        for chunk in (prompt | model.bind(reasoning=False)).stream(inputs):
+            counts["answer_tokens"] += 1
+            yield chunk
+    else:
+        splitter = ThinkSplitter()
+        reasoning = []
+        stream = (prompt | model).stream(inputs)
+
+        # Ollama streams one token per chunk, so chunks are counted as tokens.
+        for chunk in stream:
+            parts = splitter.feed(chunk)
+            kinds = {kind for kind, _ in parts}
+            counts["thinking_tokens"] += "thinking" in kinds
+            counts["answer_tokens"] += "answer" in kinds
+
+            if visible:
+                yield chunk
+            else:
+                for kind, text in parts:
+                    if kind == "answer":
+                        yield text
+
+            reasoning.extend(text for kind, text in parts if kind == "thinking")
+
+            if budget is not None and splitter.in_think and counts["thinking_tokens"] >= budget:
+                counts["budget_exceeded"] = True
+                break
+
+        # Closing the generator closes the HTTP stream, which stops generation on the server.
+        stream.close()
+
+        if counts["budget_exceeded"]:
+            if visible:
+                yield THINK_CLOSE
+            forced = prompt + [("human", FORCE_ANSWER_TEMPLATE)]
+            forced_inputs = {**inputs, "partial_reasoning": "".join(reasoning)}
+            for chunk in (forced | model.bind(reasoning=False)).stream(forced_inputs):
+                counts["answer_tokens"] += 1
+                yield chunk
+        else:
+            for kind, text in splitter.flush():
+                if kind == "answer" and not visible:
+                    yield text
+
+    counts["elapsed_s"] = time.perf_counter() - start
+    reasoning_metrics.append(counts)
+    if metrics is not None:
+        metrics.update(counts)
@@ -1,7 +1,20 @@
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from ai_service import get_ai_response_stream
+from collections import OrderedDict
 import json
+import os
+import sys
+import threading
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent"))
+from agent.main import new_session, stream_agent, HumanMessage, INPUTS_FILE
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "pv-curve"))
+from pvstream import stream_pv_curves
+from plots import FORMATS, PlotService
+from screening import rank_monitor_buses
 
 app = Flask(__name__)
 CORS(app)
@@ -25,10 +38,11 @@ def ask_question():
         
         def generate():
             try:
-                for chunk in get_ai_response_stream(question):
+                metrics = {}
+                for chunk in get_ai_response_stream(question, metrics):
                     yield f"data: {json.dumps({'chunk': chunk})}\n\n"
                 
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                yield f"data: {json.dumps({'done': True, 'metrics': metrics})}\n\n"
                 
             except Exception as e:
                 yield f"data: {json.dumps({'error': str(e)})}\n\n"
@@ -45,5 +59,149 @@ def ask_question():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Agent conversations by session id, each with its own state and history. Past this many, the least recently
+# used conversation is dropped.
+MAX_SESSIONS = 100
+
+agent_sessions = OrderedDict()
+agent_sessions_lock = threading.Lock()
+
+def agent_session(session_id):
+    """
+    The session with this id, started on first use.
+
+    Returns:
+        dict: "state", the conversation's graph state, and "lock", held for the length of a turn so the turns of
+        one session run one at a time.
+    """
+    with agent_sessions_lock:
+        session = agent_sessions.get(session_id)
+        if session is None:
+            session = agent_sessions[session_id] = {"state": new_session(), "lock": threading.Lock()}
+        agent_sessions.move_to_end(session_id)
+        while len(agent_sessions) > MAX_SESSIONS:
+            agent_sessions.popitem(last=False)
+        return session
+
+@app.route('/agent', methods=['POST'])
+def ask_agent():
+    try:
+        data = request.get_json()
+        
+        if not data or 'question' not in data:
+            return jsonify({'error': 'Question is required'}), 400
+        
+        question = data['question']
+        
+        if not question.strip():
+            return jsonify({'error': 'Question cannot be empty'}), 400
+        
+        # Clients send back the session_id of the first reply to continue a conversation.
+        session_id = data.get('session_id') or uuid.uuid4().hex
+        session = agent_session(session_id)
+
+        def generate():
+            try:
+                with session["lock"]:
+                    state = session["state"]
+                    state = {**state, "messages": state["messages"] + [HumanMessage(content=question)]}
+                    for event in stream_agent(state):
+                        if "chunk" in event:
+                            yield f"data: {json.dumps({'chunk': event['chunk']})}\n\n"
+                        else:
+                            session["state"] = event["state"]
+                            done = {'done': True, 'session_id': session_id, 'metrics': event['metrics']}
+                            yield f"data: {json.dumps(done)}\n\n"
+                
+            except Exception as e:
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        
+        return Response(
+            generate(),
+            mimetype='text/plain',
+            headers={
+                'Cache-Control': 'no-cache',
+                'Connection': 'keep-alive',
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/pv', methods=['POST'])
+def stream_pv():
+    try:
+        data = request.get_json(silent=True) or {}
+        inputs = data.get('inputs')
+
+        # Without inputs in the request, run the study the agent has collected.
+        if inputs is None:
+            with open(INPUTS_FILE) as f:
+                inputs = json.load(f)
+
+        def generate():
+            try:
+                for event in stream_pv_curves(inputs):
+                    yield f"data: {json.dumps(event)}\n\n"
+
+            except Exception as e:
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+        return Response(
+            generate(),
+            mimetype='text/plain',
+            headers={
+                'Cache-Control': 'no-cache',
+                'Connection': 'keep-alive',
+            }
+        )
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Studies are traced and plotted by worker processes, and plots are cached by the hash of the study's curves.
+plot_service = PlotService()
+
+@app.route('/pv/plot', methods=['POST'])
+def plot_pv():
+    try:
+        data = request.get_json(silent=True) or {}
+        inputs = data.get('inputs')
+        fmt = data.get('format', 'json')
+
+        if fmt not in FORMATS:
+            return jsonify({'error': f'format must be one of {list(FORMATS)}'}), 400
+
+        if inputs is None:
+            with open(INPUTS_FILE) as f:
+                inputs = json.load(f)
+
+        # Traced and rendered by the plot service's workers; a study plotted before is served from its cache.
+        plot = plot_service.render_study(inputs, fmt, title=data.get('title')).result()
+
+        return Response(plot, mimetype='image/png' if fmt == 'png' else 'application/json')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/pv/screen', methods=['POST'])
+def screen_pv():
+    try:
+        data = request.get_json(silent=True) or {}
+        inputs = data.get('inputs')
+
+        if inputs is None:
+            with open(INPUTS_FILE) as f:
+                inputs = json.load(f)
+
+        return jsonify(rank_monitor_buses(inputs, rank_by=data.get('rank_by', 'sensitivity')))
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='localhost', port=5000)
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""Fake chat models in place of Ollama, for the agent and server tests."""
+import json
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVER_DIR)
+sys.path.append(os.path.join(SERVER_DIR, "agent"))
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+import main
+
+class FakeChatModel(BaseChatModel):
+    """Streams a fixed reply in small chunks; structured output parses the reply as JSON, as JSON mode does."""
+
+    replies: dict
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.replies["text"]))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self.replies["text"]
+        for start in range(0, len(text), 8):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + 8]))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        model = FakeChatModel(replies={"text": self.replies[schema.__name__]})
+        return model | RunnableLambda(lambda message: schema.model_validate_json(message.content))
+
+@pytest.fixture
+def replies():
+    """Replies of the fake models by output schema, "text" for plain chat; tests may change them."""
+    return {
+        "MessageClassifier": json.dumps({"message_type": "command"}),
+        "InputModifier": json.dumps({"parameter": "max_transfer", "value": 500})
+    }
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path, replies):
+    inputs_file = tmp_path / "inputs.json"
+    inputs_file.write_text(json.dumps({"max_transfer": "", "monitor_bus": ""}))
+    monkeypatch.setattr(main, "INPUTS_FILE", str(inputs_file))
+    monkeypatch.setattr(main, "chat_model", lambda model: FakeChatModel(replies=replies))
+    return inputs_file
@@ -0,0 +1,28 @@
+"""Input edits by command_agent, with the fake modifier of conftest.py in place of Ollama."""
+import json
+from langchain_core.messages import HumanMessage
+import main
+
+def run_command(agent, replies, parameter, value, **inputs):
+    agent.write_text(json.dumps({"grid_model": "IEEE 39", "monitor_bus": "", **inputs}))
+    replies["InputModifier"] = json.dumps({"parameter": parameter, "value": value})
+    state = {"messages": [HumanMessage(content=f"Set {parameter} to {value}")], "message_type": "command"}
+    return main.command_agent(state)["messages"][-1].content
+
+def test_source_bus_edit_suggests_monitor_buses(agent, replies):
+    reply = run_command(agent, replies, "source_buses", 30.0, sink_buses=[16])
+
+    assert reply.startswith("Updated source_buses to 30.0")
+    assert "Suggested monitor buses" in reply
+    assert json.loads(agent.read_text())["source_buses"] == 30.0
+
+def test_grid_model_can_be_named(agent, replies):
+    reply = run_command(agent, replies, "grid_model", "IEEE 14", source_buses=[1], sink_buses=[14])
+
+    assert reply.startswith("Updated grid_model to IEEE 14")
+    assert "Suggested monitor buses" in reply
+
+def test_missing_inputs_are_reported(agent, replies):
+    reply = run_command(agent, replies, "source_buses", 30.0)
+
+    assert "Cannot suggest monitor buses" in reply
@@ -0,0 +1,53 @@
+"""Conversations kept apart by session id in the /agent route (see conftest.py for the fake chat models)."""
+import json
+import sys
+import threading
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+import main
+import server
+
+def ask(client, question, session_id=None):
+    body = {"question": question}
+    if session_id:
+        body["session_id"] = session_id
+    response = client.post("/agent", json=body)
+    events = [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).splitlines() if line]
+    return events[-1]
+
+@pytest.fixture
+def client(agent, monkeypatch):
+    # server.py imports the graph as agent.main, a module of its own next to the main the agent fixture patched.
+    served = sys.modules[server.new_session.__module__]
+    monkeypatch.setattr(served, "INPUTS_FILE", str(agent))
+    monkeypatch.setattr(served, "chat_model", main.chat_model)
+    monkeypatch.setattr(server, "agent_sessions", type(server.agent_sessions)())
+    return server.app.test_client()
+
+def test_sessions_keep_their_own_state_and_history(client):
+    first = ask(client, "Set the maximum transfer to 500 MW")
+    second = ask(client, "Set the maximum transfer to 500 MW")
+    assert first["done"] and second["done"]
+    assert first["session_id"] != second["session_id"]
+
+    ask(client, "Set the maximum transfer to 500 MW", first["session_id"])
+    states = {key: session["state"] for key, session in server.agent_sessions.items()}
+    assert len(states[first["session_id"]]["messages"]) == 4
+    assert len(states[second["session_id"]]["messages"]) == 2
+    assert states[first["session_id"]]["history"] is not states[second["session_id"]]["history"]
+
+def test_sessions_share_one_summary_thread(agent, replies, monkeypatch):
+    replies["text"] = "Summary."
+    monkeypatch.setattr(main, "summary_llm", main.chat_model("summariser"))
+    messages = [
+        cls(content=f"turn {i}", id=f"{cls.__name__}-{i}") for i in range(6) for cls in (HumanMessage, AIMessage)
+    ]
+
+    # Kept alive, as the server keeps its sessions.
+    histories = [main.new_session()["history"] for _ in range(5)]
+    for history in histories:
+        assert history.compact(messages)
+        history.wait()
+
+    assert all(history.summary == "Summary." for history in histories)
+    assert sum(thread.name.startswith("history-summary") for thread in threading.enumerate()) == 1
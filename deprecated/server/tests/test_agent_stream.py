@@ -0,0 +1,21 @@
+"""
+Streaming of agent replies through stream_agent, with fake chat models in place of Ollama (see conftest.py).
+
+Run from /server:
+
+    python -m pytest tests
+"""
+import json
+from langchain_core.messages import HumanMessage
+import main
+
+def test_command_turn_streams_only_the_reply(agent):
+    state = {"messages": [HumanMessage(content="Set the maximum transfer to 500 MW")], "message_type": None}
+    events = list(main.stream_agent(state))
+
+    chunks = [event["chunk"] for event in events if "chunk" in event]
+    assert "".join(chunks) == "Updated max_transfer to 500.0"
+    for chunk in chunks:
+        assert "{" not in chunk and '"parameter"' not in chunk
+    assert events[-1]["done"]
+    assert json.loads(agent.read_text())["max_transfer"] == 500
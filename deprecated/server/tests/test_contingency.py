@@ -0,0 +1,19 @@
+"""Contingency sweeps traced in the calling process, as /pv runs them on a one-core server."""
+from contingency import sweep_contingencies
+
+IEEE39 = {"grid_model": "ieee39", "source_buses": [30], "sink_buses": [16], "monitor_bus": 8,
+          "contingencies": ["6_7", "10_13"]}
+IEEE14 = {"grid_model": "ieee14", "source_buses": [1], "sink_buses": [14], "monitor_bus": 14,
+          "contingencies": ["2_3", "4_5"]}
+
+def margins(results):
+    return {r.contingency: r.error or round(r.curve.nose_transfer) for r in results}
+
+def test_interleaved_sweeps_keep_their_own_network():
+    alone = margins(sweep_contingencies(IEEE39, workers=1))
+    first, second = sweep_contingencies(IEEE39, workers=1), sweep_contingencies(IEEE14, workers=1)
+    interleaved = []
+    for a, b in zip(first, second):
+        interleaved += [a, b]
+    assert margins(r for r in interleaved if r.contingency in alone) == alone
+    assert all(isinstance(margin, int) for margin in alone.values())